@@ -1,216 +1,311 @@
 import streamlit as st
-import openai
-import json
 import pandas as pd
-import re
-import fitz
-import io               
+import time
+import uuid
+from dpdpa.batch import BatchRunner, BatchStore, expand_uploads
+from dpdpa.checklists import get_registry, industries, section_title
+from dpdpa.clauses import get_clause_index, interpret_question
+from dpdpa.engine import (
+    ESCALATION_CONFIDENCE, FAST_MODEL, MAX_CONCURRENT_SECTIONS, STRONG_MODEL, TIERED_MODEL, extract_text_from_pdf,
+    process_batch_document, read_document, run_evaluation_job, set_api_key
+)
+from dpdpa.evidence import (
+    DEFAULT_ANNOTATED_DIR, annotated_pdf, annotation_available, clear_annotated_pdfs, locate_evidence
+)
+from dpdpa.generator import (
+    LIFECYCLE_STAGES, PROFILE_FIELDS, build_clause_library, draft_coverage, get_clause_library, get_draft_store,
+    iter_assistant_draft, iter_lifecycle_template, iter_policy_draft, iter_section_completion, unwritten_items
+)
+from dpdpa.jobs import JobRunner, JobStore
+from dpdpa.metrics import estimate_cost, get_metrics_store
+from dpdpa.pdf import (
+    DEFAULT_OCR_CACHE_DIR, DEFAULT_PDF_CACHE_DIR, DOCUMENT_TTL_SECONDS, cache_directory_usage, load_span_index,
+    ocr_text_cache, pdf_text_cache
+)
+from dpdpa.reports import get_results_store, pasted_document_name
+from dpdpa.table import ResultTable, parquet_available
+from dpdpa.retrieval import DEFAULT_TOP_K
 
 # --- OpenAI Setup ---
-api_key = st.secrets["OPENAI_API_KEY"]
-client = openai.OpenAI(api_key=api_key)
-
-# --- Section Checklists ---
-dpdpa_checklists = {
-    "4": {
-        "title": "Grounds for Processing Personal Data",
-        "items": [
-            {"id" : "4.1", "text" : "The policy must state that personal data is processed **only as per the provisions of the Digital Personal Data Protection Act, 2023**."},
-            {"id" : "4.2", "text" : "The policy must confirm that personal data is processed **only for a lawful purpose**."},
-            {"id" : "4.3", "text" : "The policy must define **lawful purpose** as any purpose **not expressly forbidden by law**."},
-            {"id" : "4.4", "text" : "The policy must include a statement that personal data is processed **only with the consent of the Data Principal**."},
-            {"id" : "4.5", "text" : "Alternatively, the policy must specify that personal data is processed **for certain legitimate uses**, as defined under the Act."}
-        ]
-    },
-    "5": {
-        "title": "Notice",
-        "items": [
-            {"id" : "5.1", "text" : "The policy must state that **every request for consent** is accompanied or preceded by a **notice from the Data Fiduciary to the Data Principal**."},
-            {"id" : "5.2", "text" : "The notice must clearly specify the **personal data proposed to be processed**."},
-            {"id" : "5.3", "text" : "The notice must clearly specify the **purpose for which the personal data is proposed to be processed**."},
-            {"id" : "5.4", "text" : "The notice must explain the **manner in which the Data Principal can exercise her rights under Section 6(4)** (withdrawal of consent)."},
-            {"id" : "5.5", "text" : "The notice must explain the **manner in which the Data Principal can exercise her rights under Section 13** (grievance redressal)."},
-            {"id" : "5.6", "text" : "The notice must specify the **manner in which a complaint can be made to the Data Protection Board**."},
-            {"id" : "5.7", "text" : "If consent was obtained **before the commencement of the Act**, the policy must state that a notice will be sent **as soon as reasonably practicable**."},
-            {"id" : "5.8", "text" : "The post-commencement notice must mention the **personal data that has been processed**."},
-            {"id" : "5.9", "text" : "The post-commencement notice must mention the **purpose for which the personal data has been processed**."},
-            {"id" : "5.10", "text" : "The post-commencement notice must mention the **manner in which the Data Principal can exercise her rights under Section 6(4)**."},
-            {"id" : "5.11", "text" : "The post-commencement notice must mention the **manner in which the Data Principal can exercise her rights under Section 13**."},
-            {"id" : "5.12", "text" : "The post-commencement notice must mention the **manner in which a complaint can be made to the Board**."},
-            {"id" : "5.13", "text" : "The policy must mention that the Data Fiduciary **may continue to process personal data** until the Data Principal **withdraws her consent**."},
-            {"id" : "5.14", "text" : "The policy must provide the Data Principal an **option to access the contents of the notice** in **English or any language listed in the Eighth Schedule of the Constitution**."}
-        ]
-    },
-    "6": {
-        "title": "Consent",
-        "items": [
-            {"id" : "6.1", "text" : "The policy must state that **consent is free, specific, informed, unconditional, and unambiguous**, given through a **clear affirmative action**."},
-            {"id" : "6.2", "text" : "The policy must specify that **consent signifies agreement to process personal data only for the specified purpose**."},
-            {"id" : "6.3", "text" : "The policy must state that **consent is limited to such personal data as is necessary for the specified purpose**."},
-            {"id" : "6.4", "text" : "The policy must mention that **any part of the consent that violates this Act, rules under it, or any other law in force is invalid to that extent**."},
-            {"id" : "6.5", "text" : "The request for consent must be presented in **clear and plain language**."},
-            {"id" : "6.6", "text" : "The request for consent must allow the Data Principal to access it in **English or any language listed in the Eighth Schedule of the Constitution**."},
-            {"id" : "6.7", "text" : "The request for consent must provide **contact details of a Data Protection Officer** or **another authorised person** responsible for handling Data Principal queries."},
-            {"id" : "6.8", "text" : "The policy must clearly state that the **Data Principal has the right to withdraw consent at any time**."},
-            {"id" : "6.9", "text" : "The **ease of withdrawing consent** must be comparable to the **ease with which consent was given**."},
-            {"id" : "6.10", "text" : "The policy must mention that **consequences of withdrawal shall be borne by the Data Principal**."},
-            {"id" : "6.11", "text" : "The policy must state that **withdrawal does not affect the legality of data processing done before withdrawal**."},
-            {"id" : "6.12", "text" : "The policy must mention that upon withdrawal of consent, the **Data Fiduciary and its Data Processors must cease processing** the personal data **within a reasonable time**, unless permitted by law."},
-            {"id" : "6.13", "text" : "The policy must state that consent **can be managed, reviewed, or withdrawn through a Consent Manager**."},
-            {"id" : "6.14", "text" : "The policy must specify that the **Consent Manager is accountable to the Data Principal** and acts on her behalf."},
-            {"id" : "6.15", "text" : "The policy must specify that **every Consent Manager is registered with the Board** under prescribed conditions."},
-            {"id" : "6.16", "text" : "The policy must mention that, in case of dispute, the **Data Fiduciary must prove that proper notice was given and valid consent was obtained** as per the Act and its rules."}
-        ]
-    },
-    "7": {
-        "title": "Certain Legitimate Uses",
-        "items": [
-            {"id" : "7.1", "text" : "The policy must allow personal data to be processed for the **specified purpose for which the Data Principal voluntarily provided the data**, if she has **not indicated non-consent** to such use."},
-            {"id" : "7.2", "text" : "The policy must permit personal data to be processed by the State or its instrumentalities for providing or issuing **subsidy, benefit, service, certificate, licence, or permit**, as prescribed, where the Data Principal has **previously consented** to such processing."},
-            {"id" : "7.3", "text" : "The policy must allow personal data to be processed by the State or its instrumentalities if the data is **already available in digital or digitised form in notified government databases**, subject to prescribed standards and government policies."},
-            {"id" : "7.4", "text" : "The policy must allow personal data to be processed by the State or its instrumentalities for performing any **legal function** under existing Indian laws or **in the interest of sovereignty and integrity of India or State security**."},
-            {"id" : "7.5", "text" : "The policy must allow personal data to be processed to **fulfil a legal obligation** requiring any person to disclose information to the State or its instrumentalities, as per applicable laws."},
-            {"id" : "7.6", "text" : "The policy must permit personal data to be processed for **compliance with any judgment, decree, or order** issued under Indian law, or for **contractual or civil claims under foreign laws**."},
-            {"id" : "7.7", "text" : "The policy must allow personal data to be processed to **respond to a medical emergency** involving a **threat to life or immediate health risk** of the Data Principal or any individual."},
-            {"id" : "7.8", "text" : "The policy must allow personal data to be processed to **provide medical treatment or health services** during an **epidemic, outbreak, or other threat to public health**."},
-            {"id" : "7.9", "text" : "The policy must permit processing of personal data to **ensure safety of or provide assistance/services to individuals** during any **disaster or breakdown of public order**."},
-            {"id" : "7.10", "text" : "The policy must define 'disaster' in accordance with the **Disaster Management Act, 2005 (Section 2(d))**."},
-            {"id" : "7.11", "text" : "The policy must allow personal data to be processed for purposes related to **employment**, or to **safeguard the employer from loss or liability**, including prevention of corporate espionage, confidentiality of trade secrets or IP, and enabling services/benefits to employee Data Principals."}
-        ]
-    },
-    "8": {
-        "title": "General Obligations of Data Fiduciary",
-        "items": [
-            {"id" : "8.1", "text" : "The policy must state that the Data Fiduciary is responsible for complying with the Act and its rules, even if the Data Principal fails to perform her duties."},
-            {"id" : "8.2", "text" : "The policy must state that the Data Fiduciary may engage or involve a Data Processor **only under a valid contract** to process personal data for offering goods or services."},
-            {"id" : "8.3", "text" : "The policy must ensure that if personal data is used to make a decision affecting the Data Principal, the data must be **complete, accurate, and consistent**."},
-            {"id" : "8.4", "text" : "The policy must ensure that if personal data is disclosed to another Data Fiduciary, the data must be **complete, accurate, and consistent**."},
-            {"id" : "8.5", "text" : "The policy must require the Data Fiduciary to implement **appropriate technical and organisational measures** to ensure compliance with the Act and its rules."},
-            {"id" : "8.6", "text" : "The policy must mandate **reasonable security safeguards** to protect personal data from breaches, including breaches by its Data Processors."},
-            {"id" : "8.7", "text" : "The policy must state that in the event of a **personal data breach**, the Data Fiduciary shall **inform both the Board and each affected Data Principal** in the prescribed manner."},
-            {"id" : "8.8", "text" : "The policy must mandate that personal data be **erased upon withdrawal of consent** or as soon as it is reasonable to assume that the **specified purpose is no longer being served**, whichever is earlier."},
-            {"id" : "8.9", "text" : "The policy must mandate that the Data Fiduciary must **cause its Data Processors to erase the data** when retention is no longer justified."},
-            {"id" : "8.10", "text" : "The policy must define that the specified purpose is deemed no longer served if the Data Principal has neither **approached the Data Fiduciary for the purpose** nor **exercised her rights** within the prescribed time period."},
-            {"id" : "8.11", "text" : "The policy must require publishing the **business contact details** of the Data Protection Officer (if applicable) or of an authorised person able to respond to questions about personal data processing."},
-            {"id" : "8.12", "text" : "The policy must provide an **effective grievance redressal mechanism** for Data Principals."},
-            {"id" : "8.13", "text" : "The policy must clarify that a Data Principal is considered as **not having approached** the Data Fiduciary if she has not initiated contact in person, or through physical or electronic communication, for the purpose within a prescribed period."}
-        ]
+set_api_key(st.secrets["OPENAI_API_KEY"])
+
+def record_evaluation(document, policy_text, results, options, source):
+    # Every evaluated document feeds the Dashboard & Reports history and the Knowledge Assistant's clause index
+    get_results_store().add_run(document, results, industry=options.get("industry"), model=options.get("model"),
+                                source=source)
+    get_clause_index().add_document(document, policy_text, results)
+
+@st.cache_resource
+def get_batch_runner():
+    # One runner per server process; resume() picks up documents interrupted by a restart
+    runner = BatchRunner(BatchStore(), process_batch_document, on_complete=lambda doc, results: record_evaluation(
+        doc["name"], read_document(doc["name"], doc["data"]), results, doc, "batch"))
+    runner.resume()
+    return runner
+
+batch_runner = get_batch_runner()
+
+@st.fragment(run_every=2)
+def render_batch_progress(batch_id):
+    progress = batch_runner.store.progress(batch_id)
+    fraction = progress["finished"] / progress["total"] if progress["total"] else 0.0
+    st.progress(fraction, text=f"{progress['finished']} of {progress['total']} documents evaluated")
+    st.caption(
+        f"{progress['pending']} queued · {progress['running']} running · {progress['done']} done · "
+        f"{progress['error']} failed · {progress['docs_per_minute']:.1f} documents/minute"
+    )
+    if progress["total"] and progress["finished"] == progress["total"]:
+        st.rerun()
+
+# --- Result Tables & Exports ---
+# Finished jobs and batches never change, so each one's table is built once per server process and its
+# export files are only produced when a download button is clicked, then reused
+@st.cache_resource(max_entries=32, show_spinner=False)
+def get_batch_result_table(batch_id):
+    return ResultTable(batch_runner.store.result_documents(batch_id))
+
+@st.cache_resource(max_entries=32, show_spinner=False)
+def get_job_result_table(job_id):
+    job = job_runner.store.job(job_id)
+    results = job_runner.store.results(job_id)
+    # A single-section report keeps exporting the bare section object and its Matched Details, as it always has
+    single = len(job["section_ids"]) == 1 and len(results) == 1
+    return ResultTable([{"Document": job["options"].get("document") or job["label"], "Results": results}],
+                       results[0] if single else results, details_only=single)
+
+@st.cache_resource(max_entries=32, show_spinner=False)
+def get_job_evidence(job_id):
+    # Where each item's evidence is in the document; pages and boxes come from the PDF's span index
+    job = job_runner.store.job(job_id)
+    spans = load_span_index(job["options"]["pdf_key"]) if job["options"].get("pdf_key") else None
+    if spans is not None and not spans.matches(job["policy_text"]):
+        spans = None
+    return locate_evidence(job["policy_text"], job_runner.store.results(job_id), spans)
+
+def render_annotated_pdf_button(job, file_stem):
+    # Only offered for PDFs; the file is annotated on the first click and then served from the cache
+    pdf_key = job["options"].get("pdf_key")
+    if not annotation_available(pdf_key, job["policy_text"]):
+        return
+    st.download_button(
+        label="🖍️ Download Annotated PDF",
+        data=lambda: annotated_pdf(pdf_key, job["id"], job_runner.store.results(job["id"]), job["policy_text"]),
+        file_name=f"{file_stem}_Annotated.pdf", mime="application/pdf", on_click="ignore",
+        key=f"download-{job['id']}-annotated"
+    )
+
+def render_export_buttons(table, file_stem, labels):
+    # labels: {format: button label}; callables keep the files from being generated on every rerun
+    exports = {
+        "json": (table.to_json, "json", "application/json"),
+        "csv": (table.to_csv, "csv", "text/csv"),
+        "xlsx": (table.to_xlsx, "xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+        "parquet": (table.to_parquet, "parquet", "application/vnd.apache.parquet"),
     }
-}
+    for fmt, label in labels.items():
+        if fmt == "parquet" and not parquet_available():
+            continue
+        data, extension, mime = exports[fmt]
+        st.download_button(label=label, data=data, file_name=f"{file_stem}.{extension}", mime=mime,
+                           on_click="ignore", key=f"download-{file_stem}-{fmt}")
 
-# --- PDF Extractor ---
-def extract_text_from_pdf(pdf_file):
-    doc = fitz.open(stream=pdf_file.read(), filetype="pdf")
-    return "\n".join(page.get_text() for page in doc)
+@st.fragment
+def render_batch_items(table, batch_id):
+    # Filtering reruns only this table; the grid itself only draws the rows in view
+    statuses = st.segmented_control("Status", list(STATUS_COLORS) + ["Error"], selection_mode="multi",
+                                    default=list(STATUS_COLORS) + ["Error"], key=f"batch-{batch_id}-status")
+    items = table.items[table.export_columns]
+    st.dataframe(items[table.items["Status"].isin(statuses)], hide_index=True, use_container_width=True)
 
-# --- Prompt Generator ---
-def create_full_policy_prompt(section_id, full_policy_text, checklist):
-    checklist_text = "\n".join(
-        f"{item['id']}. {item['text']}" for item in checklist
+def render_batch_results(batch_id):
+    progress = batch_runner.store.progress(batch_id)
+    if progress["finished"] < progress["total"]:
+        render_batch_progress(batch_id)
+        return
+
+    st.success(
+        f"Batch {batch_id}: {progress['done']} documents evaluated, {progress['error']} failed "
+        f"in {progress['elapsed_seconds']:.0f}s ({progress['docs_per_minute']:.1f} documents/minute)"
+    )
+    batch_table = get_batch_result_table(batch_id)
+    st.markdown("#### Documents")
+    st.dataframe(batch_table.document_summary, hide_index=True, use_container_width=True)
+    st.markdown("#### Checklist items")
+    render_batch_items(batch_table, batch_id)
+
+    render_export_buttons(batch_table, f"DPDPA_Batch_{batch_id}", {
+        "csv": "📥 Download Batch CSV",
+        "xlsx": "📥 Download Batch XLSX",
+        "parquet": "📥 Download Batch Parquet",
+        "json": "📥 Download Batch JSON",
+    })
+
+@st.cache_resource
+def get_job_runner():
+    # Compliance checks run here rather than in the script thread; jobs interrupted by a restart are re-run
+    runner = JobRunner(JobStore(), run_evaluation_job, on_complete=lambda job, results: record_evaluation(
+        job["options"].get("document") or job["label"], job["policy_text"], results, job["options"], "checker"))
+    runner.resume()
+    return runner
+
+job_runner = get_job_runner()
+
+@st.fragment(run_every=1)
+def render_job_progress(job_id):
+    progress = job_runner.store.progress(job_id)
+    finished = progress["finished_sections"]
+    st.progress(
+        len(finished) / progress["total"] if progress["total"] else 0.0,
+        text=f"{len(finished)} of {progress['total']} sections evaluated · {progress['elapsed_seconds']:.0f}s"
     )
+    for sid in progress["section_ids"]:
+        title = section_title(sid)
+        if sid in finished:
+            st.markdown(f"✅ Section {sid} — {title}: done")
+        elif sid in progress["streamed_items"]:
+            # Verdicts streamed so far; the full report replaces them once the job completes
+            with st.container():
+                st.markdown(f"⏳ Section {sid} — {title}: receiving results...")
+                render_matched_items(progress["streamed_items"][sid])
+        else:
+            st.markdown(f"⏳ Section {sid} — {title}: {'waiting for GPT' if progress['status'] == 'running' else 'queued'}...")
+    if progress["status"] in ("done", "error"):
+        st.rerun()
+
+# --- Result Rendering ---
+def render_run_status(result):
+    if result.get("Error"):
+        st.error(f"Section {result['Section']} failed: {result['Error']}")
+    elif result.get("Incremental") and result["Incremental"]["Rechecked"]:
+        st.caption(f"♻️ Re-checked {len(result['Incremental']['Rechecked'])} items affected by edits "
+                   f"({', '.join(result['Incremental']['Rechecked'])}); reused "
+                   f"{len(result['Incremental']['Reused'])} verdicts from the previous run")
+    elif result.get("Cached"):
+        st.caption("⚡ Cached result — tick “Force refresh” to re-run GPT")
+    if result.get("Unanswered"):
+        st.warning(f"GPT gave no usable verdict for {', '.join(result['Unanswered'])} even after re-asking; "
+                   "these items are not scored and the result was not cached, so a re-run will ask again.")
+    if result.get("Parts"):
+        st.caption(f"🧩 Policy too long for one request: evaluated in {result['Parts']} overlapping parts")
+    if result.get("Tiers"):
+        tiers = result["Tiers"]
+        agreement = f" · agreed on {tiers['Agreement']:.0%}" if tiers["Agreement"] is not None else ""
+        st.caption(f"🪜 {tiers['Fast Model']} classified every item; {tiers['Strong Model']} re-checked "
+                   f"{len(tiers['Escalated'])} uncertain and {len(tiers['Audited'])} audited items{agreement}")
+    if result.get("Prescreened"):
+        st.caption(f"🔎 Resolved locally without GPT: {', '.join(result['Prescreened'])}")
+
+STATUS_COLORS = {
+    "Explicitly Mentioned": "#198754",
+    "Partially Mentioned": "#FFC107",
+    "Missing": "#DC3545"
+}
+LEVEL_COLORS = {
+    "Fully Compliant": "#198754",
+    "Partially Compliant": "#FFC107",
+    "Non-Compliant": "#DC3545"
+}
+MATCHED_DETAILS_PAGE_SIZE = 10
+
+def matched_item_markdown(item, located=None):
+    status = item.get("Status", "Missing")
+    color = STATUS_COLORS.get(status, "#6c757d")
+
+    item_id = item.get("Checklist Item ID", "❓")
+    item_text = item.get("Checklist Text", "❓")
+    justification = item.get("Justification", "No justification found.")
 
     return f"""
-    You are a compliance analyst evaluating whether the following full privacy policy meets DPDPA Section {section_id}: {dpdpa_checklists[section_id]['title']}.
-    
-    **Checklist:** Use the item numbers (e.g., 4.1, 4.2...) from the checklist below in your response. Do not rephrase or modify the checklist items. Evaluate strictly based on the original items.
-    
-    {checklist_text}
-    
-    **Full Policy Text:**
-    {full_policy_text}
-    
-    Instructions:
-    For each checklist item, search anywhere in the policy and classify it as:
-    - Explicitly Mentioned
-    - Partially Mentioned
-    - Missing
-    
-    Return output in this JSON format only:
-    {{
-      "Checklist Evaluation": [
-        {{
-          "Checklist Item ID": "4.1",
-          "Status": "Explicitly Mentioned",
-          "Justification": "..."
-        }},
-        ...
-      ],
-      "Match Level": "Fully Compliant / Partially Compliant / Non-Compliant",
-      "Compliance Score": 0.0,
-      "Suggested Rewrite": "...",
-      "Simplified Legal Meaning": "..."
-    }}
-    
-    Only return the JSON object. Do not include any commentary or explanation.
+    **{item_id} — {item_text}**  
+    <span style="color:white;background-color:{color};padding:3px 10px;border-radius:6px;font-size:13px;">{status}</span>  
+    <br><small>📝 {justification}</small>
+    {f"<br><small>📎 {item['Source Passage']}</small>" if item.get("Source Passage") else ""}
+    {f"<br><small>📍 Evidence on page {located['page']}</small>" if located and located.get("page") else ""}
     """
-# --- GPT Call ---
-def call_gpt(prompt, model="gpt-4"):
-    response = client.chat.completions.create(
-        model=model,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0
-    )
-    return json.loads(response.choices[0].message.content)
 
-def analyze_policy_section(section_id, checklist, policy_text, model="gpt-4"):
-    prompt = create_full_policy_prompt(section_id, policy_text, checklist)
-    
-    try:
-        result = call_gpt(prompt, model=model)
-    except Exception as e:
-        return {
-            "Section": section_id,
-            "Title": dpdpa_checklists[section_id]['title'],
-            "Error": str(e),
-            "Match Level": "Error",
-            "Compliance Score": 0.0,
-            "Matched Details": [],
-            "Checklist Items Matched": [],
-            "Suggested Rewrite": "",
-            "Simplified Legal Meaning": ""
-        }
+def render_matched_items(items, evidence=None):
+    # One markdown element for the whole list instead of one per item
+    evidence = evidence or {}
+    if items:
+        st.markdown("\n\n".join(matched_item_markdown(item, evidence.get(item.get("Checklist Item ID")))
+                                  for item in items), unsafe_allow_html=True)
 
-    checklist_dict = {item["id"]: item["text"] for item in checklist}
-    evaluations = []
-
-    matched_count = 0
-    partial_count = 0
-
-    for item in result.get("Checklist Evaluation", []):
-        item_id = item.get("Checklist Item ID", "").strip()
-        status = item.get("Status", "Missing").strip()
-        justification = item.get("Justification", "").strip()
-        text = checklist_dict.get(item_id, "❓")
-
-        if status == "Explicitly Mentioned":
-            matched_count += 1
-        elif status == "Partially Mentioned":
-            partial_count += 1
-
-        evaluations.append({
-            "Checklist Item ID": item_id,
-            "Checklist Text": text,
-            "Status": status,
-            "Justification": justification
-        })
-
-    score = (matched_count + 0.5 * partial_count) / len(checklist) if checklist else 0
-    level = (
-        "Fully Compliant" if score == 1 else
-        "Non-Compliant" if score == 0 else
-        "Partially Compliant"
-    )
+def render_matched_details(details, key, evidence=None):
+    # Filtered and paged, so a rerun only ever draws one page of cards however many items there are
+    counts = {status: sum(1 for d in details if d.get("Status") == status) for status in STATUS_COLORS}
+    col1, col2 = st.columns([4, 1])
+    with col1:
+        statuses = st.segmented_control(
+            "Status", list(STATUS_COLORS), selection_mode="multi", default=list(STATUS_COLORS),
+            format_func=lambda status: f"{status} ({counts[status]})", key=f"{key}-status"
+        )
+    with col2:
+        # The table is sorted and searched in the browser and only draws the rows in view
+        table_view = st.toggle("Table view", key=f"{key}-table")
+    shown = [d for d in details if d.get("Status") in statuses or d.get("Status") not in STATUS_COLORS]
+    if not shown:
+        st.caption("No items with the selected status.")
+        return
+    if table_view:
+        pages = {item_id: e["page"] for item_id, e in (evidence or {}).items() if e.get("page")}
+        shown = [dict(d, Page=pages[d.get("Checklist Item ID")]) if d.get("Checklist Item ID") in pages else d
+                 for d in shown]
+        columns = [c for c in ["Checklist Item ID", "Checklist Text", "Status", "Justification", "Page",
+                               "Source Passage", "Confidence"] if any(c in d for d in shown)]
+        frame = pd.DataFrame(shown, columns=columns)
+        if "Page" in frame:
+            frame["Page"] = frame["Page"].astype("Int64")
+        st.dataframe(frame, hide_index=True, use_container_width=True)
+        return
 
-    return {
-        "Section": section_id,
-        "Title": dpdpa_checklists[section_id]['title'],
-        "Match Level": result.get("Match Level", level),
-        "Compliance Score": round(score, 2),
-        "Matched Details": evaluations,
-        "Checklist Items Matched": [f"{e['Checklist Item ID']} — {e['Checklist Text']}" for e in evaluations if e["Status"] in ["Explicitly Mentioned", "Partially Mentioned"]],
-        "Suggested Rewrite": result.get("Suggested Rewrite", ""),
-        "Simplified Legal Meaning": result.get("Simplified Legal Meaning", "")
-    }
+    pages = -(-len(shown) // MATCHED_DETAILS_PAGE_SIZE)
+    page = 1
+    if pages > 1:
+        # A narrower filter can leave fewer pages than the one last shown
+        if st.session_state.get(f"{key}-page", 1) > pages:
+            st.session_state[f"{key}-page"] = pages
+        page = st.number_input("Page", min_value=1, max_value=pages, step=1, key=f"{key}-page")
+    start = (page - 1) * MATCHED_DETAILS_PAGE_SIZE
+    render_matched_items(shown[start:start + MATCHED_DETAILS_PAGE_SIZE], evidence)
+    st.caption(f"Showing {start + 1}–{min(start + MATCHED_DETAILS_PAGE_SIZE, len(shown))} of {len(shown)} items")
+
+@st.fragment
+def render_section_result(result, key, label="", exports=None, evidence=None):
+    # One section's report; its filters, pages and downloads rerun only this fragment, not the whole page.
+    # exports: (table, file stem, labels) for render_export_buttons; evidence: from locate_evidence
+    render_run_status(result)
+    with st.expander(label, expanded=True):
+        match_level = result["Match Level"]
+        color = LEVEL_COLORS.get(match_level, "#6C757D")  # fallback grey
+
+        st.markdown(f"""
+        <div style="margin-bottom: 1rem;">
+          <b>Compliance Score:</b>
+          <span style="background-color:#0d6efd; color:white; padding:4px 10px; border-radius:5px; font-size:0.85rem;">
+            {result["Compliance Score"]}
+          </span><br>
+          <b>Match Level:</b>
+          <span style="background-color:{color}; color:black; padding:4px 10px; border-radius:5px; font-size:0.85rem;">
+            {match_level}
+          </span>
+        </div>
+        """, unsafe_allow_html=True)
+
+        st.markdown("### 📋 Checklist Items Matched:")
+        if result["Checklist Items Matched"]:
+            st.markdown("\n".join(f"- {item}" for item in result["Checklist Items Matched"]))
+
+        st.markdown("### 🔍 Matched Details:")
+        render_matched_details(result["Matched Details"], key, evidence)
+
+        st.markdown("### ✏️ Suggested Rewrite:")
+        st.info(result["Suggested Rewrite"])
+
+        st.markdown("### 🧾 Simplified Legal Meaning:")
+        st.success(result["Simplified Legal Meaning"])
+
+        if exports is not None:
+            render_export_buttons(*exports)
 
 def set_custom_css():
     st.markdown("""
@@ -342,6 +437,38 @@ def set_custom_css():
     </style>
     """, unsafe_allow_html=True)
 
+# --- Policy Drafts ---
+def stream_draft(kind, chunks, prefix="", gaps=None):
+    # Streams a generated draft onto the page, then hands it to the tab's editor.
+    # gaps: called afterwards for the item ids GPT could not write a library clause for
+    try:
+        text = st.write_stream(chunks)
+    except Exception as e:
+        st.error(f"❌ Draft generation failed: {e}")
+        return
+    st.session_state[f"draft-{kind}"] = prefix + (text if isinstance(text, str) else "".join(map(str, text)))
+    st.session_state[f"draft-gaps-{kind}"] = gaps() if gaps else []
+    st.rerun()
+
+def render_draft_editor(kind, default_name, industry):
+    if f"draft-{kind}" not in st.session_state:
+        return
+    gaps = st.session_state.get(f"draft-gaps-{kind}")
+    if gaps:
+        st.warning(f"⚠️ GPT did not return usable clauses for {', '.join(gaps)}; they are marked "
+                   "[To be completed] and will be requested again in an hour.")
+    st.text_area("✏️ Edit draft", height=400, key=f"draft-{kind}")
+    content = st.session_state[f"draft-{kind}"]
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        name = st.text_input("Draft name", value=default_name, key=f"draft-name-{kind}")
+    with col2:
+        st.download_button("⬇️ Download (.md)", content, file_name=f"{name or default_name}.md",
+                           mime="text/markdown", key=f"draft-download-{kind}")
+    if st.button("💾 Save Draft", key=f"draft-save-{kind}"):
+        draft_store_id = get_draft_store().save(name or default_name, content, kind=kind, industry=industry)
+        st.success(f"Saved as draft #{draft_store_id}; find it under Saved Drafts.")
+
 # --- Sidebar Navigation ---
 st.set_page_config(page_title="DPDPA Compliance Tool", layout="wide")
 set_custom_css()
@@ -372,36 +499,113 @@ if menu == "Homepage":
 # --- Policy Generator ---
 elif menu == "Policy Generator":
     st.title("Create a new Policy")
+    draft_store = get_draft_store()
+    col1, col2 = st.columns(2)
+    with col1:
+        generator_industry = st.selectbox("Industry", ["General"] + industries(), key="generator-industry")
+    with col2:
+        generator_model = st.selectbox("Model", [STRONG_MODEL, FAST_MODEL], key="generator-model")
+    generator_pack = None if generator_industry == "General" else generator_industry
+    generator_registry = get_registry(generator_pack)
+    st.caption("Drafts are assembled from a cached library of compliant clauses (one per checklist item and "
+               "industry); GPT is only asked to tailor them. The first draft for an industry writes its library.")
+
+    with st.expander("🏢 Organisation details", expanded=True):
+        profile_cols = st.columns(2)
+        profile = {
+            field: profile_cols[n % 2].text_input(label, key=f"profile-{field}")
+            for n, (field, label) in enumerate(PROFILE_FIELDS.items())
+        }
+
     tab1, tab2, tab3, tab4, tab5 = st.tabs([
         "Full Policy Generator", "Section-wise Generator", "Lifecycle-wise Template", 
         "GPT Draft Assistant", "Saved Drafts"])
 
     with tab1:
         st.subheader("Full Policy Generator")
-        st.text_area("Enter your complete policy draft:", height=300)
-        st.button("Generate Suggestions with GPT")
+        full_sections = st.multiselect("Sections", list(generator_registry.sections),
+                                       default=list(generator_registry.sections),
+                                       format_func=lambda sid: generator_registry.section_labels[sid])
+        description = st.text_area("Describe the personal data you process and why (optional, tailors the "
+                                   "introduction):", height=150, key="generator-description")
+        if st.button("📝 Generate Policy", key="generate-full") and full_sections:
+            with st.spinner("Drafting policy..."):
+                stream_draft("full", iter_policy_draft(dict(profile, description=description), full_sections,
+                                                       generator_pack, generator_model),
+                             gaps=lambda: unwritten_items(full_sections, generator_pack))
+        render_draft_editor("full", "Full Policy", generator_pack)
 
     with tab2:
         st.subheader("Section-wise Generator")
-        section = st.selectbox("Choose Section", ["Notice", "Consent", "Data Principal Rights", "Security"])
-        st.text_area(f"Draft for {section}:", height=200)
-        st.button("Suggest Completion")
+        section = st.selectbox("Choose Section", list(generator_registry.sections),
+                               format_func=lambda sid: generator_registry.section_labels[sid])
+        section_draft = st.text_area(f"Draft for {generator_registry.title(section)}:", height=200,
+                                     key="generator-section-draft")
+        if st.button("✨ Suggest Completion", key="generate-section"):
+            with st.spinner("Checking the draft against the checklist..."):
+                covered, missing = draft_coverage(section_draft, section, generator_pack)
+            if not missing:
+                st.success(f"✅ The draft already covers all {len(covered)} checklist items of this section.")
+            else:
+                st.caption(f"{len(covered)} of {len(covered) + len(missing)} items already covered; adding "
+                           f"{', '.join(item['id'] for item in missing)}.")
+                stream_draft("section", iter_section_completion(section_draft, section, missing, profile,
+                                                                generator_pack, generator_model),
+                             prefix=f"{section_draft.rstrip()}\n\n" if section_draft.strip() else "",
+                             gaps=lambda: [item_id for item_id in unwritten_items([section], generator_pack)
+                                           if any(item["id"] == item_id for item in missing)])
+        render_draft_editor("section", f"Section {section}", generator_pack)
 
     with tab3:
         st.subheader("Lifecycle-wise Template")
         st.markdown("Fill stage-specific privacy info:")
-        stages = ["Collection", "Processing", "Storage", "Sharing", "Erasure"]
-        for stage in stages:
-            st.text_area(f"{stage} Stage", key=stage)
+        stage_notes = {stage: st.text_area(f"{stage} Stage", key=stage) for stage in LIFECYCLE_STAGES}
+        if st.button("🧩 Build Template", key="generate-lifecycle"):
+            with st.spinner("Assembling template..."):
+                stream_draft("lifecycle", iter_lifecycle_template(stage_notes, profile, generator_pack,
+                                                                  generator_model),
+                             gaps=lambda: unwritten_items(generator_registry.sections, generator_pack))
+        render_draft_editor("lifecycle", "Lifecycle Template", generator_pack)
 
     with tab4:
         st.subheader("GPT-Assisted Draft Builder")
         prompt = st.text_input("Describe your need (e.g. privacy for HR data):")
-        st.button("Generate Draft")
+        if st.button("🤖 Generate Draft", key="generate-assistant") and prompt.strip():
+            with st.spinner("Drafting..."):
+                stream_draft("assistant", iter_assistant_draft(prompt, profile, generator_pack, generator_model))
+        render_draft_editor("assistant", prompt.strip() or "Draft", generator_pack)
 
     with tab5:
         st.subheader("Saved Drafts")
-        st.dataframe({"Draft": ["HR Policy", "Marketing Policy"], "Last Modified": ["2025-05-10", "2025-05-01"]})
+        saved = draft_store.drafts()
+        if not saved:
+            st.info("No saved drafts yet. Generate one in another tab and save it.")
+        else:
+            drafts_df = pd.DataFrame(saved)
+            for column in ("created", "updated"):
+                drafts_df[column] = pd.to_datetime(drafts_df[column], unit="s").dt.strftime("%Y-%m-%d %H:%M")
+            st.dataframe(drafts_df.drop(columns=["id"]).rename(columns={
+                "name": "Draft", "kind": "Type", "industry": "Industry", "characters": "Characters",
+                "created": "Created", "updated": "Last Modified"
+            }), use_container_width=True, hide_index=True)
+
+            names = {d["id"]: f"{d['name']} (#{d['id']})" for d in saved}
+            draft_id = st.selectbox("Open draft", list(names), format_func=names.get)
+            draft = draft_store.get(draft_id)
+            name = st.text_input("Name", value=draft["name"], key=f"saved-name-{draft_id}")
+            content = st.text_area("Content", value=draft["content"], height=400, key=f"saved-content-{draft_id}")
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                if st.button("💾 Save Changes", key="saved-update"):
+                    draft_store.save(name, content, draft_id=draft_id)
+                    st.success("Draft saved.")
+            with col2:
+                st.download_button("⬇️ Download (.md)", content, file_name=f"{name}.md", mime="text/markdown",
+                                   key="saved-download")
+            with col3:
+                if st.button("🗑️ Delete Draft", key="saved-delete"):
+                    draft_store.delete(draft_id)
+                    st.rerun()
 
 # --- Policy Compliance Checker ---
 elif menu == "Policy Compliance Checker":
@@ -412,9 +616,11 @@ elif menu == "Policy Compliance Checker":
     #st.header("1. Upload Your Policy Document")
     st.markdown("<h3 style='font-size:24px; font-weight:700;'>1. Upload Your Policy Document</h3>", unsafe_allow_html=True)
 
-    upload_option = st.radio("Choose input method:", ["Paste text", "Upload PDF"])
+    upload_option = st.radio("Choose input method:", ["Paste text", "Upload PDF", "Batch (multiple files / ZIP)"])
     if upload_option == "Paste text":
         policy_text = st.text_area("Paste your Privacy Policy text:", height=300)
+        document_name = pasted_document_name(policy_text)
+        pdf_key = None
     elif upload_option == "Upload PDF":
         uploaded_pdf = st.file_uploader("Upload PDF file", type="pdf", label_visibility="collapsed")
 
@@ -427,205 +633,453 @@ elif menu == "Policy Compliance Checker":
             </div>
             """, unsafe_allow_html=True)
 
-            policy_text = extract_text_from_pdf(uploaded_pdf)
+            progress_bar = st.progress(0.0, text="Extracting text from PDF...")
+            extraction = {}
+            policy_text = extract_text_from_pdf(
+                uploaded_pdf,
+                progress=lambda done, total, stage: progress_bar.progress(
+                    done / total,
+                    text=f"Extracted page {done} of {total}" if stage == "text"
+                    else f"Running OCR on scanned page {done} of {total}"
+                ),
+                stats=extraction
+            )
+            progress_bar.empty()
+            document_name = uploaded_pdf.name
+            # Identifies the stored file and its span index, for evidence pages and the annotated PDF
+            pdf_key = extraction.get("key")
+            if extraction.get("ocr_pages") or extraction.get("ocr_cached"):
+                st.caption(f"🔍 {extraction['ocr_pages'] + extraction['ocr_cached']} of {extraction['pages']} pages "
+                           f"had no text layer and were read with OCR ({extraction['ocr_seconds']:.1f}s).")
+            if extraction.get("ocr_unavailable"):
+                st.warning(f"⚠️ {extraction['ocr_unavailable']} pages look scanned, but Tesseract OCR is not "
+                           "installed on the server, so their text is missing from the check.")
         else:
             policy_text = ""
+            pdf_key = None
+    elif upload_option == "Batch (multiple files / ZIP)":
+        batch_files = st.file_uploader("Upload PDFs, text files or a ZIP of them", type=["pdf", "txt", "zip"],
+                                       accept_multiple_files=True, label_visibility="collapsed")
+        policy_text = ""
+        pdf_key = None
 
     #st.header("4. Industry Context (Optional)")
     st.markdown("<h3 style='font-size:24px; font-weight:700;'>2. Industry Context (Optional)</h3>", unsafe_allow_html=True)
-    industry = st.selectbox("", ["General", "Automotive", "Healthcare", "Fintech", "Other"])
+    industry = st.selectbox("", ["General"] + industries() + ["Other"])
     if industry == "Other":
         custom_industry = st.text_input("Specify your industry")
     else:
         custom_industry = None
+    # Industry packs add sector-specific items to the base sections; "General" and "Other" use the base checklists
+    pack_industry = industry if industry in industries() else None
+    registry = get_registry(pack_industry)
+    if pack_industry:
+        added = len(registry.item_text) - len(get_registry().item_text)
+        st.caption(f"🏷️ {added} {industry}-specific checklist items added · checklist version {registry.version}")
 
     st.markdown("<h3 style='font-size:24px; font-weight:700;'>3. Choose DPDPA Section</h3>", unsafe_allow_html=True)
     # section_options = list(dpdpa_checklists.keys()) + ["All Sections"]
-    section_options = [f"{sid} — {dpdpa_checklists[sid]['title']}" for sid in dpdpa_checklists] + ["All Sections"]
+    section_options = list(registry.section_labels.values()) + ["All Sections"]
     section_id = st.selectbox("", options=section_options)
+    if section_id == "All Sections":
+        evaluation_mode = st.radio(
+            "Evaluation mode:", ["Per-section (parallel)", "Batched (single request)"], horizontal=True,
+            help="Batched sends the policy once with every checklist item; per-section sends it once per section."
+        )
+        max_workers = st.slider("Parallel GPT calls", min_value=1, max_value=len(registry.sections),
+                                value=MAX_CONCURRENT_SECTIONS,
+                                help="Lower this if your OpenAI account hits rate limits.")
+    use_retrieval = st.checkbox(
+        "Only send relevant passages to GPT (recommended for long policies)", value=False,
+        help="Ranks the policy's paragraphs against each checklist item locally and sends only the top matches."
+    )
+    top_k = st.slider("Passages per checklist item", min_value=1, max_value=10, value=DEFAULT_TOP_K) if use_retrieval else None
+    prescreen = st.checkbox(
+        "Resolve obvious items locally before calling GPT", value=True,
+        help="Items whose wording is found verbatim (e.g. the DPDP Act, 2023 reference, DPO contact details, "
+             "grievance redressal) are marked Explicitly Mentioned without a GPT call."
+    )
+    tiered = st.checkbox(
+        f"Tiered models ({FAST_MODEL} first, {STRONG_MODEL} only for uncertain items)", value=False,
+        help=f"{FAST_MODEL} classifies every item with a confidence; Partially Mentioned items and verdicts below "
+             f"{ESCALATION_CONFIDENCE:.0%} confidence are re-checked by {STRONG_MODEL}."
+    )
+    model = TIERED_MODEL if tiered else "gpt-4"
+    force_refresh = st.checkbox("Force refresh (ignore cached results)", value=False)
+    incremental = st.checkbox(
+        "Only re-check items affected by edits since the last run", value=True,
+        help="Compares the policy with the previous run paragraph by paragraph and reuses verdicts for "
+             "checklist items whose relevant passages did not change."
+    )
+    # Previous run's per-section snapshots, reused by incremental re-evaluation
+    section_snapshots = st.session_state.setdefault("section_snapshots", {}) if incremental else None
 
     st.markdown("<h3 style='font-size:24px; font-weight:700;'>4. Run Compliance Check</h3>", unsafe_allow_html=True)
     if st.button("Run Compliance Check"):
-        if policy_text:
-            result = []
-            with st.spinner("Running GPT-based compliance evaluation..."):
-                if section_id == "All Sections":
-                    all_results = []  # 🔁 collect each section's result
-
-                    for sid in dpdpa_checklists:
-                        st.markdown(f"## ✅ Processing Section {sid} — {dpdpa_checklists[sid]['title']}")
-                        checklist = dpdpa_checklists[sid]["items"]
-                        result = analyze_policy_section(sid, checklist, policy_text)
-                        all_results.append(result)
-            
-                        with st.expander(f"Section {result['Section']} — {result['Title']}", expanded=True):
-                            level_color = {
-                                "Fully Compliant": "#198754",
-                                "Partially Compliant": "#FFC107",
-                                "Non-Compliant": "#DC3545"
-                            }
-                            match_level = result["Match Level"]
-                            color = level_color.get(match_level, "#6C757D")
-            
-                            st.markdown(f"""
-                            <div style="margin-bottom: 1rem;">
-                              <b>Compliance Score:</b>
-                              <span style="background-color:#0d6efd; color:white; padding:4px 10px; border-radius:5px; font-size:0.85rem;">
-                                {result["Compliance Score"]}
-                              </span><br>
-                              <b>Match Level:</b>
-                              <span style="background-color:{color}; color:black; padding:4px 10px; border-radius:5px; font-size:0.85rem;">
-                                {match_level}
-                              </span>
-                            </div>
-                            """, unsafe_allow_html=True)
-            
-                            st.markdown("### 📋 Checklist Items Matched:")
-                            for item in result["Checklist Items Matched"]:
-                                st.markdown(f"- {item}")
-            
-                            st.markdown("### 🔍 Matched Details:")
-                            for item in result["Matched Details"]:
-                                status = item.get("Status", "Missing")
-                                badge_color = {
-                                    "Explicitly Mentioned": "#198754",
-                                    "Partially Mentioned": "#FFC107",
-                                    "Missing": "#DC3545"
-                                }.get(status, "#6c757d")
-            
-                                st.markdown(f"""
-                                **{item['Checklist Item ID']} — {item['Checklist Text']}**  
-                                <span style="color:white;background-color:{badge_color};padding:3px 10px;border-radius:6px;font-size:13px;">{status}</span>  
-                                <br><small>📝 {item.get("Justification", "No justification")}</small>
-                                """, unsafe_allow_html=True)
-            
-                            st.markdown("### ✏️ Suggested Rewrite:")
-                            st.info(result["Suggested Rewrite"])
-            
-                            st.markdown("### 🧾 Simplified Legal Meaning:")
-                            st.success(result["Simplified Legal Meaning"])
-            
-                    # ✅ Combined Export Section
-                    st.markdown("## 📥 Export Combined Results")
-            
-                    # --- JSON Export ---
-                    combined_json = json.dumps(all_results, indent=2)
-                    combined_json_bytes = io.BytesIO(combined_json.encode("utf-8"))
-                    st.download_button(
-                        label="📥 Download Combined JSON",
-                        data=combined_json_bytes,
-                        file_name="DPDPA_All_Sections_Combined.json",
-                        mime="application/json"
-                    )
-            
-                    # --- CSV Export ---
-                    combined_rows = []
-                    for result in all_results:
-                        for item in result["Matched Details"]:
-                            combined_rows.append({
-                                "Section": result["Section"],
-                                "Checklist Item ID": item["Checklist Item ID"],
-                                "Checklist Text": item["Checklist Text"],
-                                "Status": item["Status"],
-                                "Justification": item["Justification"],
-                                "Match Level": result["Match Level"],
-                                "Score": result["Compliance Score"]
-                            })
-            
-                    combined_csv = pd.DataFrame(combined_rows)
-                    combined_csv_bytes = io.BytesIO()
-                    combined_csv.to_csv(combined_csv_bytes, index=False)
-                    combined_csv_bytes.seek(0)
-            
-                    st.download_button(
-                        label="📥 Download Combined CSV",
-                        data=combined_csv_bytes,
-                        file_name="DPDPA_All_Sections_Evaluation.csv",
-                        mime="text/csv"
-                    )
-                else:
-                    section_num = section_id.split(" — ")[0] if " — " in section_id else section_id
-                    checklist = dpdpa_checklists[section_num]['items']
-
-                    result = analyze_policy_section(section_num, checklist, policy_text)
+        if upload_option == "Batch (multiple files / ZIP)":
+            documents = expand_uploads([(f.name, f.getvalue()) for f in batch_files or []])
+            if documents:
+                batch_sections = (list(registry.sections) if section_id == "All Sections"
+                                  else [section_id.split(" — ")[0]])
+                batch_id = batch_runner.store.create_batch(documents, batch_sections, model, pack_industry)
+                batch_runner.wake()
+                # Kept in the URL so a browser refresh reattaches to the running batch
+                st.query_params["batch"] = batch_id
+            else:
+                st.warning("Upload at least one PDF or text file (directly or inside a ZIP).")
+        elif policy_text:
+            job_sections = (list(registry.sections) if section_id == "All Sections"
+                            else [section_id.split(" — ")[0] if " — " in section_id else section_id])
+            job_options = {
+                "mode": ("batched" if section_id == "All Sections" and evaluation_mode == "Batched (single request)"
+                         else "per-section"),
+                "model": model,
+                "max_workers": max_workers if section_id == "All Sections" else 1,
+                "top_k": top_k,
+                "force_refresh": force_refresh,
+                "prescreen": prescreen,
+                "industry": pack_industry,
+                "document": document_name,
+                "pdf_key": pdf_key,
+                # GPT calls are queued per browser session, so one analyst's run cannot starve the others
+                "session": st.session_state.setdefault("session_key", uuid.uuid4().hex),
+            }
+            # The check runs in a background worker; this script only polls the job store,
+            # so widget changes, downloads and closed tabs no longer throw a running evaluation away
+            job_id = job_runner.submit(section_id, job_sections, policy_text, job_options, snapshots=section_snapshots)
+            st.session_state.setdefault("jobs", []).append(job_id)
+            st.query_params["job"] = job_id
+
+    if upload_option != "Batch (multiple files / ZIP)":
+        session_jobs = job_runner.store.jobs(st.session_state.get("jobs", []))
+        current_job = st.query_params.get("job")
+        if len(session_jobs) > 1:
+            job_ids = [j["id"] for j in session_jobs]
+            selected_job = st.selectbox(
+                "Checks in this session", job_ids,
+                index=job_ids.index(current_job) if current_job in job_ids else 0,
+                format_func=lambda jid: next(
+                    f"{j['label']} — {time.strftime('%H:%M:%S', time.localtime(j['created_at']))} ({j['status']})"
+                    for j in session_jobs if j["id"] == jid
+                )
+            )
+            if selected_job != current_job:
+                current_job = st.query_params["job"] = selected_job
+
+        job = job_runner.store.job(current_job) if current_job else None
+        if job and job["status"] in ("pending", "running"):
+            render_job_progress(job["id"])
+        elif job:
+            if job["status"] == "error":
+                st.error(f"Compliance check failed: {job['error']}")
+            job_table = get_job_result_table(job["id"])
+            job_evidence = get_job_evidence(job["id"])
+            if len(job["section_ids"]) > 1:
+                for result in job_runner.store.results(job["id"]):
+                    st.markdown(f"## ✅ Processing Section {result['Section']} — {result['Title']}")
+                    render_section_result(result, f"{job['id']}-{result['Section']}",
+                                          label=f"Section {result['Section']} — {result['Title']}",
+                                          evidence=job_evidence)
+
+                # ✅ Combined Export Section
+                st.markdown("## 📥 Export Combined Results")
+                render_export_buttons(job_table, "DPDPA_All_Sections_Combined", {
+                    "json": "📥 Download Combined JSON",
+                    "csv": "📥 Download Combined CSV",
+                    "xlsx": "📥 Download Combined XLSX",
+                    "parquet": "📥 Download Combined Parquet",
+                })
+                render_annotated_pdf_button(job, "DPDPA_All_Sections")
+            else:
+                for result in job_runner.store.results(job["id"]):
                     st.markdown(f"""
                     <div style='font-size:20px; font-weight:700; margin-top:25px; margin-bottom:-10px;'>
                     📘 Section {result['Section']} — {result['Title']}
                     </div>
                     """, unsafe_allow_html=True)
-                    
-                    with st.expander("", expanded=True):
-
-                        # Set color for Match Level badge
-                        level_color = {
-                            "Fully Compliant": "#198754",     # green
-                            "Partially Compliant": "#FFC107", # yellow
-                            "Non-Compliant": "#DC3545"        # red
+                    render_section_result(result, f"{job['id']}-{result['Section']}", exports=(
+                        job_table, f"DPDPA_Section_{result['Section']}", {
+                            "json": "📥 Download JSON Report",
+                            "csv": "📥 Download Checklist Evaluation CSV",
                         }
-                        match_level = result["Match Level"]
-                        color = level_color.get(match_level, "#6C757D")  # fallback grey
-                        
-                        st.markdown(f"""
-                        <div style="margin-bottom: 1rem;">
-                          <b>Compliance Score:</b>
-                          <span style="background-color:#0d6efd; color:white; padding:4px 10px; border-radius:5px; font-size:0.85rem;">
-                            {result["Compliance Score"]}
-                          </span><br>
-                          <b>Match Level:</b>
-                          <span style="background-color:{color}; color:black; padding:4px 10px; border-radius:5px; font-size:0.85rem;">
-                            {match_level}
-                          </span>
-                        </div>
-                        """, unsafe_allow_html=True)
-
-                    
-                        st.markdown("### 📋 Checklist Items Matched:")
-                        for i, item in enumerate(result["Checklist Items Matched"]):
-                            st.markdown(f"- {item}")
-            
-                        st.markdown("### 🔍 Matched Details:")
-                        for item in result["Matched Details"]:
-                            status = item.get("Status", "Missing")
-                            color = {
-                                "Explicitly Mentioned": "#198754",
-                                "Partially Mentioned": "#FFC107",
-                                "Missing": "#DC3545"
-                            }.get(status, "#6c757d")
-                        
-                            item_id = item.get("Checklist Item ID", "❓")
-                            item_text = item.get("Checklist Text", "❓")
-                            justification = item.get("Justification", "No justification found.")
-                        
-                            st.markdown(f"""
-                        **{item_id} — {item_text}**  
-                        <span style="color:white;background-color:{color};padding:3px 10px;border-radius:6px;font-size:13px;">{status}</span>  
-                        <br><small>📝 {justification}</small>
-                        """, unsafe_allow_html=True)
-                    
-                        st.markdown("### ✏️ Suggested Rewrite:")
-                        st.info(result["Suggested Rewrite"])
-                    
-                        st.markdown("### 🧾 Simplified Legal Meaning:")
-                        st.success(result["Simplified Legal Meaning"])
-
-                        # --- JSON Export ---
-                        json_str = json.dumps(result, indent=2)
-                        json_bytes = io.BytesIO(json_str.encode("utf-8"))
-                        st.download_button(
-                            label="📥 Download JSON Report",
-                            data=json_bytes,
-                            file_name=f"DPDPA_Section_{result['Section']}.json",
-                            mime="application/json"
-                        )
-                        
-                        # --- CSV Export ---
-                        csv_df = pd.DataFrame(result["Matched Details"])
-                        csv_bytes = io.BytesIO()
-                        csv_df.to_csv(csv_bytes, index=False)
-                        csv_bytes.seek(0)
-                        st.download_button(
-                            label="📥 Download Checklist Evaluation CSV",
-                            data=csv_bytes,
-                            file_name=f"DPDPA_Section_{result['Section']}.csv",
-                            mime="text/csv"
-                        )
+                    ), evidence=job_evidence)
+                    render_annotated_pdf_button(job, f"DPDPA_Section_{result['Section']}")
+
+    if upload_option == "Batch (multiple files / ZIP)":
+        st.markdown("<h3 style='font-size:24px; font-weight:700;'>5. Batch Progress & Results</h3>", unsafe_allow_html=True)
+        recent_batches = batch_runner.store.list_batches()
+        batch_ids = [b["id"] for b in recent_batches]
+        current_batch = st.query_params.get("batch")
+        if batch_ids:
+            selected_batch = st.selectbox(
+                "Batch", batch_ids,
+                index=batch_ids.index(current_batch) if current_batch in batch_ids else 0,
+                format_func=lambda bid: next(
+                    f"{bid} — {b['documents']} documents, started {time.strftime('%Y-%m-%d %H:%M', time.localtime(b['created_at']))}"
+                    for b in recent_batches if b["id"] == bid
+                )
+            )
+            if selected_batch != current_batch:
+                st.query_params["batch"] = selected_batch
+            render_batch_results(selected_batch)
+        else:
+            st.info("No batches yet. Upload files above and click Run Compliance Check.")
+
+# --- Dashboard & Reports ---
+elif menu == "Dashboard & Reports":
+    st.markdown("<h1 style='font-size:38px; font-weight:800;'>Dashboard & Reports</h1>", unsafe_allow_html=True)
+
+    results_store = get_results_store()
+    col1, col2 = st.columns(2)
+    window = col1.selectbox("Time window", ["Last 7 days", "Last 30 days", "Last 90 days", "All time"], index=1)
+    since = {
+        "Last 7 days": time.time() - 7 * 86400,
+        "Last 30 days": time.time() - 30 * 86400,
+        "Last 90 days": time.time() - 90 * 86400,
+    }.get(window)
+    industry_filter = col2.selectbox("Industry", ["All industries"] + results_store.industries())
+    industry_filter = None if industry_filter == "All industries" else industry_filter
+
+    totals = results_store.totals(industry_filter, since)
+    if not totals["section_evaluations"]:
+        st.info("No evaluations recorded yet. Every compliance check and batch audit is added here automatically.")
+    else:
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Policies evaluated", f"{totals['documents']:,}")
+        col2.metric("Section evaluations", f"{totals['section_evaluations']:,}")
+        col3.metric("Average score", f"{totals['average_score']:.0%}")
+        col4.metric("Fully compliant sections", f"{totals['fully_compliant'] / totals['section_evaluations']:.0%}")
+
+        st.markdown("#### 📈 Compliance trend")
+        trend_df = pd.DataFrame(results_store.trend(industry_filter, since))
+        trend_chart = trend_df.pivot(index="day", columns="section", values="score")
+        trend_chart.columns = [f"Section {sid}" for sid in trend_chart.columns]
+        st.line_chart(trend_chart, y_label="Average compliance score")
+
+        st.markdown("#### ❌ Most frequently missed checklist items")
+        item_texts = {}
+        for pack_registry in [get_registry()] + [get_registry(name) for name in industries()]:
+            item_texts.update(pack_registry.item_text)
+        miss_df = pd.DataFrame(results_store.item_miss_rates(industry_filter, since))
+        if not miss_df.empty:
+            miss_df = miss_df.sort_values(["missing_rate", "partial_rate"], ascending=False)
+            miss_df["Checklist Text"] = miss_df["item_id"].map(item_texts).fillna("❓")
+            st.bar_chart(miss_df.head(15).set_index("item_id")[["missing_rate", "partial_rate"]].rename(
+                columns={"missing_rate": "Missing", "partial_rate": "Partially Mentioned"}), stack=True)
+            st.dataframe(miss_df.rename(columns={
+                "item_id": "Checklist Item ID", "section": "Section", "evaluations": "Evaluations",
+                "missing_rate": "Missing Rate", "partial_rate": "Partial Rate"
+            })[["Checklist Item ID", "Section", "Checklist Text", "Evaluations", "Missing Rate", "Partial Rate"]],
+                column_config={"Missing Rate": st.column_config.ProgressColumn(format="percent", min_value=0, max_value=1),
+                               "Partial Rate": st.column_config.ProgressColumn(format="percent", min_value=0, max_value=1)},
+                hide_index=True, use_container_width=True)
+
+        st.markdown("#### 🏭 Average score by industry and section")
+        breakdown_df = pd.DataFrame(results_store.industry_breakdown(since))
+        if not breakdown_df.empty:
+            breakdown = breakdown_df.pivot(index="industry", columns="section", values="score")
+            breakdown.columns = [f"Section {sid}" for sid in breakdown.columns]
+            st.dataframe(breakdown.style.format("{:.0%}", na_rep="—"), use_container_width=True)
+
+        st.markdown("#### 🕒 Recent evaluations")
+        recent_df = pd.DataFrame(results_store.recent_runs(industry=industry_filter))
+        recent_df["ts"] = pd.to_datetime(recent_df["ts"], unit="s")
+        st.dataframe(recent_df.rename(columns={
+            "ts": "Time", "document": "Document", "industry": "Industry", "model": "Model", "source": "Source",
+            "sections": "Sections", "score": "Average Score"
+        }).drop(columns=["id"]), hide_index=True, use_container_width=True)
+
+# --- Knowledge Assistant ---
+elif menu == "Knowledge Assistant":
+    st.markdown("<h1 style='font-size:38px; font-weight:800;'>Knowledge Assistant</h1>", unsafe_allow_html=True)
+    st.markdown("Search the clauses of every policy checked so far, e.g. *show me how other policies satisfy 5.2*. "
+                "Answers come from a local index, without any GPT call.")
+
+    clause_index = get_clause_index()
+    stats = clause_index.stats()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Policies indexed", f"{stats['documents']:,}")
+    col2.metric("Clauses", f"{stats['clauses']:,}")
+    col3.metric("Clauses matched to checklist items", f"{stats['matched_clauses']:,}")
+
+    if not stats["documents"]:
+        st.info("No policies indexed yet. Policies checked in the Policy Compliance Checker, including batch "
+                "audits, are added here automatically.")
+    else:
+        # Items of the base sections and of every industry pack, so industry-specific items can be searched too
+        item_texts = {}
+        for pack_registry in [get_registry()] + [get_registry(name) for name in industries()]:
+            item_texts.update(pack_registry.item_text)
+
+        question = st.text_input("Ask about clauses in checked policies",
+                                 placeholder="Show me how other policies satisfy 5.2")
+        col1, col2, col3 = st.columns([3, 2, 1])
+        item_choice = col1.selectbox(
+            "Checklist item", ["Any (or named in the question)"] + list(item_texts),
+            format_func=lambda item_id: f"{item_id} — {item_texts[item_id][:90]}" if item_id in item_texts else item_id
+        )
+        status_choice = col2.selectbox("Status", ["Any", "Explicitly Mentioned", "Partially Mentioned"])
+        result_count = col3.number_input("Results", min_value=1, max_value=50, value=10)
+
+        asked_item, words = interpret_question(question)
+        item_id = item_choice if item_choice in item_texts else asked_item
+        # Without descriptive words, rank the item's clauses by how closely they follow the checklist wording
+        query = words or item_texts.get(item_id, "")
+        if item_id and item_id not in item_texts:
+            st.warning(f"Checklist item {item_id} does not exist.")
+        elif query:
+            started = time.perf_counter()
+            hits = clause_index.search(query, item_id=item_id, k=int(result_count),
+                                       status=None if status_choice == "Any" else status_choice)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            scope = f"matched to {item_id}" if item_id else "across all indexed clauses"
+            st.caption(f"🔎 {len(hits)} clauses {scope} in {elapsed_ms:.1f} ms")
+            if item_id:
+                st.markdown(f"**{item_id}** — {item_texts[item_id]}")
+            if not hits:
+                st.info("No indexed clause matches yet." if not item_id else
+                        f"No checked policy has a clause matched to {item_id} yet.")
+            for hit in hits:
+                status_icon = {"Explicitly Mentioned": "✅", "Partially Mentioned": "⚠️"}.get(hit["Status"], "📄")
+                page = f" · p. {hit['Page']}" if hit["Page"] else ""
+                heading = f" · {hit['Heading']}" if hit["Heading"] else ""
+                with st.container(border=True):
+                    st.markdown(f"{status_icon} **{hit['Document']}**{page}{heading} · similarity {hit['Score']:.2f}")
+                    st.markdown(f"> {hit['Clause']}")
+                    caption = f"Matched items: {', '.join(hit['Matched Items'])}" if hit["Matched Items"] else ""
+                    if hit["Justification"]:
+                        caption = f"{hit['Status']}: {hit['Justification']} · {caption}"
+                    if caption:
+                        st.caption(caption)
+
+        with st.expander("📊 Checklist coverage across indexed policies"):
+            coverage = clause_index.item_coverage()
+            st.dataframe(pd.DataFrame([
+                {"Checklist Item ID": item_id, "Checklist Text": text, "Policies Covering It": coverage.get(item_id, 0),
+                 "Share": f"{coverage.get(item_id, 0) / stats['documents']:.0%}"}
+                for item_id, text in item_texts.items()
+            ]), use_container_width=True)
+
+# --- Admin Settings ---
+elif menu == "Admin Settings":
+    st.markdown("<h1 style='font-size:38px; font-weight:800;'>Admin Settings</h1>", unsafe_allow_html=True)
+    st.markdown("<h3 style='font-size:24px; font-weight:700;'>Performance Metrics</h3>", unsafe_allow_html=True)
+
+    metrics_store = get_metrics_store()
+    window = st.selectbox("Time window", ["Last 24 hours", "Last 7 days", "Last 30 days", "All time"])
+    since = {
+        "Last 24 hours": time.time() - 86400,
+        "Last 7 days": time.time() - 7 * 86400,
+        "Last 30 days": time.time() - 30 * 86400,
+    }.get(window)
+
+    llm_events = metrics_store.events("llm_call", since)
+    total_prompt = sum(e["prompt_tokens"] or 0 for e in llm_events)
+    total_completion = sum(e["completion_tokens"] or 0 for e in llm_events)
+    total_cost = sum(estimate_cost(e["model"], e["prompt_tokens"], e["completion_tokens"]) or 0 for e in llm_events)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("LLM calls", len(llm_events))
+    col2.metric("Prompt tokens", f"{total_prompt:,}")
+    col3.metric("Completion tokens", f"{total_completion:,}")
+    col4.metric("Est. cost (USD)", f"{total_cost:,.2f}")
+
+    st.markdown("#### LLM calls per section")
+    st.dataframe(pd.DataFrame(metrics_store.summarize("llm_call", "section", since)), use_container_width=True)
+
+    st.markdown("#### LLM calls per model")
+    st.dataframe(pd.DataFrame(metrics_store.summarize("llm_call", "model", since)), use_container_width=True)
+
+    st.markdown("#### Section evaluations (including cache hits)")
+    st.dataframe(pd.DataFrame(metrics_store.summarize("section", "section", since)), use_container_width=True)
+
+    st.markdown("#### Tiered evaluation")
+    tier_summary = metrics_store.summarize("tier", "model", since)
+    if tier_summary:
+        st.dataframe(pd.DataFrame(tier_summary), use_container_width=True)
+        st.caption(f"How often {FAST_MODEL}'s verdict matched {STRONG_MODEL} on re-checked items, by the fast "
+                   f"model's stated confidence. Escalation threshold: {ESCALATION_CONFIDENCE}. If agreement stays "
+                   "high just below the threshold it can be lowered; if audited items above it disagree, raise it.")
+        st.dataframe(pd.DataFrame(metrics_store.agreement(since)), use_container_width=True)
+    else:
+        st.info("No tiered evaluations recorded yet.")
+
+    st.markdown("#### PDF extraction")
+    pdf_events = metrics_store.events("pdf_extract", since)
+    if pdf_events:
+        pdf_df = pd.DataFrame(pdf_events)[["ts", "pages", "ocr_pages", "duration", "ocr_duration", "cache_hit"]]
+        pdf_df["ts"] = pd.to_datetime(pdf_df["ts"], unit="s")
+        pdf_df = pdf_df.rename(columns={"ts": "Time", "pages": "Pages", "ocr_pages": "OCR Pages",
+                                        "duration": "Duration (s)", "ocr_duration": "OCR Time (s)",
+                                        "cache_hit": "Cached"})
+        st.dataframe(pdf_df.sort_values("Time", ascending=False), use_container_width=True)
+        page_events = metrics_store.events("pdf_page", since)
+        if page_events:
+            st.caption("Scanned pages by how their text was obtained, with per-page time.")
+            page_df = pd.DataFrame(page_events).groupby("status")["duration"].describe(percentiles=[0.5, 0.95])
+            page_df = page_df[["count", "50%", "95%", "max"]].rename(columns={
+                "count": "Pages", "50%": "p50 (s)", "95%": "p95 (s)", "max": "Max (s)"
+            })
+            st.dataframe(page_df.rename_axis("Method").round(2), use_container_width=True)
+    else:
+        st.info("No PDF extractions recorded yet.")
+
+    if st.button("Clear metrics"):
+        metrics_store.clear()
+        st.rerun()
+
+    st.markdown("<h3 style='font-size:24px; font-weight:700;'>Stored Documents</h3>", unsafe_allow_html=True)
+    document_caches = {
+        "Uploaded PDFs (text, page index, original file)": DEFAULT_PDF_CACHE_DIR,
+        "OCR'd pages": DEFAULT_OCR_CACHE_DIR,
+        "Annotated PDFs": DEFAULT_ANNOTATED_DIR,
+    }
+    usage = {name: cache_directory_usage(directory) for name, directory in document_caches.items()}
+    st.dataframe(pd.DataFrame({
+        "Cache": list(usage),
+        "Entries": [u["entries"] for u in usage.values()],
+        "Size (MB)": [round(u["bytes"] / 1024 ** 2, 1) for u in usage.values()],
+    }), use_container_width=True, hide_index=True)
+    st.caption(f"Entries unused for {DOCUMENT_TTL_SECONDS // 86400} days are deleted automatically, and the least "
+               "recently used ones when a cache outgrows its size limit.")
+    st.caption("Deleting stored documents also removes finished compliance checks and batches (with their policy "
+               "text and uploads) and every clause in the clause search index. Checks still running keep their "
+               "document until they finish; cached verdicts and the evaluation history are kept.")
+    if st.button("🗑️ Delete stored documents"):
+        pdf_text_cache.clear()
+        ocr_text_cache.clear()
+        clear_annotated_pdfs()
+        job_runner.store.prune(max_age=0)
+        batch_runner.store.prune(max_age=0)
+        get_clause_index().clear()
+        get_job_evidence.clear()
+        get_job_result_table.clear()
+        get_batch_result_table.clear()
+        st.rerun()
+
+    st.markdown("<h3 style='font-size:24px; font-weight:700;'>Clause Library</h3>", unsafe_allow_html=True)
+    clause_library = get_clause_library()
+    library_counts = clause_library.counts()
+    library_industries = ["General"] + industries()
+    st.dataframe(pd.DataFrame({
+        "Industry": library_industries,
+        "Clauses": [library_counts.get(name, 0) for name in library_industries],
+        "Checklist Items": [len(get_registry(None if name == "General" else name).item_text)
+                            for name in library_industries],
+    }), use_container_width=True, hide_index=True)
+    library_industry = st.selectbox("Industry to precompute", library_industries, key="library-industry")
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("📚 Precompute clauses"):
+            library_progress = st.progress(0.0, text="Writing clauses...")
+            try:
+                build_clause_library(None if library_industry == "General" else library_industry, STRONG_MODEL,
+                                     progress=lambda done, total: library_progress.progress(
+                                         done / total, text=f"Section {done} of {total}"))
+            except Exception as e:
+                st.error(f"❌ Precomputing failed: {e}")
+            else:
+                st.rerun()
+    with col2:
+        if st.button("Clear clause library"):
+            clause_library.clear()
+            st.rerun()
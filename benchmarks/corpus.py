@@ -0,0 +1,73 @@
+import random
+import re
+import textwrap
+
+from dpdpa.checklists import dpdpa_checklists
+
+# --- Corpus Settings ---
+LINES_PER_PAGE = 60
+CHARS_PER_LINE = 95
+FONT_SIZE = 8
+# Share of checklist items the generated policy actually addresses, so responses are not all one status
+COVERED_FRACTION = 0.6
+
+HEADINGS = [
+    "Introduction", "Scope of this Policy", "Personal Data We Collect", "Purpose of Processing",
+    "Consent", "Withdrawal of Consent", "Data Retention", "Data Security", "Sharing with Third Parties",
+    "Children's Data", "Your Rights", "Grievance Redressal", "Cross-border Transfers", "Changes to this Policy",
+    "Contact Us",
+]
+
+FILLER_SENTENCES = [
+    "We process personal data only to the extent necessary for the purposes described in this section.",
+    "Our service providers act on our documented instructions and are bound by confidentiality obligations.",
+    "Where processing relies on a legitimate use, we assess the impact on you before we begin.",
+    "Records of processing activities are maintained and reviewed at regular intervals.",
+    "Access to personal data is restricted to personnel who require it to perform their duties.",
+    "We may update the categories of data described here as our services change over time.",
+    "Information collected through cookies and similar technologies is described in our cookie notice.",
+    "Aggregated or anonymised information that cannot identify you is not treated as personal data.",
+    "Requests received through any channel are logged and answered within the timelines set out below.",
+    "Backups are encrypted and stored in facilities that meet recognised industry standards.",
+]
+
+def covered_items(seed=0):
+    # Checklist items the generated policy text addresses, chosen deterministically from seed
+    rng = random.Random(seed)
+    items = [item for section in dpdpa_checklists.values() for item in section["items"]]
+    return [item for item in items if rng.random() < COVERED_FRACTION]
+
+def policy_clause(item):
+    # "The policy must confirm that X" -> "As required under the ..., this policy will confirm that X"
+    text = re.sub(r"^The policy (must|should) ", "", item["text"].replace("**", ""))
+    return f"As required under the Digital Personal Data Protection Act, 2023, this policy will {text}"
+
+def generate_policy_pages(pages, seed=0):
+    # Deterministic privacy-policy-like text split into `pages` pages of wrapped lines
+    rng = random.Random(seed)
+    clauses = [policy_clause(item) for item in covered_items(seed)]
+    lines = []
+    clause_index = 0
+    section_number = 1
+    while len(lines) < pages * LINES_PER_PAGE:
+        lines.append(f"{section_number}. {HEADINGS[(section_number - 1) % len(HEADINGS)]}")
+        section_number += 1
+        for _ in range(rng.randint(2, 4)):
+            sentences = rng.sample(FILLER_SENTENCES, rng.randint(2, 4))
+            # Spread the checklist clauses through the whole document, repeating them in longer policies
+            if clauses and rng.random() < 0.5:
+                sentences.insert(rng.randrange(len(sentences) + 1), clauses[clause_index % len(clauses)])
+                clause_index += 1
+            lines.extend(textwrap.wrap(" ".join(sentences), CHARS_PER_LINE))
+            lines.append("")
+    lines = lines[:pages * LINES_PER_PAGE]
+    return ["\n".join(lines[i:i + LINES_PER_PAGE]) for i in range(0, len(lines), LINES_PER_PAGE)]
+
+def generate_policy_pdf(pages, seed=0):
+    # Render a generated policy of `pages` pages and return the PDF bytes
+    import fitz
+    with fitz.open() as doc:
+        for page_text in generate_policy_pages(pages, seed):
+            page = doc.new_page(width=595, height=842)  # A4 in points
+            page.insert_text((40, 50), page_text, fontsize=FONT_SIZE, fontname="helv")
+        return doc.tobytes(garbage=3, deflate=True)
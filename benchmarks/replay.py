@@ -0,0 +1,114 @@
+import json
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+from dpdpa.chunking import count_tokens
+
+# --- Replay Settings ---
+STREAM_CHUNK_CHARS = 40
+# Stated confidence for prompts that ask for one, when the recording has none
+DEFAULT_CONFIDENCE = {"Explicitly Mentioned": 0.9, "Partially Mentioned": 0.6, "Missing": 0.85}
+
+ITEM_ID_RE = re.compile(r"^\s*(\d+\.(?:[A-Z]{1,3})?\d+)\. ", re.M)
+
+def load_recording(path):
+    # Read recorded evaluations from dpdpa-check -f json output.
+    # Returns ({item_id: evaluation}, {section_id: result}) taken from the first document in the file. A real
+    # recording is made by running the CLI once against a sample policy with a live API key; the committed
+    # recordings/gpt-4.json is synthetic (hand-written verdicts, marked by its "Source" field), which is
+    # enough to time the pipeline but says nothing about GPT's answers.
+    with open(path, encoding="utf-8") as f:
+        documents = json.load(f)
+    results = documents[0]["Results"]
+    items = {e["Checklist Item ID"]: e for r in results for e in r["Matched Details"]}
+    return items, {r["Section"]: r for r in results}
+
+class ReplayClient:
+    # Stand-in for openai.OpenAI that answers chat completions from a recording.
+    # Only the checklist items named in the prompt are returned, so pre-screened, incremental and batched
+    # requests get realistic subsets. Each request sleeps latency seconds plus latency_per_1k_tokens per
+    # thousand prompt tokens before responding.
+
+    def __init__(self, items, sections, latency=0.0, latency_per_1k_tokens=0.0, model="gpt-4"):
+        self.items = items
+        self.sections = sections
+        self.latency = latency
+        self.latency_per_1k_tokens = latency_per_1k_tokens
+        self.model = model
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self._create))
+
+    @classmethod
+    def from_file(cls, path, **options):
+        items, sections = load_recording(path)
+        return cls(items, sections, **options)
+
+    def with_options(self, **options):
+        return self
+
+    def reset_counters(self):
+        with self._lock:
+            self.calls = self.prompt_tokens = self.completion_tokens = 0
+
+    def _section_payload(self, section_id, item_ids, confidence=False):
+        recorded = self.sections.get(section_id, {})
+        evaluations = []
+        for item_id in item_ids:
+            evaluation = self.items.get(item_id, {"Status": "Missing", "Justification": "Not found in the policy."})
+            entry = {
+                "Checklist Item ID": item_id,
+                "Status": evaluation["Status"],
+                "Justification": evaluation["Justification"],
+            }
+            if confidence:
+                entry["Confidence"] = evaluation.get("Confidence", DEFAULT_CONFIDENCE.get(evaluation["Status"], 0.5))
+            evaluations.append(entry)
+        return {
+            "Checklist Evaluation": evaluations,
+            "Suggested Rewrite": recorded.get("Suggested Rewrite", ""),
+            "Simplified Legal Meaning": recorded.get("Simplified Legal Meaning", ""),
+        }
+
+    def response_text(self, prompt):
+        by_section = {}
+        for item_id in ITEM_ID_RE.findall(prompt):
+            by_section.setdefault(item_id.split(".")[0], []).append(item_id)
+        if '"Sections"' in prompt:
+            payload = {"Sections": {sid: self._section_payload(sid, ids) for sid, ids in by_section.items()}}
+        else:
+            sid, ids = next(iter(by_section.items()), ("", []))
+            payload = self._section_payload(sid, ids, confidence='"Confidence"' in prompt)
+        return json.dumps(payload, ensure_ascii=False)
+
+    def _create(self, model, messages, stream=False, **request):
+        prompt = messages[-1]["content"]
+        text = self.response_text(prompt)
+        usage = SimpleNamespace(prompt_tokens=count_tokens(prompt, self.model),
+                                completion_tokens=count_tokens(text, self.model))
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += usage.prompt_tokens
+            self.completion_tokens += usage.completion_tokens
+        time.sleep(self.latency + self.latency_per_1k_tokens * usage.prompt_tokens / 1000)
+        if stream:
+            return ReplayStream(text, usage)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=text))], usage=usage)
+
+class ReplayStream:
+    def __init__(self, text, usage):
+        self.text = text
+        self.usage = usage
+
+    def __iter__(self):
+        for start in range(0, len(self.text), STREAM_CHUNK_CHARS):
+            delta = SimpleNamespace(content=self.text[start:start + STREAM_CHUNK_CHARS])
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=delta)], usage=None)
+        yield SimpleNamespace(choices=[], usage=self.usage)
+
+    def close(self):
+        pass
@@ -0,0 +1,198 @@
+# Offline performance benchmark for the evaluation pipeline.
+# Generates sample policy PDFs of increasing size, answers GPT requests from a recording with simulated latency,
+# and times each stage of a compliance check:
+#     python -m benchmarks.run --pages 2 10 50 200 --latency 1.5 -o bench.json
+#     python -m benchmarks.run -o new.json --baseline bench.json   # exit 1 on regressions
+# Recordings are dpdpa-check -f json output. The committed one is synthetic (hand-written verdicts in that
+# format); replace it with a real capture via
+#     dpdpa-check sample.pdf -f json -o benchmarks/recordings/gpt-4.json
+import argparse
+import importlib
+import io
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks.corpus import generate_policy_pdf
+from benchmarks.replay import ReplayClient
+from dpdpa import engine, pdf
+from dpdpa.checklists import dpdpa_checklists
+from dpdpa.ratelimit import set_rate_limits
+from dpdpa.chunking import count_tokens
+from dpdpa.retrieval import DEFAULT_TOP_K, get_policy_index
+
+# --- Benchmark Settings ---
+DEFAULT_PAGES = [2, 10, 50, 200]
+DEFAULT_RECORDING = os.path.join(os.path.dirname(__file__), "recordings", "gpt-4.json")
+BENCH_SECTION = "6"  # the largest checklist
+REGRESSION_TOLERANCE = 0.2
+# Absolute slack so sub-millisecond stages do not flag noise as regressions
+REGRESSION_MIN_SECONDS = 0.05
+
+def measure(client, stage):
+    # Run stage() and return wall time, peak memory growth and the GPT traffic it caused.
+    # Memory is what tracemalloc sees in this process; page extraction for large PDFs runs in worker processes
+    # and is not included.
+    client.reset_counters()
+    tracemalloc.reset_peak()
+    before, _ = tracemalloc.get_traced_memory()
+    started = time.perf_counter()
+    value = stage()
+    seconds = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    return value, {
+        "seconds": round(seconds, 4),
+        "peak_memory_mb": round((peak - before) / 2 ** 20, 2),
+        "llm_calls": client.calls,
+        "prompt_tokens": client.prompt_tokens,
+        "completion_tokens": client.completion_tokens,
+    }
+
+def bench_document(pages, client, workdir, args):
+    data = generate_policy_pdf(pages, seed=args.seed)
+    section_ids = list(dpdpa_checklists)
+    checklist = dpdpa_checklists[BENCH_SECTION]["items"]
+    stages = {}
+
+    # A fresh page cache per document so the first extraction is always cold
+    pdf.pdf_text_cache = pdf.PdfTextCache(os.path.join(workdir, f"pdf-{pages}"))
+    text, stages["extract_text_from_pdf"] = measure(client, lambda: engine.extract_text_from_pdf(io.BytesIO(data)))
+    _, stages["extract_text_from_pdf (cached)"] = measure(client, lambda: engine.extract_text_from_pdf(io.BytesIO(data)))
+
+    prompt, stages["create_full_policy_prompt"] = measure(
+        client, lambda: engine.create_full_policy_prompt(BENCH_SECTION, text, checklist))
+    stages["create_full_policy_prompt"]["prompt_tokens"] = count_tokens(prompt)
+
+    def retrieval_prompt():
+        passages = get_policy_index(text).passages_for_checklist(checklist, k=DEFAULT_TOP_K)
+        return engine.create_full_policy_prompt(BENCH_SECTION, text, checklist, passages=passages)
+    prompt, stages["create_full_policy_prompt (retrieval)"] = measure(client, retrieval_prompt)
+    stages["create_full_policy_prompt (retrieval)"]["prompt_tokens"] = count_tokens(prompt)
+
+    _, stages["analyze_policy_section"] = measure(client, lambda: engine.analyze_policy_section(
+        BENCH_SECTION, checklist, text, force_refresh=True))
+    _, stages["analyze_policy_section (cached)"] = measure(client, lambda: engine.analyze_policy_section(
+        BENCH_SECTION, checklist, text))
+    _, stages["all_sections"] = measure(client, lambda: list(engine.analyze_sections_concurrently(
+        section_ids, text, max_workers=args.workers, force_refresh=True)))
+    _, stages["all_sections (retrieval)"] = measure(client, lambda: list(engine.analyze_sections_concurrently(
+        section_ids, text, max_workers=args.workers, force_refresh=True, top_k=DEFAULT_TOP_K)))
+    _, stages["all_sections (tiered)"] = measure(client, lambda: list(engine.analyze_sections_concurrently(
+        section_ids, text, model=engine.TIERED_MODEL, max_workers=args.workers, force_refresh=True)))
+    _, stages["all_sections (batched)"] = measure(client, lambda: engine.analyze_all_sections_batched(
+        section_ids, text, force_refresh=True))
+
+    return {"pages": pages, "pdf_bytes": len(data), "text_chars": len(text), "stages": stages}
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def find_regressions(current, baseline, tolerance=REGRESSION_TOLERANCE):
+    # (pages, stage, metric, old, new) for timings and token counts that grew beyond the tolerance
+    old_docs = {doc["pages"]: doc for doc in baseline["documents"]}
+    regressions = []
+    for doc in current["documents"]:
+        old_doc = old_docs.get(doc["pages"])
+        if old_doc is None:
+            continue
+        for stage, metrics in doc["stages"].items():
+            old = old_doc["stages"].get(stage)
+            if old is None:
+                continue
+            for metric in ("seconds", "prompt_tokens"):
+                slack = REGRESSION_MIN_SECONDS if metric == "seconds" else 0
+                if metrics[metric] > old[metric] * (1 + tolerance) + slack:
+                    regressions.append((doc["pages"], stage, metric, old[metric], metrics[metric]))
+    return regressions
+
+def print_summary(report, out=sys.stderr):
+    for doc in report["documents"]:
+        print(f"\n{doc['pages']} pages ({doc['text_chars']:,} chars)", file=out)
+        for stage, m in doc["stages"].items():
+            print(f"  {stage:<40} {m['seconds']:>9.3f}s {m['peak_memory_mb']:>9.1f} MB "
+                  f"{m['llm_calls']:>3} calls {m['prompt_tokens']:>9,} prompt tokens", file=out)
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.run",
+                                     description="Offline performance benchmark for the evaluation pipeline.")
+    parser.add_argument("--pages", type=int, nargs="+", default=DEFAULT_PAGES, help="corpus sizes in pages")
+    parser.add_argument("--latency", type=float, default=1.0, help="simulated seconds per GPT request")
+    parser.add_argument("--latency-per-1k-tokens", type=float, default=0.0,
+                        help="extra simulated seconds per 1,000 prompt tokens")
+    parser.add_argument("--recording", default=DEFAULT_RECORDING, help="dpdpa-check JSON output to replay")
+    parser.add_argument("--workers", type=int, default=engine.MAX_CONCURRENT_SECTIONS)
+    parser.add_argument("--seed", type=int, default=0, help="corpus generator seed")
+    parser.add_argument("-o", "--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="earlier report to compare against")
+    parser.add_argument("--tolerance", type=float, default=REGRESSION_TOLERANCE,
+                        help="allowed relative slowdown or token growth before a stage counts as a regression")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    output = os.path.abspath(args.output) if args.output else None
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+
+    client = ReplayClient.from_file(args.recording, latency=args.latency,
+                                    latency_per_1k_tokens=args.latency_per_1k_tokens)
+    engine.set_client(client)
+    # Replayed responses never reach OpenAI, so the org-wide rate limits would only add artificial waits
+    set_rate_limits(None, None)
+    # The engine imports openai on the first GPT call; do it now so that cost is not charged to a stage
+    importlib.import_module("openai")
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "settings": {"latency": args.latency, "latency_per_1k_tokens": args.latency_per_1k_tokens,
+                     "workers": args.workers, "seed": args.seed, "recording": os.path.basename(args.recording),
+                     "section": BENCH_SECTION, "top_k": DEFAULT_TOP_K},
+        "documents": [],
+    }
+
+    # Result cache, metrics and page cache all live under .dpdpa_cache/ relative to the working directory,
+    # so running from a scratch directory keeps the benchmark away from real cached results
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="dpdpa-bench-") as workdir:
+        os.chdir(workdir)
+        tracemalloc.start()
+        try:
+            for pages in args.pages:
+                print(f"benchmarking {pages} pages…", file=sys.stderr)
+                report["documents"].append(bench_document(pages, client, workdir, args))
+        finally:
+            tracemalloc.stop()
+            os.chdir(cwd)
+
+    print_summary(report)
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+    if baseline is not None:
+        regressions = find_regressions(report, baseline, args.tolerance)
+        for pages, stage, metric, old, new in regressions:
+            print(f"REGRESSION {pages} pages / {stage}: {metric} {old} -> {new}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
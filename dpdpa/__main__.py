@@ -0,0 +1,5 @@
+import sys
+
+from dpdpa.cli import main
+
+sys.exit(main())
@@ -0,0 +1,281 @@
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import zipfile
+
+from dpdpa.jobs import JOB_RETENTION_SECONDS, run_on_complete
+from dpdpa.ratelimit import session
+
+# --- Batch Settings ---
+DEFAULT_BATCH_DB_PATH = os.path.join(".dpdpa_cache", "batches.sqlite3")
+MAX_BATCH_WORKERS = 3
+SUPPORTED_EXTENSIONS = (".pdf", ".txt")
+BATCH_RETENTION_SECONDS = JOB_RETENTION_SECONDS  # finished batches, and the uploads' names, go after a week
+
+def expand_uploads(files):
+    # Turn uploaded files (PDF, TXT or ZIPs of them) into a list of (name, bytes)
+    documents = []
+    for name, data in files:
+        if name.lower().endswith(".zip"):
+            with zipfile.ZipFile(io.BytesIO(data)) as archive:
+                for info in archive.infolist():
+                    base = os.path.basename(info.filename)
+                    if info.is_dir() or base.startswith(".") or info.filename.startswith("__MACOSX/"):
+                        continue
+                    if base.lower().endswith(SUPPORTED_EXTENSIONS):
+                        documents.append((info.filename, archive.read(info)))
+        elif name.lower().endswith(SUPPORTED_EXTENSIONS):
+            documents.append((name, data))
+    return documents
+
+class BatchStore:
+    # Persistent queue of batch documents and their results, backed by SQLite
+
+    def __init__(self, path=DEFAULT_BATCH_DB_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS batches (
+                    id TEXT PRIMARY KEY,
+                    created_at REAL NOT NULL,
+                    section_ids TEXT NOT NULL,
+                    model TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS batch_documents (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    batch_id TEXT NOT NULL REFERENCES batches(id),
+                    name TEXT NOT NULL,
+                    data BLOB,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    results TEXT,
+                    error TEXT,
+                    started_at REAL,
+                    finished_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_batch_documents_status ON batch_documents(status, id);
+                CREATE INDEX IF NOT EXISTS idx_batch_documents_batch ON batch_documents(batch_id);
+            """)
+            # Added after the first release; batches created before it use the base checklists
+            if "industry" not in {row["name"] for row in self._conn.execute("PRAGMA table_info(batches)")}:
+                self._conn.execute("ALTER TABLE batches ADD COLUMN industry TEXT")
+            # Uploads are dropped once evaluated, so data became nullable; SQLite needs the table rebuilt
+            data_column = next(row for row in self._conn.execute("PRAGMA table_info(batch_documents)")
+                               if row["name"] == "data")
+            if data_column["notnull"]:
+                self._conn.executescript("""
+                    CREATE TABLE batch_documents_new (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        batch_id TEXT NOT NULL REFERENCES batches(id),
+                        name TEXT NOT NULL,
+                        data BLOB,
+                        status TEXT NOT NULL DEFAULT 'pending',
+                        results TEXT,
+                        error TEXT,
+                        started_at REAL,
+                        finished_at REAL
+                    );
+                    INSERT INTO batch_documents_new SELECT id, batch_id, name, data, status, results, error,
+                        started_at, finished_at FROM batch_documents;
+                    DROP TABLE batch_documents;
+                    ALTER TABLE batch_documents_new RENAME TO batch_documents;
+                    CREATE INDEX idx_batch_documents_status ON batch_documents(status, id);
+                    CREATE INDEX idx_batch_documents_batch ON batch_documents(batch_id);
+                """)
+
+    def create_batch(self, documents, section_ids, model, industry=None):
+        batch_id = uuid.uuid4().hex[:12]
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO batches (id, created_at, section_ids, model, industry) VALUES (?, ?, ?, ?, ?)",
+                (batch_id, time.time(), json.dumps(list(section_ids)), model, industry)
+            )
+            self._conn.executemany(
+                "INSERT INTO batch_documents (batch_id, name, data) VALUES (?, ?, ?)",
+                [(batch_id, name, data) for name, data in documents]
+            )
+        return batch_id
+
+    def claim_next(self):
+        # Atomically move the oldest pending document to 'running' and hand it to a worker
+        with self._lock, self._conn:
+            row = self._conn.execute("""
+                SELECT d.id, d.batch_id, d.name, d.data, b.section_ids, b.model, b.industry
+                FROM batch_documents d JOIN batches b ON b.id = d.batch_id
+                WHERE d.status = 'pending' ORDER BY d.id LIMIT 1
+            """).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE batch_documents SET status = 'running', started_at = ? WHERE id = ?",
+                (time.time(), row["id"])
+            )
+        return {
+            "id": row["id"], "batch_id": row["batch_id"], "name": row["name"], "data": row["data"],
+            "section_ids": json.loads(row["section_ids"]), "model": row["model"],
+            "industry": row["industry"],
+        }
+
+    def complete(self, doc_id, results):
+        # A finished document's upload is no longer needed (re-reads go through the PDF text cache)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE batch_documents SET status = 'done', results = ?, data = NULL, finished_at = ? WHERE id = ?",
+                (json.dumps(results, ensure_ascii=False), time.time(), doc_id)
+            )
+
+    def fail(self, doc_id, error):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE batch_documents SET status = 'error', error = ?, data = NULL, finished_at = ? WHERE id = ?",
+                (str(error), time.time(), doc_id)
+            )
+
+    def requeue_interrupted(self):
+        # Documents left 'running' by a previous process never finished; put them back in the queue
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "UPDATE batch_documents SET status = 'pending', started_at = NULL WHERE status = 'running'"
+            ).rowcount
+
+    def prune(self, max_age=BATCH_RETENTION_SECONDS):
+        # Batches older than max_age whose documents have all finished
+        cutoff = time.time() - max_age
+        with self._lock, self._conn:
+            old = """SELECT id FROM batches WHERE created_at < ? AND id NOT IN (
+                SELECT batch_id FROM batch_documents WHERE status IN ('pending', 'running'))"""
+            self._conn.execute(f"DELETE FROM batch_documents WHERE batch_id IN ({old})", (cutoff,))
+            return self._conn.execute(f"DELETE FROM batches WHERE id IN ({old})", (cutoff,)).rowcount
+
+    def has_pending(self):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT 1 FROM batch_documents WHERE status = 'pending' LIMIT 1"
+            ).fetchone() is not None
+
+    def list_batches(self, limit=20):
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT b.id, b.created_at, COUNT(d.id) AS documents
+                FROM batches b LEFT JOIN batch_documents d ON d.batch_id = b.id
+                GROUP BY b.id ORDER BY b.created_at DESC LIMIT ?
+            """, (limit,)).fetchall()
+        return [dict(r) for r in rows]
+
+    def progress(self, batch_id):
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT status, COUNT(*) AS n, MIN(started_at) AS first_start, MAX(finished_at) AS last_finish
+                FROM batch_documents WHERE batch_id = ? GROUP BY status
+            """, (batch_id,)).fetchall()
+        counts = {r["status"]: r["n"] for r in rows}
+        total = sum(counts.values())
+        finished = counts.get("done", 0) + counts.get("error", 0)
+        starts = [r["first_start"] for r in rows if r["first_start"]]
+        finishes = [r["last_finish"] for r in rows if r["last_finish"]]
+        elapsed = (max(finishes) - min(starts)) if starts and finishes else 0.0
+        return {
+            "total": total,
+            "pending": counts.get("pending", 0),
+            "running": counts.get("running", 0),
+            "done": counts.get("done", 0),
+            "error": counts.get("error", 0),
+            "finished": finished,
+            "elapsed_seconds": elapsed,
+            "docs_per_minute": (finished / elapsed * 60) if elapsed > 0 else 0.0,
+        }
+
+    def documents(self, batch_id):
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT name, status, results, error FROM batch_documents WHERE batch_id = ? ORDER BY id
+            """, (batch_id,)).fetchall()
+        return [
+            {"name": r["name"], "status": r["status"], "error": r["error"],
+             "results": json.loads(r["results"]) if r["results"] else []}
+            for r in rows
+        ]
+
+    def result_documents(self, batch_id):
+        # Finished documents in the shape dpdpa-check -f json writes, for dpdpa.table.ResultTable
+        return [
+            {"Document": doc["name"], "Error": doc["error"]} if doc["status"] == "error" else
+            {"Document": doc["name"], "Results": doc["results"]}
+            for doc in self.documents(batch_id) if doc["status"] in ("done", "error")
+        ]
+
+def flatten_results(document_name, results):
+    rows = []
+    for result in results:
+        if result.get("Error"):
+            rows.append({"Document": document_name, "Section": result["Section"], "Checklist Item ID": "",
+                         "Checklist Text": "", "Status": "Error", "Justification": result["Error"],
+                         "Match Level": "Error", "Score": 0.0})
+            continue
+        for item in result["Matched Details"]:
+            rows.append({
+                "Document": document_name,
+                "Section": result["Section"],
+                "Checklist Item ID": item["Checklist Item ID"],
+                "Checklist Text": item["Checklist Text"],
+                "Status": item["Status"],
+                "Justification": item["Justification"],
+                "Match Level": result["Match Level"],
+                "Score": result["Compliance Score"]
+            })
+    return rows
+
+class BatchRunner:
+    # Bounded pool of worker threads draining a BatchStore.
+    # process_document(name, data, section_ids, model, industry) must return the list of section results.
+    # Workers exit when the queue is empty and are restarted by wake. on_complete(doc, results), if given, is
+    # called after a document was evaluated successfully.
+
+    def __init__(self, store, process_document, max_workers=MAX_BATCH_WORKERS, on_complete=None):
+        self.store = store
+        self.process_document = process_document
+        self.on_complete = on_complete
+        self.max_workers = max_workers
+        self._threads = []
+        self._lock = threading.Lock()
+
+    def resume(self):
+        self.store.prune()
+        self.store.requeue_interrupted()
+        self.wake()
+
+    def wake(self):
+        with self._lock:
+            while len(self._threads) < self.max_workers and self.store.has_pending():
+                thread = threading.Thread(target=self._work, daemon=True, name="dpdpa-batch-worker")
+                self._threads.append(thread)
+                thread.start()
+
+    def _work(self):
+        while True:
+            doc = self.store.claim_next()
+            if doc is None:
+                # Deregister under the lock so a concurrent wake() either sees us gone or we see its work
+                with self._lock:
+                    if not self.store.has_pending():
+                        self._threads.remove(threading.current_thread())
+                        return
+                continue
+            try:
+                # A batch queues its GPT calls as one session, however many documents it holds
+                with session(f"batch-{doc['batch_id']}"):
+                    results = self.process_document(doc["name"], doc["data"], doc["section_ids"], doc["model"],
+                                                    doc["industry"])
+            except Exception as e:
+                self.store.fail(doc["id"], e)
+            else:
+                self.store.complete(doc["id"], results)
+                run_on_complete(self.on_complete, doc, results, "batch document")
@@ -0,0 +1,150 @@
+import functools
+import hashlib
+import json
+import os
+import re
+
+# --- Checklist Packs ---
+# A pack is a JSON (or, with PyYAML installed, YAML) file of sections and their checklist items. Industry
+# packs name the pack they extend and add items to its sections; an item with an existing ID rewords it.
+# Extra pack directories can be listed in DPDPA_CHECKLIST_PACKS (separated like PATH).
+PACKS_DIR = os.path.join(os.path.dirname(__file__), "packs")
+BASE_PACK = "dpdpa-2023"
+PACK_EXTENSIONS = (".json", ".yaml", ".yml")
+ITEM_ID_RE = re.compile(r"^(\d+)\.(?:[A-Z]{1,3})?\d+$")
+
+def pack_dirs():
+    extra = [d for d in os.environ.get("DPDPA_CHECKLIST_PACKS", "").split(os.pathsep) if d]
+    return [PACKS_DIR] + extra
+
+def load_pack(path):
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ImportError(f"PyYAML is needed to read the checklist pack {path}") from None
+            pack = yaml.safe_load(f)
+        else:
+            pack = json.load(f)
+    pack.setdefault("name", os.path.splitext(os.path.basename(path))[0])
+    return pack
+
+@functools.lru_cache(maxsize=None)
+def available_packs():
+    # {pack name: pack}, read from disk once per process; later directories override same-named packs
+    packs = {}
+    for directory in pack_dirs():
+        if not os.path.isdir(directory):
+            continue
+        for filename in sorted(os.listdir(directory)):
+            if filename.endswith(PACK_EXTENSIONS):
+                pack = load_pack(os.path.join(directory, filename))
+                packs[pack["name"]] = pack
+    return packs
+
+def industries():
+    return sorted(pack["industry"] for pack in available_packs().values() if pack.get("industry"))
+
+def layer_packs(packs):
+    # Merge packs in order into {section_id: {"title", "items"}}
+    sections = {}
+    for pack in packs:
+        for sid, section in pack.get("sections", {}).items():
+            sid = str(sid)
+            merged = sections.setdefault(sid, {"title": section.get("title") or f"Section {sid}", "items": []})
+            positions = {item["id"]: n for n, item in enumerate(merged["items"])}
+            for item in section.get("items", []):
+                item_id = str(item["id"])
+                match = ITEM_ID_RE.match(item_id)
+                if not match or match.group(1) != sid:
+                    raise ValueError(f"Checklist pack {pack['name']}: item ID {item_id!r} does not belong to "
+                                     f"section {sid}")
+                item = {"id": item_id, "text": item["text"]}
+                if item_id in positions:
+                    merged["items"][positions[item_id]] = item
+                else:
+                    positions[item_id] = len(merged["items"])
+                    merged["items"].append(item)
+    return sections
+
+def format_checklist(checklist):
+    return "\n".join(f"{item['id']}. {item['text']}" for item in checklist)
+
+def checklist_hash(checklist):
+    payload = json.dumps([[item["id"], item["text"]] for item in checklist], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:12]
+
+# Prompt text and content hash of every section list handed out by a registry, keyed by id(list). The list
+# itself is kept alongside, so an ID can never be reused by an unrelated list while the entry exists.
+_section_info = {}
+
+class ChecklistRegistry:
+    # Checklist sections layered from one or more packs, with lookups and prompt text built once
+
+    def __init__(self, packs):
+        self.packs = [pack["name"] for pack in packs]
+        self.sections = layer_packs(packs)
+        self.item_text = {item["id"]: item["text"] for s in self.sections.values() for item in s["items"]}
+        self.section_labels = {sid: f"{sid} — {s['title']}" for sid, s in self.sections.items()}
+        self.prompt_fragments = {}
+        self.section_hashes = {}
+        for sid, section in self.sections.items():
+            self.prompt_fragments[sid] = format_checklist(section["items"])
+            self.section_hashes[sid] = checklist_hash(section["items"])
+            _section_info[id(section["items"])] = (section["items"], self.prompt_fragments[sid],
+                                                   self.section_hashes[sid])
+        # Downstream caches can key on this; it changes whenever any item's wording does
+        self.version = hashlib.sha256("".join(self.section_hashes.values()).encode("utf-8")).hexdigest()[:12]
+
+    def __contains__(self, section_id):
+        return section_id in self.sections
+
+    def __iter__(self):
+        return iter(self.sections)
+
+    def items(self, section_id):
+        return self.sections[section_id]["items"]
+
+    def title(self, section_id):
+        return self.sections[section_id]["title"]
+
+@functools.lru_cache(maxsize=None)
+def get_registry(industry=None):
+    # The base DPDPA checklists, with the industry's pack layered on top; built once per process
+    packs = available_packs()
+    name = BASE_PACK
+    if industry:
+        matches = [p["name"] for p in packs.values() if (p.get("industry") or "").lower() == industry.lower()]
+        if not matches:
+            raise KeyError(f"No checklist pack for industry {industry!r}; available: {', '.join(industries())}")
+        name = matches[0]
+
+    chain = []
+    while name:
+        if name not in packs:
+            raise KeyError(f"Checklist pack {name!r} not found in {', '.join(pack_dirs())}")
+        if name in (p["name"] for p in chain):
+            raise ValueError(f"Checklist pack {name!r} extends itself")
+        chain.insert(0, packs[name])
+        name = packs[name].get("extends")
+    return ChecklistRegistry(chain)
+
+def checklist_prompt_text(checklist):
+    # Whole sections reuse the text built when their pack was loaded; subsets are formatted here
+    info = _section_info.get(id(checklist))
+    return info[1] if info and info[0] is checklist else format_checklist(checklist)
+
+def checklist_version(checklist):
+    info = _section_info.get(id(checklist))
+    return info[2] if info and info[0] is checklist else checklist_hash(checklist)
+
+def section_title(section_id):
+    for registry in [get_registry()] + [get_registry(industry) for industry in industries()]:
+        if section_id in registry:
+            return registry.title(section_id)
+    return f"Section {section_id}"
+
+# --- Section Checklists ---
+# The base sections, for code that does not deal with industry packs
+dpdpa_checklists = get_registry().sections
@@ -0,0 +1,87 @@
+import functools
+
+# --- Token Budget Settings ---
+# Context windows in tokens; unknown models get the smallest so we never overfill
+MODEL_CONTEXT_TOKENS = {
+    "gpt-4": 8192,
+    "gpt-4-turbo": 128000,
+    "gpt-4o": 128000,
+    "gpt-4o-mini": 128000,
+    "gpt-3.5-turbo": 16385,
+}
+DEFAULT_CONTEXT_TOKENS = 8192
+RESPONSE_TOKEN_RESERVE = 2000    # room left for the JSON answer
+CHUNK_OVERLAP_TOKENS = 200       # so a clause cut at a boundary is still seen whole by one chunk
+MIN_CHUNK_TOKENS = 500
+CHARS_PER_TOKEN = 4              # rough English average, used when tiktoken is not installed
+
+STATUS_STRENGTH = {"Explicitly Mentioned": 2, "Partially Mentioned": 1, "Missing": 0}
+
+@functools.lru_cache(maxsize=None)
+def _encoding(model):
+    try:
+        import tiktoken
+    except ImportError:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("cl100k_base")
+
+def count_tokens(text, model="gpt-4"):
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // CHARS_PER_TOKEN + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+def context_tokens(model):
+    return MODEL_CONTEXT_TOKENS.get(model, DEFAULT_CONTEXT_TOKENS)
+
+def prompt_budget(model):
+    # Tokens a prompt may use and still leave room for the response
+    return context_tokens(model) - RESPONSE_TOKEN_RESERVE
+
+def split_text(text, max_tokens, overlap_tokens=CHUNK_OVERLAP_TOKENS, model="gpt-4"):
+    # (start, end) spans of overlapping chunks of at most ~max_tokens tokens each, cut at line breaks
+    total = count_tokens(text, model)
+    if total <= max_tokens:
+        return [(0, len(text))]
+    # Token density varies through a document, so aim a little under the budget
+    chars_per_token = len(text) / total
+    max_chars = max(1, int(max_tokens * chars_per_token * 0.95))
+    overlap_chars = min(int(overlap_tokens * chars_per_token), max_chars // 4)
+
+    spans = []
+    start = 0
+    while True:
+        end = min(len(text), start + max_chars)
+        if end < len(text):
+            end = _break_before(text, start + max_chars // 2, end)
+        spans.append((start, end))
+        if end >= len(text):
+            return spans
+        # Start the next chunk at a line break inside the overlap window
+        line = text.find("\n", end - overlap_chars, end)
+        start = max(line + 1 if line != -1 else end - overlap_chars, start + 1)
+
+def _break_before(text, lo, hi):
+    # Prefer a page or paragraph break, then a line break, then any whitespace
+    for separators in (("\f", "\n\n"), ("\n",), (" ", "\t")):
+        cut = max(text.rfind(sep, lo, hi) for sep in separators)
+        if cut != -1:
+            return cut + 1
+    return hi
+
+def strongest_evaluations(part_results):
+    # Reduce per-chunk Matched Details to the strongest status per checklist item.
+    # The winning chunk's justification and source passage are kept, and for items that were found "Policy
+    # Part" records which chunk (1-based, of the total) the evidence came from.
+    best = {}
+    for part, result in enumerate(part_results, start=1):
+        for evaluation in result["Matched Details"]:
+            item_id = evaluation["Checklist Item ID"]
+            strength = STATUS_STRENGTH.get(evaluation["Status"], 0)
+            current = best.get(item_id)
+            if current is None or strength > STATUS_STRENGTH.get(current["Status"], 0):
+                best[item_id] = dict(evaluation, **{"Policy Part": f"{part}/{len(part_results)}"}) if strength else evaluation
+    return best
@@ -0,0 +1,310 @@
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+
+import numpy as np
+
+from dpdpa.cache import normalize_policy_text
+from dpdpa.incremental import cited_chunk_id
+from dpdpa.parsing import ITEM_ID_RE
+from dpdpa.retrieval import get_policy_index, tokenize
+
+# --- Clause Index Settings ---
+DEFAULT_CLAUSE_INDEX_DIR = os.path.join(".dpdpa_cache", "clauses")
+VECTOR_DIM = 1024                 # hashed feature space; 4 KB per clause as float32
+SEARCH_BLOCK_ROWS = 65536         # rows scored per matrix product, bounds temporary memory on large indexes
+DEFAULT_RESULTS = 10
+INDEXED_STATUSES = ("Explicitly Mentioned", "Partially Mentioned")
+
+# Words that phrase a question rather than describe a clause ("show me how other policies satisfy 5.2")
+QUESTION_WORDS = {
+    "show", "me", "how", "other", "others", "policies", "satisfy", "satisfies", "meet", "meets", "cover",
+    "covers", "address", "addresses", "handle", "handles", "example", "examples", "clause", "clauses", "item",
+    "items", "what", "which", "do", "does", "find", "give", "list", "see", "wording", "written", "companies",
+}
+
+def clause_vector(text):
+    # L2-normalised, sign-hashed sublinear term frequencies of the text's words and word pairs
+    tokens = tokenize(text)
+    counts = Counter(tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])])
+    vector = np.zeros(VECTOR_DIM, dtype=np.float32)
+    for feature, count in counts.items():
+        h = zlib.crc32(feature.encode("utf-8"))
+        # The hash's top bit picks the sign, so colliding features tend to cancel rather than add up
+        vector[h % VECTOR_DIM] += (1.0 + math.log(count)) * (1.0 if h & 0x80000000 else -1.0)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+def interpret_question(question):
+    # (checklist item ID or None, remaining descriptive words) for a free-text question
+    match = ITEM_ID_RE.search(question or "")
+    rest = ITEM_ID_RE.sub(" ", question or "")
+    words = [t for t in tokenize(rest) if t not in QUESTION_WORDS and not re.fullmatch(r"\d+", t)]
+    return (match.group() if match else None), " ".join(words)
+
+def clause_matches(index, results):
+    # {chunk id: [(section, item id, status, justification)]} for the found items of evaluated sections.
+    # Items that cite a passage use it; otherwise the chunk ranking highest for the item's text and
+    # justification is taken, which needs no LLM call.
+    chunk_ids = {chunk["id"] for chunk in index.chunks}
+    matches = {}
+    for result in results:
+        for evaluation in result.get("Matched Details", []):
+            if evaluation.get("Status") not in INDEXED_STATUSES:
+                continue
+            chunk_id = cited_chunk_id(evaluation)
+            if chunk_id not in chunk_ids:
+                best = index.search(f"{evaluation.get('Checklist Text', '')} {evaluation.get('Justification', '')}",
+                                    k=1)
+                if not best:
+                    continue
+                chunk_id = best[0][0]["id"]
+            matches.setdefault(chunk_id, []).append((
+                result["Section"], evaluation["Checklist Item ID"], evaluation["Status"],
+                evaluation.get("Justification", "")
+            ))
+    return matches
+
+class ClauseIndex:
+    # Clauses of evaluated policies, searchable by similarity without any LLM call.
+    # Clause text, source document and the checklist items each clause was matched to are kept in SQLite; the
+    # clause vectors are rows of an append-only float32 file that is memory-mapped for search, so the index
+    # scales past available RAM. Row n of the file belongs to the clause with row = n.
+    # Several processes (the app, dpdpa-check --index) may share one directory: appends hold SQLite's write
+    # lock while they re-read the row count and write the vector file, and readers pick up new rows on demand.
+
+    def __init__(self, directory=DEFAULT_CLAUSE_INDEX_DIR):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.vector_path = os.path.join(directory, "vectors.f32")
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(directory, "clauses.sqlite3"), check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS documents (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    text_hash TEXT NOT NULL UNIQUE,
+                    added_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS clauses (
+                    row INTEGER PRIMARY KEY,
+                    document_id INTEGER NOT NULL REFERENCES documents(id),
+                    chunk_id TEXT NOT NULL,
+                    heading TEXT,
+                    text TEXT NOT NULL,
+                    page INTEGER
+                );
+                CREATE TABLE IF NOT EXISTS clause_items (
+                    clause_row INTEGER NOT NULL REFERENCES clauses(row),
+                    section TEXT NOT NULL,
+                    item_id TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    justification TEXT,
+                    PRIMARY KEY (clause_row, item_id)
+                );
+                CREATE TABLE IF NOT EXISTS meta (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_clauses_document ON clauses(document_id);
+                CREATE INDEX IF NOT EXISTS idx_clause_items_item ON clause_items(item_id, status);
+            """)
+        self._count = 0
+        self._generation = 0  # bumped by clear, so other processes drop their view of the old rows
+        # Per-dimension count of clauses using it, for query-side IDF weighting
+        self._doc_freq = np.zeros(VECTOR_DIM, dtype=np.int64)
+        self._matrix = None
+        with self._lock:
+            self._sync()
+
+    def _sync(self):
+        # Called with self._lock held: picks up rows another process appended since the last look.
+        # Rows are numbered from 0 without gaps, so the primary key's maximum gives the count cheaply
+        count = self._conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM clauses").fetchone()[0]
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        generation = row["value"] if row else 0
+        if count != self._count or generation != self._generation:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'doc_freq'").fetchone()
+            self._doc_freq = (np.frombuffer(row["value"], dtype=np.int64).copy() if row
+                              else np.zeros(VECTOR_DIM, dtype=np.int64))
+            self._count = count
+            self._generation = generation
+            self._matrix = None
+
+    def _vectors(self):
+        # Re-mapped only after rows were added; rows past the recorded count (a crashed append) are ignored
+        if not self._count:
+            return None
+        if self._matrix is None or self._matrix.shape[0] != self._count:
+            self._matrix = np.memmap(self.vector_path, dtype=np.float32, mode="r", shape=(self._count, VECTOR_DIM))
+        return self._matrix
+
+    def add_document(self, name, policy_text, results):
+        # Index an evaluated policy's clauses and the checklist items they were matched to.
+        # Adding the same text again (ignoring whitespace) only refreshes its name and item matches.
+        text_hash = hashlib.sha256(normalize_policy_text(policy_text).encode("utf-8")).hexdigest()
+        index = get_policy_index(policy_text)
+        matches = clause_matches(index, [r for r in results if not r.get("Error")])
+        vectors = np.stack([clause_vector(f"{c['heading']} {c['text']}") for c in index.chunks]) if index.chunks else None
+
+        with self._lock, self._conn:
+            # The write lock is taken up front and also guards the vector file, so no other process can append
+            # between reading the row count and writing the rows
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._sync()
+            row = self._conn.execute("SELECT id FROM documents WHERE text_hash = ?", (text_hash,)).fetchone()
+            if row is not None:
+                document_id = row["id"]
+                self._conn.execute("UPDATE documents SET name = ?, added_at = ? WHERE id = ?",
+                                   (name, time.time(), document_id))
+                self._conn.execute(
+                    "DELETE FROM clause_items WHERE clause_row IN (SELECT row FROM clauses WHERE document_id = ?)",
+                    (document_id,)
+                )
+            else:
+                document_id = self._conn.execute(
+                    "INSERT INTO documents (name, text_hash, added_at) VALUES (?, ?, ?)", (name, text_hash, time.time())
+                ).lastrowid
+                if vectors is not None:
+                    self._append_vectors(vectors)
+                    self._conn.executemany(
+                        "INSERT INTO clauses (row, document_id, chunk_id, heading, text, page) VALUES (?, ?, ?, ?, ?, ?)",
+                        [(self._count + n, document_id, c["id"], c["heading"], c["text"], c.get("page"))
+                         for n, c in enumerate(index.chunks)]
+                    )
+                    doc_freq = self._doc_freq + np.count_nonzero(vectors, axis=0)
+                    self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('doc_freq', ?)",
+                                       (doc_freq.tobytes(),))
+                    self._doc_freq = doc_freq
+                    self._count += len(vectors)
+
+            rows = dict(self._conn.execute(
+                "SELECT chunk_id, row FROM clauses WHERE document_id = ?", (document_id,)
+            ).fetchall())
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO clause_items (clause_row, section, item_id, status, justification) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(rows[chunk_id], *match) for chunk_id, found in matches.items() if chunk_id in rows
+                 for match in found]
+            )
+        return document_id
+
+    def _append_vectors(self, vectors):
+        # Written at the recorded end rather than the file's end, overwriting any rows from a crashed append
+        mode = "r+b" if os.path.exists(self.vector_path) else "wb"
+        with open(self.vector_path, mode) as f:
+            f.seek(self._count * VECTOR_DIM * 4)
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+            f.truncate()
+
+    def search(self, query, item_id=None, status=None, k=DEFAULT_RESULTS):
+        # The k clauses most similar to the query, optionally only those matched to one checklist item
+        with self._lock:
+            self._sync()
+            vectors = self._vectors()
+            idf = np.log((1 + self._count) / (1 + self._doc_freq)).astype(np.float32) + 1
+            candidates = None
+            if item_id:
+                sql = "SELECT clause_row FROM clause_items WHERE item_id = ?" + (" AND status = ?" if status else "")
+                candidates = np.array([r[0] for r in self._conn.execute(
+                    sql, (item_id, status) if status else (item_id,)
+                ).fetchall()], dtype=np.int64)
+        if vectors is None or (candidates is not None and not len(candidates)):
+            return []
+
+        q = clause_vector(query) * idf
+        norm = np.linalg.norm(q)
+        if not norm:
+            return []
+        q /= norm
+        if candidates is not None:
+            scores = np.asarray(vectors[candidates] @ q)
+        else:
+            candidates = np.arange(vectors.shape[0])
+            scores = np.concatenate([np.asarray(vectors[start:start + SEARCH_BLOCK_ROWS] @ q)
+                                     for start in range(0, vectors.shape[0], SEARCH_BLOCK_ROWS)])
+        top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k] if len(scores) > k else np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return self._describe([(int(candidates[i]), float(scores[i])) for i in top], item_id)
+
+    def _describe(self, ranked, item_id):
+        if not ranked:
+            return []
+        rows = [row for row, _ in ranked]
+        with self._lock:
+            clauses = {r["row"]: dict(r) for r in self._conn.execute(f"""
+                SELECT c.row, c.heading, c.text, c.page, d.name FROM clauses c JOIN documents d ON d.id = c.document_id
+                WHERE c.row IN ({', '.join('?' * len(rows))})
+            """, rows).fetchall()}
+            items = {}
+            for r in self._conn.execute(f"""
+                SELECT clause_row, item_id, status, justification FROM clause_items
+                WHERE clause_row IN ({', '.join('?' * len(rows))})
+            """, rows).fetchall():
+                items.setdefault(r["clause_row"], []).append(dict(r))
+        hits = []
+        for row, score in ranked:
+            clause = clauses[row]
+            matched = items.get(row, [])
+            focus = next((m for m in matched if m["item_id"] == item_id), None)
+            hits.append({
+                "Score": round(score, 3),
+                "Document": clause["name"],
+                "Page": clause["page"],
+                "Heading": clause["heading"],
+                "Clause": clause["text"],
+                "Matched Items": [m["item_id"] for m in matched],
+                "Status": focus["status"] if focus else None,
+                "Justification": focus["justification"] if focus else None,
+            })
+        return hits
+
+    def clear(self):
+        # Forget every indexed document, its clause text and vectors
+        with self._lock, self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._sync()
+            for table in ("clause_items", "clauses", "documents"):
+                self._conn.execute(f"DELETE FROM {table}")
+            self._conn.execute("DELETE FROM meta WHERE key = 'doc_freq'")
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('generation', ?)",
+                               (self._generation + 1,))
+            # A new file rather than a truncated one: other processes may still have the old one mapped
+            tmp_path = self.vector_path + ".tmp"
+            open(tmp_path, "wb").close()
+            os.replace(tmp_path, self.vector_path)
+            self._sync()
+
+    def stats(self):
+        with self._lock:
+            self._sync()
+            documents = self._conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            matched = self._conn.execute("SELECT COUNT(DISTINCT clause_row) FROM clause_items").fetchone()[0]
+        return {"documents": documents, "clauses": self._count, "matched_clauses": matched}
+
+    def item_coverage(self):
+        # Per checklist item, how many indexed documents have a clause matched to it
+        with self._lock:
+            rows = self._conn.execute("""
+                SELECT i.item_id, COUNT(DISTINCT c.document_id) AS documents FROM clause_items i
+                JOIN clauses c ON c.row = i.clause_row GROUP BY i.item_id
+            """).fetchall()
+        return {r["item_id"]: r["documents"] for r in rows}
+
+_clause_index = None
+_clause_index_lock = threading.Lock()
+
+def get_clause_index():
+    global _clause_index
+    with _clause_index_lock:
+        if _clause_index is None:
+            _clause_index = ClauseIndex()
+        return _clause_index
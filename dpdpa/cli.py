@@ -0,0 +1,158 @@
+import argparse
+import csv
+import json
+import os
+import sys
+
+from dpdpa.batch import flatten_results
+from dpdpa.checklists import dpdpa_checklists, get_registry, industries
+from dpdpa import engine
+
+CSV_COLUMNS = ["Document", "Section", "Checklist Item ID", "Checklist Text", "Status", "Justification",
+               "Match Level", "Score"]
+
+def read_policy(path):
+    if path.lower().endswith(".pdf"):
+        extraction = {}
+        with open(path, "rb") as f:
+            text = engine.extract_text_from_pdf(f, stats=extraction)
+        if extraction.get("ocr_unavailable"):
+            print(f"{path}: {extraction['ocr_unavailable']} scanned pages were skipped because Tesseract OCR is not "
+                  "installed", file=sys.stderr)
+        return text
+    with open(path, encoding="utf-8", errors="replace") as f:
+        return f.read()
+
+def load_state(path):
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+def save_state(path, state):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def evaluate_document(path, args, snapshots=None):
+    text = read_policy(path)
+    if not text.strip():
+        raise ValueError("no extractable text")
+    if args.offline:
+        registry = get_registry(args.industry)
+        results = [engine.prescreen_section(sid, registry.items(sid), text) for sid in args.sections]
+    elif args.mode == "batched":
+        results = engine.analyze_all_sections_batched(args.sections, text, model=args.model, timeout=args.timeout,
+                                                      force_refresh=args.force_refresh, industry=args.industry)
+    else:
+        by_section = {
+            r["Section"]: r for r in engine.analyze_sections_concurrently(
+                args.sections, text, model=args.model, max_workers=args.workers, timeout=args.timeout,
+                force_refresh=args.force_refresh, top_k=args.top_k, snapshots=snapshots, prescreen=args.prescreen,
+                industry=args.industry
+            )
+        }
+        results = [by_section[sid] for sid in args.sections]
+    # Imported only when used: the clause index pulls in numpy, which would slow every other run's start-up
+    if args.record:
+        from dpdpa.reports import get_results_store
+        get_results_store().add_run(os.path.basename(path), results, industry=args.industry,
+                                    model="offline" if args.offline else args.model, source="cli")
+    if args.index:
+        from dpdpa.clauses import get_clause_index
+        get_clause_index().add_document(os.path.basename(path), text, results)
+    return results
+
+def write_output(documents, fmt, out):
+    if fmt == "json":
+        json.dump(documents, out, indent=2, ensure_ascii=False)
+        out.write("\n")
+        return
+    writer = csv.DictWriter(out, fieldnames=CSV_COLUMNS)
+    writer.writeheader()
+    for doc in documents:
+        if doc.get("Error"):
+            writer.writerow({"Document": doc["Document"], "Status": "Error", "Justification": doc["Error"],
+                             "Match Level": "Error", "Score": 0.0})
+        else:
+            writer.writerows(flatten_results(doc["Document"], doc["Results"]))
+
+def parse_sections(value):
+    sections = [s.strip() for s in value.split(",") if s.strip()] if value != "all" else list(dpdpa_checklists)
+    unknown = [s for s in sections if s not in dpdpa_checklists]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"unknown section(s) {', '.join(unknown)}; choose from {', '.join(dpdpa_checklists)}"
+        )
+    return sections
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog="dpdpa-check",
+        description="Check privacy policies (PDF or text files) against DPDPA section checklists."
+    )
+    parser.add_argument("files", nargs="+", help="policy documents (.pdf, anything else is read as text)")
+    parser.add_argument("-s", "--sections", type=parse_sections, default=list(dpdpa_checklists),
+                        help="comma-separated section ids, or 'all' (default)")
+    parser.add_argument("-f", "--format", choices=["json", "csv"], default=None,
+                        help="output format (default: from the output file extension, else json)")
+    parser.add_argument("-o", "--output", help="write results here instead of stdout")
+    parser.add_argument("-m", "--model", default="gpt-4",
+                        help=f"OpenAI model, or '{engine.TIERED_MODEL}' to classify with {engine.FAST_MODEL} and "
+                             f"re-check uncertain items with {engine.STRONG_MODEL}")
+    parser.add_argument("--industry", choices=industries(), default=None,
+                        help="add that industry's checklist items to the base sections")
+    parser.add_argument("--mode", choices=["per-section", "batched"], default="per-section",
+                        help="one GPT request per section, or one request for all sections")
+    parser.add_argument("--workers", type=int, default=engine.MAX_CONCURRENT_SECTIONS,
+                        help="parallel GPT calls per document")
+    parser.add_argument("--top-k", type=int, default=None,
+                        help="only send the top-k retrieved passages per checklist item")
+    parser.add_argument("--timeout", type=float, default=engine.SECTION_TIMEOUT_SECONDS,
+                        help="per-section time budget in seconds")
+    parser.add_argument("--force-refresh", action="store_true", help="ignore cached results")
+    parser.add_argument("--prescreen", action="store_true",
+                        help="settle obvious items with local phrase rules and only send the rest to GPT")
+    parser.add_argument("--offline", action="store_true",
+                        help="rough scan with the local rules only; no GPT calls, no API key needed")
+    parser.add_argument("--record", action="store_true",
+                        help="add the results to the history behind the Dashboard & Reports page")
+    parser.add_argument("--index", action="store_true",
+                        help="add each document's clauses to the Knowledge Assistant's clause index")
+    parser.add_argument("--state", metavar="FILE",
+                        help="keep per-document results here and on later runs only re-check items "
+                             "affected by edits (per-section mode)")
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    fmt = args.format or ("csv" if args.output and args.output.lower().endswith(".csv") else "json")
+
+    state = load_state(args.state)
+    documents = []
+    failed = False
+    for n, path in enumerate(args.files, start=1):
+        print(f"[{n}/{len(args.files)}] {path}", file=sys.stderr)
+        snapshots = state.setdefault(os.path.abspath(path), {}) if args.state else None
+        try:
+            results = evaluate_document(path, args, snapshots)
+        except Exception as e:
+            print(f"  error: {e}", file=sys.stderr)
+            documents.append({"Document": os.path.basename(path), "Error": str(e)})
+            failed = True
+            continue
+        failed = failed or any(r.get("Error") for r in results)
+        documents.append({"Document": os.path.basename(path), "Results": results})
+
+    if args.state:
+        save_state(args.state, state)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8", newline="") as out:
+            write_output(documents, fmt, out)
+    else:
+        write_output(documents, fmt, sys.stdout)
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
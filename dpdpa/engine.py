@@ -0,0 +1,892 @@
+import contextlib
+import io
+import os
+import queue
+import random
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+
+from dpdpa.cache import ResultCache, make_cache_key
+from dpdpa.checklists import checklist_prompt_text, get_registry, section_title
+from dpdpa.chunking import MIN_CHUNK_TOKENS, count_tokens, prompt_budget, split_text, strongest_evaluations
+from dpdpa.incremental import build_snapshot, items_to_recheck, run_settings
+from dpdpa.metrics import record as record_metric
+from dpdpa.parsing import STATUS_WEIGHTS, parse_model_json, validate_evaluations
+from dpdpa.pdf import extract_pdf_pages, join_pages
+from dpdpa.prescreen import prescreen_evaluations
+from dpdpa.ratelimit import MAX_IN_FLIGHT_REQUESTS, current_session, get_rate_limiter, get_scheduler, session
+from dpdpa.retrieval import get_policy_index, format_passages, passage_label
+from dpdpa.streaming import ChecklistStreamParser
+
+# Importable without Streamlit: the OpenAI client and the result cache are only built on first use,
+# and openai/PyMuPDF are imported lazily so CLI start-up stays fast.
+
+# --- OpenAI Setup ---
+# One client per process: its connection pool keeps HTTPS connections to the API alive across calls,
+# sessions and Streamlit reruns
+HTTP_KEEPALIVE_SECONDS = 60
+
+_api_key = None
+_client = None
+_client_lock = threading.Lock()
+
+def set_api_key(api_key):
+    global _api_key, _client
+    with _client_lock:
+        if api_key != _api_key:
+            _api_key = api_key
+            _client = None
+
+def set_client(client):
+    # Use a pre-built client, e.g. a stand-in that replays recorded responses in benchmarks
+    global _client
+    with _client_lock:
+        _client = client
+
+def pooled_http_client(openai):
+    # Pool sized to the scheduler's slots. httpx is only a dependency of some openai releases (others bundle
+    # their own HTTP library), so without it the SDK's default client, which also keeps connections alive, is used
+    try:
+        import httpx
+    except ImportError:
+        return None
+    return openai.DefaultHttpxClient(limits=httpx.Limits(
+        max_connections=MAX_IN_FLIGHT_REQUESTS, max_keepalive_connections=MAX_IN_FLIGHT_REQUESTS,
+        keepalive_expiry=HTTP_KEEPALIVE_SECONDS
+    ))
+
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            import openai
+            # Falls back to the OPENAI_API_KEY environment variable when no key was set
+            _client = openai.OpenAI(api_key=_api_key or os.environ.get("OPENAI_API_KEY"),
+                                    http_client=pooled_http_client(openai))
+        return _client
+
+# --- Concurrency Settings ---
+MAX_CONCURRENT_SECTIONS = 3       # parallel GPT calls for "All Sections"
+MAX_CONCURRENT_PARTS = 3          # parallel GPT calls per section when a long policy is split into parts
+MAX_REASK_ATTEMPTS = 1            # follow-up requests for items missing or malformed in an answer
+SECTION_TIMEOUT_SECONDS = 180     # per-section budget, including 429 retries, re-asks, parts and tiers
+MAX_RATE_LIMIT_RETRIES = 5
+BACKOFF_BASE_SECONDS = 2
+BACKOFF_MAX_SECONDS = 30
+ESTIMATED_COMPLETION_TOKENS = 1500  # reserved against the token limit until the response reports its usage
+
+# --- Model Tiers ---
+# Passing TIERED_MODEL as the model classifies every item with FAST_MODEL first and re-checks only
+# uncertain ones with STRONG_MODEL; it works anywhere a model name is accepted
+TIERED_MODEL = "tiered"
+FAST_MODEL = "gpt-4o-mini"
+STRONG_MODEL = "gpt-4"
+ESCALATION_CONFIDENCE = 0.8       # fast verdicts below this confidence are re-checked
+TIER_AUDIT_FRACTION = 0.05        # share of confident verdicts re-checked anyway, to measure agreement above the threshold
+
+# Models that accept response_format={"type": "json_object"} (matched as name prefixes)
+JSON_MODE_MODELS = ("gpt-4o", "gpt-4.1", "gpt-4-turbo", "gpt-4-1106", "gpt-4-0125", "gpt-3.5-turbo")
+
+# --- Result Cache ---
+# Bump whenever create_full_policy_prompt changes so stale evaluations are not reused
+PROMPT_TEMPLATE_VERSION = 2
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+def get_result_cache():
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache()
+        return _result_cache
+
+# --- PDF Extractor ---
+def extract_text_from_pdf(pdf_file, progress=None, stats=None):
+    # Page texts are cached by file hash; pages are joined with form feeds so offsets map back to pages.
+    # Scanned pages are OCR'd; stats, if given, receives extract_pdf_pages' page counts and timings.
+    data = pdf_file.getvalue() if hasattr(pdf_file, "getvalue") else pdf_file.read()
+    stats = stats if stats is not None else {}
+    started = time.monotonic()
+    pages = extract_pdf_pages(data, progress=progress, stats=stats)
+    record_metric("pdf_extract", duration=time.monotonic() - started, pages=len(pages), cache_hit=stats["cache_hit"],
+                  ocr_pages=stats.get("ocr_pages", 0) + stats.get("ocr_cached", 0),
+                  ocr_duration=stats.get("ocr_seconds"))
+    # Text-layer pages take milliseconds and are only timed in aggregate; scanned pages get one event each
+    for timing in stats.get("page_timings", []):
+        if timing["method"] != "text":
+            record_metric("pdf_page", duration=timing["seconds"], status=timing["method"])
+    return join_pages(pages)
+
+# --- Prompt Generator ---
+def create_full_policy_prompt(section_id, full_policy_text, checklist, passages=None, part=None, confidence=False):
+    checklist_text = checklist_prompt_text(checklist)
+
+    # With retrieval, only the passages most relevant to this section are sent, each tagged [P<n>]
+    if passages is not None:
+        policy_block = f"""**Relevant Policy Passages** (excerpts retrieved from the full policy):
+    {format_passages(passages)}"""
+        scope = "the passages above. Anything not covered by them should be treated as not found in the policy"
+        source_field = '''
+          "Source Passage": "P3",'''
+    elif part is not None:
+        # One of several overlapping parts of a policy too long for a single request
+        policy_block = f"""**Policy Text (part {part[0]} of {part[1]}; the other parts are evaluated separately):**
+    {full_policy_text}"""
+        scope = "this part of the policy"
+        source_field = ""
+    else:
+        policy_block = f"""**Full Policy Text:**
+    {full_policy_text}"""
+        scope = "the policy"
+        source_field = ""
+
+    # The tiered mode's fast model also rates its own certainty, which decides what gets escalated
+    confidence_field = '''
+          "Confidence": 0.9,''' if confidence else ""
+    confidence_instruction = """
+    Also give a Confidence between 0 and 1 for each item: how sure you are that its Status is correct.
+    """ if confidence else ""
+
+    return f"""
+    You are a compliance analyst evaluating whether the following full privacy policy meets DPDPA Section {section_id}: {section_title(section_id)}.
+    
+    **Checklist:** Use the item numbers (e.g., 4.1, 4.2...) from the checklist below in your response. Do not rephrase or modify the checklist items. Evaluate strictly based on the original items.
+    
+    {checklist_text}
+    
+    {policy_block}
+    
+    Instructions:
+    For each checklist item, search anywhere in {scope} and classify it as:
+    - Explicitly Mentioned
+    - Partially Mentioned
+    - Missing
+    In each Justification, quote the policy's own words that support the Status in double quotes, so the evidence can be highlighted in the document.
+    {confidence_instruction}
+    Return output in this JSON format only:
+    {{
+      "Checklist Evaluation": [
+        {{
+          "Checklist Item ID": "4.1",
+          "Status": "Explicitly Mentioned",{source_field}{confidence_field}
+          "Justification": "..."
+        }},
+        ...
+      ],
+      "Match Level": "Fully Compliant / Partially Compliant / Non-Compliant",
+      "Compliance Score": 0.0,
+      "Suggested Rewrite": "...",
+      "Simplified Legal Meaning": "..."
+    }}
+    
+    Only return the JSON object. Do not include any commentary or explanation.
+    """
+
+# --- GPT Call ---
+def backoff_delay(attempt, error=None):
+    # Honour the server's Retry-After hint when present, otherwise exponential backoff with full jitter
+    retry_after = None
+    if error is not None and getattr(error, "response", None) is not None:
+        retry_after = error.response.headers.get("retry-after")
+    try:
+        if retry_after is not None:
+            return min(float(retry_after), BACKOFF_MAX_SECONDS) + random.uniform(0, 1)
+    except ValueError:
+        pass
+    return random.uniform(0, min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempt))
+
+def section_deadline(timeout, deadline=None):
+    # The absolute time a section's work must finish by: an inherited deadline wins, so re-asks, parts and
+    # tiers of one section share its budget instead of each starting a fresh timeout
+    if deadline is not None:
+        return deadline
+    return time.monotonic() + timeout if timeout else None
+
+@contextlib.contextmanager
+def gpt_call(model, timeout=None, section_id=None, deadline=None):
+    # Waits for the session's turn at one of the process-wide slots and holds it for the call, then records
+    # the call's wall time, queue wait, token usage and retry count in the metrics store.
+    # Yields (deadline, stats); the caller fills stats["usage"] and stats["retries"].
+    started = time.monotonic()
+    stats = {"retries": 0, "usage": None, "wait": 0.0}
+    error = None
+    try:
+        deadline = section_deadline(timeout, deadline)
+        with get_scheduler().slot(current_session(), deadline):
+            stats["wait"] = time.monotonic() - started
+            yield deadline, stats
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        usage = stats["usage"]
+        record_metric(
+            "llm_call", model=model, section=section_id, duration=time.monotonic() - started,
+            prompt_tokens=getattr(usage, "prompt_tokens", None),
+            completion_tokens=getattr(usage, "completion_tokens", None),
+            retries=stats["retries"], wait=stats["wait"],
+            error=f"{type(error).__name__}: {error}" if error else None
+        )
+
+def call_gpt(prompt, model="gpt-4", timeout=None, on_item=None, section_id=None, deadline=None):
+    # With on_item, the completion is streamed and on_item(raw_item) fires for each
+    # "Checklist Evaluation" entry as soon as it is complete; the return value is the same either way.
+    with gpt_call(model, timeout, section_id, deadline) as (deadline, stats):
+        return _call_gpt(prompt, model, timeout, deadline, on_item, stats)
+
+def create_completion(request, timeout, deadline, stats):
+    # Every attempt waits for the model's rate limit; a 429 pauses all of the model's callers, not just this one
+    import openai
+
+    limiter = get_rate_limiter(request["model"])
+    estimated = count_tokens(request["messages"][-1]["content"], request["model"]) + ESTIMATED_COMPLETION_TOKENS
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        stats["wait"] += limiter.acquire(estimated, deadline)
+        remaining = deadline - time.monotonic() if deadline else None
+        if remaining is not None and remaining <= 0:
+            raise TimeoutError(f"GPT call exceeded {timeout}s")
+        try:
+            response = get_client().with_options(max_retries=0, timeout=remaining).chat.completions.create(**request)
+            return response, lambda usage: limiter.settle(estimated, usage_tokens(usage))
+        except openai.RateLimitError as e:
+            delay = backoff_delay(attempt, e)
+            if attempt == MAX_RATE_LIMIT_RETRIES or (deadline and time.monotonic() + delay >= deadline):
+                raise
+            stats["retries"] += 1
+            limiter.pause(delay)
+        except openai.APITimeoutError:
+            raise TimeoutError(f"GPT call exceeded {timeout}s")
+
+def _call_gpt(prompt, model, timeout, deadline, on_item, stats):
+    import openai
+
+    request = dict(
+        model=model,
+        messages=[{"role": "user", "content": prompt}],
+        temperature=0
+    )
+    if model.startswith(JSON_MODE_MODELS):
+        request["response_format"] = {"type": "json_object"}
+    if on_item is not None:
+        request.update(stream=True, stream_options={"include_usage": True})
+    response, settle = create_completion(request, timeout, deadline, stats)
+
+    if on_item is None:
+        stats["usage"] = getattr(response, "usage", None)
+        settle(stats["usage"])
+        return parse_model_json(response.choices[0].message.content)
+
+    parser = ChecklistStreamParser()
+    try:
+        for chunk in response:
+            if deadline and time.monotonic() > deadline:
+                raise TimeoutError(f"GPT call exceeded {timeout}s")
+            if getattr(chunk, "usage", None) is not None:
+                stats["usage"] = chunk.usage  # sent on the final chunk, which has no choices
+            delta = chunk.choices[0].delta.content if chunk.choices else None
+            if delta:
+                for item in parser.feed(delta):
+                    on_item(item)
+    except openai.APITimeoutError:
+        raise TimeoutError(f"GPT call exceeded {timeout}s")
+    finally:
+        response.close()
+        settle(stats["usage"])
+    return parse_model_json(parser.buffer)
+
+def stream_gpt_text(prompt, model="gpt-4", timeout=None, section_id=None, temperature=0.3):
+    # Yields a free-text completion as it arrives (e.g. into st.write_stream); queued and rate limited like call_gpt
+    import openai
+
+    with gpt_call(model, timeout, section_id) as (deadline, stats):
+        request = dict(model=model, messages=[{"role": "user", "content": prompt}], temperature=temperature,
+                       stream=True, stream_options={"include_usage": True})
+        response, settle = create_completion(request, timeout, deadline, stats)
+        try:
+            for chunk in response:
+                if deadline and time.monotonic() > deadline:
+                    raise TimeoutError(f"GPT call exceeded {timeout}s")
+                if getattr(chunk, "usage", None) is not None:
+                    stats["usage"] = chunk.usage
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    yield delta
+        except openai.APITimeoutError:
+            raise TimeoutError(f"GPT call exceeded {timeout}s")
+        finally:
+            response.close()
+            settle(stats["usage"])
+
+def usage_tokens(usage):
+    if usage is None:
+        return None
+    return (getattr(usage, "prompt_tokens", 0) or 0) + (getattr(usage, "completion_tokens", 0) or 0)
+
+def request_evaluations(section_id, checklist, make_prompt, model="gpt-4", timeout=None, on_item=None,
+                        deadline=None):
+    # Ask GPT about the checklist, then re-ask only for items that were missing or malformed in the answer.
+    # make_prompt(items) builds the prompt for a subset of the checklist. Returns (result, unanswered ids).
+    deadline = section_deadline(timeout, deadline)
+    checklist_dict = {item["id"]: item["text"] for item in checklist}
+    evaluations, summary = {}, None
+    streamed = set()  # ids already sent to on_item; a re-ask may stream the same item again
+
+    def stream(item):
+        # Only verdicts that would pass validation reach the UI: known IDs with a recognisable status
+        valid, _ = validate_evaluations({"Checklist Evaluation": [item]}, checklist)
+        for item_id, entry in valid.items():
+            if item_id not in streamed:
+                streamed.add(item_id)
+                on_item(build_evaluation(entry, checklist_dict))
+
+    pending = list(checklist)
+    for attempt in range(MAX_REASK_ATTEMPTS + 1):
+        try:
+            response = call_gpt(make_prompt(pending), model=model, timeout=timeout,
+                                on_item=stream if on_item is not None else None, section_id=section_id,
+                                deadline=deadline)
+        except ValueError:
+            response = {}  # nothing recoverable in the answer; every pending item is asked again
+        if summary is None and isinstance(response, dict) and response:
+            summary = response
+        valid, missing = validate_evaluations(response, pending)
+        evaluations.update(valid)
+        pending = [item for item in pending if item["id"] in missing]
+        if not pending:
+            break
+    if not evaluations:
+        raise ValueError("GPT returned no usable checklist verdicts")
+
+    result = {
+        "Checklist Evaluation": [evaluations[item["id"]] for item in checklist if item["id"] in evaluations],
+        "Suggested Rewrite": summary.get("Suggested Rewrite", ""),
+        "Simplified Legal Meaning": summary.get("Simplified Legal Meaning", ""),
+    }
+    if not pending and len(evaluations) == len(valid) and summary.get("Match Level"):
+        result["Match Level"] = summary["Match Level"]  # one complete answer: keep GPT's own verdict
+    return result, [item["id"] for item in pending]
+
+def error_section_result(section_id, error):
+    return {
+        "Section": section_id,
+        "Title": section_title(section_id),
+        "Error": str(error),
+        "Match Level": "Error",
+        "Compliance Score": 0.0,
+        "Matched Details": [],
+        "Checklist Items Matched": [],
+        "Suggested Rewrite": "",
+        "Simplified Legal Meaning": ""
+    }
+
+def build_evaluation(item, checklist_dict):
+    # GPT sometimes answers null for a field; that reads as the field being absent
+    item_id = str(item.get("Checklist Item ID") or "").strip()
+    evaluation = {
+        "Checklist Item ID": item_id,
+        "Checklist Text": checklist_dict.get(item_id, "❓"),
+        "Status": str(item.get("Status") or "Missing").strip(),
+        "Justification": str(item.get("Justification") or "").strip()
+    }
+    if item.get("Source Passage"):
+        evaluation["Source Passage"] = str(item["Source Passage"]).strip()
+    if item.get("Policy Part"):
+        evaluation["Policy Part"] = item["Policy Part"]
+    try:
+        if item.get("Confidence") is not None:
+            evaluation["Confidence"] = min(max(float(item["Confidence"]), 0.0), 1.0)
+    except (TypeError, ValueError):
+        pass
+    return evaluation
+
+def build_section_result(section_id, checklist, result):
+    checklist_dict = {item["id"]: item["text"] for item in checklist}
+    evaluations = [build_evaluation(item, checklist_dict) for item in result.get("Checklist Evaluation", [])]
+
+    score = sum(STATUS_WEIGHTS.get(e["Status"], 0) for e in evaluations) / len(checklist) if checklist else 0
+    level = (
+        "Fully Compliant" if score == 1 else
+        "Non-Compliant" if score == 0 else
+        "Partially Compliant"
+    )
+
+    return {
+        "Section": section_id,
+        "Title": section_title(section_id),
+        "Match Level": result.get("Match Level", level),
+        "Compliance Score": round(score, 2),
+        "Matched Details": evaluations,
+        "Checklist Items Matched": [f"{e['Checklist Item ID']} — {e['Checklist Text']}" for e in evaluations if e["Status"] in STATUS_WEIGHTS],
+        "Suggested Rewrite": str(result.get("Suggested Rewrite") or ""),
+        "Simplified Legal Meaning": str(result.get("Simplified Legal Meaning") or "")
+    }
+
+def merge_section_evaluations(section_id, checklist, evaluations, summary):
+    # Rebuild a section result from Matched Details gathered from several sources (GPT, reuse, pre-screen)
+    return build_section_result(section_id, checklist, {
+        "Checklist Evaluation": [evaluations[item["id"]] for item in checklist if item["id"] in evaluations],
+        "Suggested Rewrite": summary.get("Suggested Rewrite", ""),
+        "Simplified Legal Meaning": summary.get("Simplified Legal Meaning", "")
+    })
+
+def analyze_policy_section(section_id, checklist, policy_text, model="gpt-4", timeout=None, force_refresh=False,
+                           top_k=None, on_item=None, prescreen=False, confidence=False, deadline=None):
+    # on_item(evaluation) is called with each Matched Details entry while the GPT response streams in.
+    # With prescreen, items settled by the local rules are not sent to GPT at all.
+    # With confidence, GPT also rates each verdict (0-1), kept as the evaluation's "Confidence".
+    # timeout is the whole section's budget; deadline, when given, is that budget's end set by a caller.
+    deadline = section_deadline(timeout, deadline)
+    if model == TIERED_MODEL:
+        return analyze_policy_section_tiered(section_id, checklist, policy_text, timeout, force_refresh, top_k,
+                                             on_item, prescreen, deadline=deadline)
+    if prescreen:
+        screened = prescreen_evaluations(checklist, policy_text)
+        if screened:
+            for evaluation in screened.values():
+                if on_item is not None:
+                    on_item(evaluation)
+            uncertain = [item for item in checklist if item["id"] not in screened]
+            gpt_result = {}
+            if uncertain:
+                gpt_result = analyze_policy_section(section_id, uncertain, policy_text, model, timeout,
+                                                    force_refresh, top_k, on_item, confidence=confidence,
+                                                    deadline=deadline)
+                if gpt_result.get("Error"):
+                    return gpt_result
+            evaluations = dict(screened)
+            evaluations.update({e["Checklist Item ID"]: e for e in gpt_result.get("Matched Details", [])})
+            result = merge_section_evaluations(section_id, checklist, evaluations, gpt_result)
+            result["Cached"] = gpt_result.get("Cached", True)
+            result["Prescreened"] = sorted(screened, key=lambda item_id: [int(n) for n in item_id.split(".")])
+            return result
+
+    version = f"{PROMPT_TEMPLATE_VERSION}-top{top_k}" if top_k else PROMPT_TEMPLATE_VERSION
+    if confidence:
+        version = f"{version}-conf"
+    cache_key = make_cache_key(policy_text, section_id, checklist, model, version)
+    started = time.monotonic()
+    if not force_refresh:
+        cached = get_result_cache().get(cache_key)
+        if cached is not None:
+            cached["Cached"] = True
+            record_metric("section", model=model, section=section_id, duration=time.monotonic() - started,
+                          cache_hit=1)
+            return cached
+
+    passages = get_policy_index(policy_text).passages_for_checklist(checklist, k=top_k) if top_k else None
+    prompt = create_full_policy_prompt(section_id, policy_text, checklist, passages=passages, confidence=confidence)
+
+    try:
+        if passages is None and count_tokens(prompt, model) > prompt_budget(model):
+            section_result = analyze_policy_in_parts(section_id, checklist, policy_text, model, timeout, on_item,
+                                                     confidence, deadline)
+        else:
+            result, unanswered = request_evaluations(
+                section_id, checklist,
+                lambda items: create_full_policy_prompt(section_id, policy_text, items, passages=passages,
+                                                        confidence=confidence),
+                model, timeout, on_item, deadline
+            )
+            section_result = build_section_result(section_id, checklist, result)
+            if unanswered:
+                section_result["Unanswered"] = unanswered
+    except Exception as e:
+        record_metric("section", model=model, section=section_id, duration=time.monotonic() - started,
+                      cache_hit=0, error=str(e))
+        return error_section_result(section_id, e)
+
+    if passages:
+        # Expand the cited passage id into the passage itself so reviewers can check the evidence
+        passages_by_id = {p["id"]: p for p in passages}
+        for evaluation in section_result["Matched Details"]:
+            pid = evaluation.get("Source Passage", "").strip("[] ").split(",")[0]
+            if pid in passages_by_id:
+                passage = passages_by_id[pid]
+                evaluation["Source Passage"] = f"[{passage_label(passage)}] {passage['text']}"
+    # An incomplete answer is not cached, so the next run asks again
+    if not section_result.get("Unanswered"):
+        get_result_cache().set(cache_key, section_result)
+    section_result["Cached"] = False
+    record_metric("section", model=model, section=section_id, duration=time.monotonic() - started, cache_hit=0)
+    return section_result
+
+def analyze_policy_in_parts(section_id, checklist, policy_text, model="gpt-4", timeout=None, on_item=None,
+                            confidence=False, deadline=None):
+    # For policies over the model's context window: evaluate overlapping parts in parallel, then keep the
+    # strongest status per item. A part that fails fails the section, since its items would read as Missing.
+    # The parts share the section's deadline.
+    deadline = section_deadline(timeout, deadline)
+    overhead = count_tokens(create_full_policy_prompt(section_id, "", checklist, part=(1, 1), confidence=confidence),
+                            model)
+    budget = prompt_budget(model) - overhead
+    if budget < MIN_CHUNK_TOKENS:
+        raise ValueError(f"The Section {section_id} checklist leaves no room for policy text in {model}'s context window")
+    spans = split_text(policy_text, budget, model=model)
+
+    def evaluate_part(number, span):
+        result, _ = request_evaluations(
+            section_id, checklist,
+            lambda items: create_full_policy_prompt(section_id, policy_text[span[0]:span[1]], items,
+                                                    part=(number, len(spans)), confidence=confidence),
+            model, timeout, deadline=deadline
+        )
+        return build_section_result(section_id, checklist, result)
+
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_PARTS) as executor:
+        # Each part runs in a copy of this thread's context, so its calls queue under the same session
+        futures = [executor.submit(copy_context().run, evaluate_part, number, span)
+                   for number, span in enumerate(spans, 1)]
+        parts = [future.result() for future in futures]
+
+    evaluations = strongest_evaluations(parts)
+    if on_item is not None:
+        for item in checklist:
+            if item["id"] in evaluations:
+                on_item(evaluations[item["id"]])
+    # Rewrite and plain-language summary come from the first part, which usually holds the policy's overview
+    result = merge_section_evaluations(section_id, checklist, evaluations, parts[0])
+    result["Parts"] = len(spans)
+    unanswered = [item["id"] for item in checklist if item["id"] not in evaluations]
+    if unanswered:
+        result["Unanswered"] = unanswered
+    return result
+
+def analyze_policy_section_tiered(section_id, checklist, policy_text, timeout=None, force_refresh=False, top_k=None,
+                                  on_item=None, prescreen=False, fast_model=FAST_MODEL, strong_model=STRONG_MODEL,
+                                  threshold=ESCALATION_CONFIDENCE, audit_fraction=TIER_AUDIT_FRACTION,
+                                  deadline=None):
+    # FAST_MODEL classifies every item with a confidence. Partially Mentioned, low-confidence and unanswered
+    # items, plus a small audit sample of the rest, are re-checked by STRONG_MODEL, whose verdict wins.
+    # Per-tier timing and fast/strong agreement go to the metrics store for tuning the threshold.
+    # Both tiers share the section's deadline.
+    deadline = section_deadline(timeout, deadline)
+    started = time.monotonic()
+    fast = analyze_policy_section(section_id, checklist, policy_text, fast_model, timeout, force_refresh, top_k,
+                                  on_item, prescreen, confidence=True, deadline=deadline)
+    fast_seconds = time.monotonic() - started
+    if fast.get("Error"):
+        return fast
+    record_metric("tier", model=fast_model, section=section_id, duration=fast_seconds, items=len(checklist),
+                  cache_hit=int(bool(fast.get("Cached"))))
+
+    fast_items = {e["Checklist Item ID"]: e for e in fast["Matched Details"]}
+    settled_locally = set(fast.get("Prescreened", []))
+    # The audit sample is a fixed function of the policy and item, so re-runs hit the result cache
+    salt = zlib.crc32(policy_text.encode("utf-8"))
+    escalated, audited = [], []
+    for item in checklist:
+        evaluation = fast_items.get(item["id"])
+        if item["id"] in settled_locally:
+            continue
+        if (evaluation is None or evaluation["Status"] == "Partially Mentioned"
+                or evaluation.get("Confidence", 0.0) < threshold):
+            escalated.append(item)
+        elif zlib.crc32(item["id"].encode("utf-8"), salt) % 1000 < audit_fraction * 1000:
+            audited.append(item)
+
+    recheck = [item for item in checklist if item in escalated or item in audited]
+    strong_result = None
+    strong = {}
+    if recheck:
+        started = time.monotonic()
+        strong_result = analyze_policy_section(section_id, recheck, policy_text, strong_model, timeout,
+                                               force_refresh, top_k, deadline=deadline)
+        if strong_result.get("Error"):
+            return strong_result
+        record_metric("tier", model=strong_model, section=section_id, duration=time.monotonic() - started,
+                      items=len(recheck), cache_hit=int(bool(strong_result.get("Cached"))))
+        strong = {e["Checklist Item ID"]: e for e in strong_result["Matched Details"]}
+
+    compared = [item["id"] for item in recheck if item["id"] in fast_items and item["id"] in strong]
+    agreed = [item_id for item_id in compared if fast_items[item_id]["Status"] == strong[item_id]["Status"]]
+    if strong_result is not None and not strong_result.get("Cached"):
+        for item_id in compared:
+            record_metric("tier_item", model=strong_model, section=section_id,
+                          status=fast_items[item_id]["Status"], confidence=fast_items[item_id].get("Confidence"),
+                          agreed=int(item_id in agreed))
+
+    evaluations = dict(fast_items)
+    evaluations.update(strong)
+    # The fast tier saw every item, so its rewrite and summary cover the whole section
+    result = merge_section_evaluations(section_id, checklist, evaluations, fast)
+    result["Cached"] = bool(fast.get("Cached")) and (strong_result is None or bool(strong_result.get("Cached")))
+    if fast.get("Prescreened"):
+        result["Prescreened"] = fast["Prescreened"]
+    if fast.get("Parts"):
+        result["Parts"] = fast["Parts"]
+    result["Tiers"] = {
+        "Fast Model": fast_model,
+        "Strong Model": strong_model,
+        "Escalated": [item["id"] for item in escalated],
+        "Audited": [item["id"] for item in audited],
+        "Agreement": round(len(agreed) / len(compared), 2) if compared else None,
+    }
+    return result
+
+def prescreen_section(section_id, checklist, policy_text):
+    # Offline rough scan: local rules only, no GPT call; items they cannot settle are reported as Missing
+    evaluations = prescreen_evaluations(checklist, policy_text)
+    for item in checklist:
+        evaluations.setdefault(item["id"], {
+            "Checklist Item ID": item["id"],
+            "Status": "Missing",
+            "Justification": "Not found by the local pre-screen (offline scan, not checked by GPT)."
+        })
+    result = merge_section_evaluations(section_id, checklist, evaluations, {})
+    result["Prescreened"] = [item["id"] for item in checklist]
+    return result
+
+# --- Incremental Re-evaluation ---
+def analyze_policy_section_incremental(section_id, checklist, policy_text, previous=None, model="gpt-4",
+                                       timeout=None, force_refresh=False, top_k=None, on_item=None,
+                                       prescreen=False):
+    # Re-asks GPT only about items whose passages changed since `previous` (a snapshot from the last run)
+    # and returns (result, snapshot); the result has the same shape as analyze_policy_section's
+    settings = run_settings(model, top_k, prescreen)
+    dirty = (None if previous is None or force_refresh
+             else items_to_recheck(previous, checklist, policy_text, settings))
+    if dirty is None:
+        result = analyze_policy_section(section_id, checklist, policy_text, model, timeout, force_refresh,
+                                        top_k, on_item, prescreen)
+        if result.get("Error"):
+            return result, previous
+        return result, build_snapshot(section_id, checklist, policy_text, result, settings)
+
+    fresh = {}
+    fresh_result = None
+    if dirty:
+        fresh_result = analyze_policy_section(section_id, dirty, policy_text, model, timeout, force_refresh,
+                                              top_k, on_item, prescreen)
+        if fresh_result.get("Error"):
+            return fresh_result, previous
+        fresh = {e["Checklist Item ID"]: e for e in fresh_result["Matched Details"]}
+
+    evaluations = {item_id: entry["evaluation"] for item_id, entry in previous["items"].items()}
+    evaluations.update(fresh)
+    result = merge_section_evaluations(section_id, checklist, evaluations, fresh_result or previous["result"])
+    result["Cached"] = not dirty
+    result["Incremental"] = {
+        "Rechecked": [item["id"] for item in dirty],
+        "Reused": [item["id"] for item in checklist if item["id"] in evaluations and item["id"] not in fresh]
+    }
+    return result, build_snapshot(section_id, checklist, policy_text, result, settings)
+
+# --- Batched Evaluation ---
+def create_batched_policy_prompt(full_policy_text, section_ids, industry=None):
+    registry = get_registry(industry)
+    checklist_text = "\n\n".join(
+        f"Section {sid}: {registry.title(sid)}\n{registry.prompt_fragments[sid]}" for sid in section_ids
+    )
+
+    return f"""
+    You are a compliance analyst evaluating whether the following full privacy policy meets the DPDPA sections listed below.
+    
+    **Checklist:** Use the item numbers (e.g., 4.1, 4.2...) from the checklist below in your response. Do not rephrase or modify the checklist items. Evaluate strictly based on the original items. Evaluate every item of every section.
+    
+    {checklist_text}
+    
+    **Full Policy Text:**
+    {full_policy_text}
+    
+    Instructions:
+    For each checklist item, search anywhere in the policy and classify it as:
+    - Explicitly Mentioned
+    - Partially Mentioned
+    - Missing
+    In each Justification, quote the policy's own words that support the Status in double quotes, so the evidence can be highlighted in the document.
+    
+    Return output in this JSON format only, with one entry per section number:
+    {{
+      "Sections": {{
+        "4": {{
+          "Checklist Evaluation": [
+            {{
+              "Checklist Item ID": "4.1",
+              "Status": "Explicitly Mentioned",
+              "Justification": "..."
+            }},
+            ...
+          ],
+          "Match Level": "Fully Compliant / Partially Compliant / Non-Compliant",
+          "Compliance Score": 0.0,
+          "Suggested Rewrite": "...",
+          "Simplified Legal Meaning": "..."
+        }},
+        ...
+      }}
+    }}
+    
+    Only return the JSON object. Do not include any commentary or explanation.
+    """
+
+def split_batched_result(result, section_ids):
+    # Regroup items by their ID prefix so an item filed under the wrong section still lands in the right one
+    # Anything that is not the expected shape counts as empty, so its items are re-asked per section
+    sections = result.get("Sections") if isinstance(result, dict) else None
+    sections = {str(k): v for k, v in sections.items() if isinstance(v, dict)} if isinstance(sections, dict) else {}
+    per_section = {sid: dict(sections.get(sid, {}), **{"Checklist Evaluation": []}) for sid in section_ids}
+    for section in sections.values():
+        items = section.get("Checklist Evaluation")
+        for item in items if isinstance(items, list) else []:
+            if not isinstance(item, dict):
+                continue
+            sid = str(item.get("Checklist Item ID", "")).strip().split(".")[0]
+            if sid in per_section:
+                per_section[sid]["Checklist Evaluation"].append(item)
+    return per_section
+
+def analyze_all_sections_batched(section_ids, policy_text, model="gpt-4", timeout=SECTION_TIMEOUT_SECONDS,
+                                 force_refresh=False, industry=None):
+    # Sends the policy once for all sections and returns the same per-section dicts as analyze_policy_section
+    registry = get_registry(industry)
+    version = f"batched-{PROMPT_TEMPLATE_VERSION}"
+    cache_keys = {
+        sid: make_cache_key(policy_text, sid, registry.items(sid), model, version)
+        for sid in section_ids
+    }
+    if not force_refresh:
+        cached = {sid: get_result_cache().get(key) for sid, key in cache_keys.items()}
+        if all(r is not None for r in cached.values()):
+            for r in cached.values():
+                r["Cached"] = True
+            return [cached[sid] for sid in section_ids]
+
+    prompt = create_batched_policy_prompt(policy_text, section_ids, industry)
+    if model == TIERED_MODEL or count_tokens(prompt, model) > prompt_budget(model):
+        # Tiering is per item, and an over-long policy must be split: fall back to per-section requests
+        results = {r["Section"]: r for r in analyze_sections_concurrently(
+            section_ids, policy_text, model, timeout=timeout, force_refresh=force_refresh, industry=industry
+        )}
+        return [results[sid] for sid in section_ids]
+    try:
+        result = call_gpt(prompt, model=model, timeout=timeout, section_id="batched")
+    except ValueError:
+        result = {}  # unparseable answer: every item is re-asked per section below
+    except Exception as e:
+        return [error_section_result(sid, e) for sid in section_ids]
+
+    results = []
+    for sid, section in split_batched_result(result, section_ids).items():
+        checklist = registry.items(sid)
+        valid, missing = validate_evaluations(section, checklist)
+        unanswered = []
+        if missing:
+            # Re-ask only for this section's missing items instead of repeating the whole batched request
+            try:
+                extra, unanswered = request_evaluations(
+                    sid, [item for item in checklist if item["id"] in missing],
+                    lambda items, sid=sid: create_full_policy_prompt(sid, policy_text, items), model, timeout
+                )
+            except Exception as e:
+                if not valid:
+                    results.append(error_section_result(sid, e))
+                    continue
+                unanswered = missing
+            else:
+                valid.update({e["Checklist Item ID"]: e for e in extra["Checklist Evaluation"]})
+                section = dict(section, **{k: v for k, v in extra.items() if k != "Checklist Evaluation" and
+                                           not section.get(k)})
+            section.pop("Match Level", None)
+        section["Checklist Evaluation"] = [valid[item["id"]] for item in checklist if item["id"] in valid]
+
+        section_result = build_section_result(sid, checklist, section)
+        if unanswered:
+            section_result["Unanswered"] = unanswered
+        else:
+            get_result_cache().set(cache_keys[sid], section_result)
+        section_result["Cached"] = False
+        results.append(section_result)
+    return results
+
+# --- Concurrent Section Runner ---
+def iter_section_events(section_ids, policy_text, model="gpt-4",
+                        max_workers=MAX_CONCURRENT_SECTIONS, timeout=SECTION_TIMEOUT_SECONDS,
+                        force_refresh=False, top_k=None, stream_items=False, snapshots=None, prescreen=False,
+                        industry=None):
+    # Yields ("item", section_id, evaluation) while responses stream in (if stream_items) and
+    # ("result", section_id, result) as each section completes. Workers only push onto a queue,
+    # so the caller can render from the script thread.
+    # Passing a `snapshots` dict switches on incremental re-evaluation; it is read and updated in place.
+    # `industry` layers that industry's checklist pack over the base sections.
+    registry = get_registry(industry)
+    if top_k or snapshots is not None:
+        get_policy_index(policy_text)  # build once here rather than racing to build it in every worker
+    events = queue.Queue()
+
+    def run(sid):
+        on_item = (lambda evaluation: events.put(("item", sid, evaluation))) if stream_items else None
+        checklist = registry.items(sid)
+        try:
+            if snapshots is not None:
+                result, snapshots[sid] = analyze_policy_section_incremental(
+                    sid, checklist, policy_text, snapshots.get(sid), model, timeout, force_refresh, top_k, on_item,
+                    prescreen
+                )
+            else:
+                result = analyze_policy_section(sid, checklist, policy_text, model,
+                                                timeout, force_refresh, top_k, on_item, prescreen)
+        except Exception as e:
+            result = error_section_result(sid, e)
+        events.put(("result", sid, result))
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for sid in section_ids:
+            executor.submit(copy_context().run, run, sid)
+        pending = len(section_ids)
+        while pending:
+            event = events.get()
+            if event[0] == "result":
+                pending -= 1
+            yield event
+
+def analyze_sections_concurrently(section_ids, policy_text, model="gpt-4",
+                                  max_workers=MAX_CONCURRENT_SECTIONS, timeout=SECTION_TIMEOUT_SECONDS,
+                                  force_refresh=False, top_k=None, snapshots=None, prescreen=False, industry=None):
+    # Yields each section's result as soon as it completes (not in section order)
+    for kind, _, payload in iter_section_events(section_ids, policy_text, model, max_workers, timeout,
+                                                force_refresh, top_k, snapshots=snapshots, prescreen=prescreen,
+                                                industry=industry):
+        if kind == "result":
+            yield payload
+
+# --- Background Jobs ---
+def run_evaluation_job(section_ids, policy_text, options, snapshots=None):
+    # JobRunner entry point: the same ("item" | "result", section_id, payload) events as iter_section_events.
+    # options: mode ("per-section" | "batched"), model, max_workers, top_k, force_refresh, prescreen, industry,
+    # session (the key its GPT calls are queued under)
+    model = options.get("model", "gpt-4")
+    with session(options.get("session")):
+        if options.get("mode") == "batched":
+            for result in analyze_all_sections_batched(section_ids, policy_text, model=model,
+                                                       force_refresh=options.get("force_refresh", False),
+                                                       industry=options.get("industry")):
+                yield "result", result["Section"], result
+            return
+        yield from iter_section_events(
+            section_ids, policy_text, model=model,
+            max_workers=options.get("max_workers", MAX_CONCURRENT_SECTIONS),
+            force_refresh=options.get("force_refresh", False), top_k=options.get("top_k"),
+            stream_items=True, snapshots=snapshots, prescreen=options.get("prescreen", False),
+            industry=options.get("industry")
+        )
+
+# --- Batch Audits ---
+def read_document(name, data):
+    # PDF page texts are cached by file hash, so reading a document again is cheap
+    if name.lower().endswith(".pdf"):
+        return extract_text_from_pdf(io.BytesIO(data))
+    return data.decode("utf-8", errors="replace")
+
+def process_batch_document(name, data, section_ids, model="gpt-4", industry=None):
+    text = read_document(name, data)
+    if not text.strip():
+        raise ValueError("No extractable text in document")
+    registry = get_registry(industry)
+    return [
+        analyze_policy_section(sid, registry.items(sid), text, model=model, timeout=SECTION_TIMEOUT_SECONDS)
+        for sid in section_ids
+    ]
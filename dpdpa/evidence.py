@@ -0,0 +1,242 @@
+import functools
+import json
+import os
+import re
+import threading
+
+import numpy as np
+
+from dpdpa.pdf import (
+    DOCUMENT_TTL_SECONDS, PAGE_SEPARATOR, clear_cache_directory, load_span_index, page_for_offset,
+    prune_cache_directory, source_pdf_path, touch_cache_files
+)
+
+# --- Evidence Settings ---
+DEFAULT_ANNOTATED_DIR = os.path.join(".dpdpa_cache", "annotated")
+ANNOTATED_MAX_BYTES = 512 * 1024 ** 2   # pruned like the PDF cache: unused for DOCUMENT_TTL_SECONDS, then LRU
+SHINGLE_SIZE = 3               # words per shingle; quotes shorter than this are not located
+MAX_POSTINGS = 64              # shingles occurring more often (boilerplate) do not vote
+MAX_GAP_WORDS = 6              # words a fuzzy match may drift by (insertions, deletions) and still count
+HASH_MULTIPLIER = 1000003
+UNKNOWN_WORD = 1 << 40         # ids for query words absent from the policy, so their shingles never match
+QUOTE_MIN_SCORE = 0.6          # share of a quote's shingles that must be found together
+PASSAGE_MIN_SCORE = 0.6
+JUSTIFICATION_MIN_SCORE = 0.35  # paraphrases share fewer exact word runs than quotes
+INDEX_CACHE_SIZE = 8
+
+WORD_RE = re.compile(r"\w+")
+QUOTE_RE = re.compile(r"[\"“]([^\"“”]{12,}?)[\"”]")
+CHAR_RANGE_RE = re.compile(r"\[chars (\d+)[–-](\d+)")
+PASSAGE_LABEL_RE = re.compile(r"^\[[^\]]*\]\s*")
+
+# Highlight colours (RGB, 0-1) by status; Missing items have no evidence and are listed in the section note
+HIGHLIGHT_COLORS = {
+    "Explicitly Mentioned": (0.56, 0.89, 0.56),
+    "Partially Mentioned": (1.0, 0.82, 0.36),
+}
+NOTE_MARGIN = 24
+NOTE_SPACING = 28
+
+def shingle_hashes(ids):
+    # Rolling hash of every run of SHINGLE_SIZE word ids
+    count = len(ids) - SHINGLE_SIZE + 1
+    if count <= 0:
+        return np.zeros(0, dtype=np.uint64)
+    hashes = np.zeros(count, dtype=np.uint64)
+    for k in range(SHINGLE_SIZE):
+        # uint64 arithmetic wraps around, which is all a hash needs
+        hashes = hashes * np.uint64(HASH_MULTIPLIER) + ids[k:k + count] + np.uint64(1)
+    return hashes
+
+class EvidenceIndex:
+    # Word-shingle index of one policy text, for finding where quoted or paraphrased evidence sits.
+    # A query votes for the text positions sharing its shingles, offset by where each shingle sits in the
+    # query; the best-supported alignment (with some drift allowed) gives the match and its score, the share
+    # of the query's shingles found there. Lookups are binary searches over a sorted array, so they stay fast
+    # on policies of hundreds of pages.
+
+    def __init__(self, text):
+        starts, ends, ids, vocab = [], [], [], {}
+        for match in WORD_RE.finditer(text):
+            starts.append(match.start())
+            ends.append(match.end())
+            ids.append(vocab.setdefault(match.group().lower(), len(vocab)))
+        self.vocab = vocab
+        self.starts = np.array(starts, dtype=np.int64)
+        self.ends = np.array(ends, dtype=np.int64)
+        shingles = shingle_hashes(np.array(ids, dtype=np.uint64))
+        self.order = np.argsort(shingles, kind="stable")
+        self.shingles = shingles[self.order]
+
+    def locate(self, query, min_score):
+        # (start, end, score) of the best fuzzy match of query, or None below min_score
+        words = [w.lower() for w in WORD_RE.findall(query)]
+        if len(words) < SHINGLE_SIZE or not len(self.shingles):
+            return None
+        ids = np.array([self.vocab.get(w, UNKNOWN_WORD + i) for i, w in enumerate(words)], dtype=np.uint64)
+        query_shingles = shingle_hashes(ids)
+        lo = np.searchsorted(self.shingles, query_shingles, side="left")
+        hi = np.searchsorted(self.shingles, query_shingles, side="right")
+        counts = hi - lo
+        usable = (counts > 0) & (counts <= MAX_POSTINGS)
+        scored = len(query_shingles) - int((counts > MAX_POSTINGS).sum())
+        if not usable.any() or scored <= 0:
+            return None
+
+        offsets = np.repeat(np.nonzero(usable)[0], counts[usable])
+        positions = np.concatenate([self.order[a:b] for a, b in zip(lo[usable], hi[usable])])
+        diagonals = positions - offsets
+        values, votes = np.unique(diagonals, return_counts=True)
+        near = np.abs(diagonals - values[np.argmax(votes)]) <= MAX_GAP_WORDS
+        score = len(np.unique(offsets[near])) / scored
+        if score < min_score:
+            return None
+        first, last = positions[near].min(), positions[near].max() + SHINGLE_SIZE - 1
+        return int(self.starts[first]), int(self.ends[last]), score
+
+@functools.lru_cache(maxsize=INDEX_CACHE_SIZE)
+def get_evidence_index(text):
+    return EvidenceIndex(text)
+
+def locate_item(index, evaluation, text_length):
+    # (spans, score, method) for one Matched Details entry, or None when it has no evidence to point at.
+    # Tried in order: the exact offsets the local pre-screen cites, quotes in the Justification, the cited
+    # retrieval passage, and finally the Justification itself as a paraphrase.
+    if evaluation.get("Status") not in HIGHLIGHT_COLORS:
+        return None
+    passage = evaluation.get("Source Passage") or ""
+    justification = evaluation.get("Justification") or ""
+
+    match = CHAR_RANGE_RE.match(passage)
+    if match and int(match.group(2)) <= text_length:
+        return [(int(match.group(1)), int(match.group(2)))], 1.0, "offsets"
+
+    quotes = [index.locate(quote, QUOTE_MIN_SCORE) for quote in QUOTE_RE.findall(justification)]
+    quotes = [q for q in quotes if q]
+    if quotes:
+        return [(start, end) for start, end, _ in quotes], min(score for _, _, score in quotes), "quote"
+
+    if passage:
+        located = index.locate(PASSAGE_LABEL_RE.sub("", passage).strip("… "), PASSAGE_MIN_SCORE)
+        if located:
+            return [located[:2]], located[2], "passage"
+
+    located = index.locate(justification, JUSTIFICATION_MIN_SCORE)
+    if located:
+        return [located[:2]], located[2], "justification"
+    return None
+
+def locate_evidence(policy_text, results, spans=None):
+    # {checklist item id: {"spans", "score", "method", "page"}} for the items whose evidence was found.
+    # spans is the document's SpanIndex; without one, pages come from the form feeds in the text (if any).
+    index = get_evidence_index(policy_text)
+    evidence = {}
+    for result in results:
+        for evaluation in result.get("Matched Details", []):
+            located = locate_item(index, evaluation, len(policy_text))
+            if located is None:
+                continue
+            ranges, score, method = located
+            start = ranges[0][0]
+            if spans is not None:
+                page = spans.page_for_offset(start)
+            else:
+                page = page_for_offset(policy_text, start) if PAGE_SEPARATOR in policy_text else None
+            evidence[evaluation["Checklist Item ID"]] = {"spans": ranges, "score": round(score, 2),
+                                                         "method": method, "page": page}
+    return evidence
+
+# --- Annotated PDF ---
+_annotate_lock = threading.Lock()
+
+def annotated_pdf_path(key, run_key, directory=DEFAULT_ANNOTATED_DIR):
+    return os.path.join(directory, f"{key}-{run_key}.pdf")
+
+def annotation_available(key, policy_text):
+    # Needs the stored original and a span index built from exactly this text
+    if not key or not os.path.exists(source_pdf_path(key)):
+        return False
+    spans = load_span_index(key)
+    return spans is not None and spans.matches(policy_text)
+
+def annotate_section(doc, spans, result, evidence, note_index):
+    import fitz
+    unlocated = []
+    for evaluation in result["Matched Details"]:
+        item_id, status = evaluation["Checklist Item ID"], evaluation["Status"]
+        located = evidence.get(item_id)
+        if located is None:
+            unlocated.append(f"{item_id} ({status}): {evaluation.get('Checklist Text', '')}")
+            continue
+        for start, end in located["spans"]:
+            for page_index, boxes in spans.word_boxes(start, end).items():
+                page = doc[page_index]  # an annotation is only usable while its page object is alive
+                annot = page.add_highlight_annot([fitz.Rect(box) for box in boxes])
+                annot.set_colors(stroke=HIGHLIGHT_COLORS[status])
+                annot.set_info(title=f"DPDPA {item_id} — {status}",
+                               content=f"{evaluation.get('Checklist Text', '')}\n\n{evaluation.get('Justification', '')}")
+                annot.update()
+
+    # One note per section on the first page: its verdict and the items with nothing to highlight
+    summary = f"Compliance Score: {result['Compliance Score']} ({result['Match Level']})"
+    if unlocated:
+        summary += "\n\nNo evidence highlighted:\n" + "\n".join(unlocated)
+    first_page = doc[0]
+    note = first_page.add_text_annot(fitz.Point(NOTE_MARGIN, NOTE_MARGIN + note_index * NOTE_SPACING), summary,
+                                 icon="Comment")
+    note.set_info(title=f"DPDPA Section {result['Section']} — {result.get('Title', '')}")
+    note.update()
+
+def annotated_pdf(key, run_key, results, policy_text, directory=DEFAULT_ANNOTATED_DIR):
+    # The document's PDF with each checklist item's evidence highlighted, as bytes.
+    # Cached per (document, run) on disk. Sections already in the cached file are kept as they are and new
+    # ones are added with an incremental save, so the file is never rebuilt for a run it has already seen.
+    import fitz
+    path = annotated_pdf_path(key, run_key, directory)
+    manifest_path = os.path.splitext(path)[0] + ".json"
+    with _annotate_lock:
+        try:
+            with open(manifest_path, encoding="utf-8") as f:
+                done = set(json.load(f)["sections"])
+        except (OSError, ValueError, KeyError):
+            done = set()
+        # A PDF without its manifest was interrupted mid-write; start again from the original
+        existing = bool(done) and os.path.exists(path)
+        pending = [r for r in results if not r.get("Error") and (not existing or r["Section"] not in done)]
+        if not existing:
+            done = set()
+
+        if pending or not existing:
+            spans = load_span_index(key)
+            if spans is None or not spans.matches(policy_text):
+                raise ValueError("No span index matches this document's text; re-extract the PDF")
+            evidence = locate_evidence(policy_text, pending, spans)
+            doc = fitz.open(path if existing else source_pdf_path(key))
+            try:
+                if doc.needs_pass:
+                    raise ValueError("The PDF is password-protected")
+                for n, result in enumerate(pending, len(done)):
+                    annotate_section(doc, spans, result, evidence, n)
+                if existing and doc.can_save_incrementally():
+                    doc.save(path, incremental=True, encryption=fitz.PDF_ENCRYPT_KEEP)
+                else:
+                    os.makedirs(directory, exist_ok=True)
+                    doc.save(path + ".tmp", garbage=1)
+                    os.replace(path + ".tmp", path)
+            finally:
+                doc.close()
+            done.update(r["Section"] for r in pending)
+            tmp_path = manifest_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"sections": sorted(done)}, f)
+            os.replace(tmp_path, manifest_path)
+            prune_cache_directory(directory, DOCUMENT_TTL_SECONDS, ANNOTATED_MAX_BYTES)
+        else:
+            touch_cache_files(path, manifest_path)
+
+        with open(path, "rb") as f:
+            return f.read()
+
+def clear_annotated_pdfs(directory=DEFAULT_ANNOTATED_DIR):
+    with _annotate_lock:
+        clear_cache_directory(directory)
@@ -0,0 +1,417 @@
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+from dpdpa.checklists import format_checklist, get_registry
+from dpdpa.clauses import clause_vector
+from dpdpa.engine import SECTION_TIMEOUT_SECONDS, call_gpt, stream_gpt_text
+from dpdpa.prescreen import prescreen_evaluations
+from dpdpa.reports import GENERAL_INDUSTRY
+
+# --- Generator Settings ---
+# Drafts are assembled from a library of compliant clauses, one per checklist item and industry, written by
+# GPT once (a single request per section) and then reused; GPT is only called again to tailor a draft to the
+# organisation or to fit clauses into text the user already has.
+DEFAULT_LIBRARY_DB_PATH = os.path.join(".dpdpa_cache", "clause_library.sqlite3")
+DEFAULT_DRAFTS_DB_PATH = os.path.join(".dpdpa_cache", "drafts.sqlite3")
+CLAUSE_PROMPT_VERSION = 1         # bump whenever create_clause_library_prompt changes so clauses are rewritten
+MAX_LIBRARY_ATTEMPTS = 2          # requests per section before remaining items are left for the user
+UNWRITTEN_RETRY_SECONDS = 3600    # how long items GPT left unwritten are not asked about again
+COVERAGE_SIMILARITY = 0.3         # a draft paragraph this close to an item's clause counts as covering it
+ASSISTANT_ITEMS = 12              # library clauses given to the Draft Assistant as its backbone
+
+# Placeholders a clause may contain; the ones the organisation profile leaves empty stay visible in the draft
+PROFILE_FIELDS = {
+    "organisation": "Organisation name",
+    "contact_email": "Privacy contact email",
+    "grievance_officer": "Grievance Officer / DPO name",
+    "address": "Registered address",
+    "website": "Website",
+}
+PLACEHOLDER_RE = re.compile(r"\{(" + "|".join(PROFILE_FIELDS) + r")\}")
+
+# Lifecycle stage of a checklist item, by the first stage with a keyword in the item text (else Processing)
+LIFECYCLE_KEYWORDS = {
+    "Erasure": ("erase", "erasure", "delet", "retention", "retain"),
+    "Sharing": ("processor", "share", "sharing", "transfer", "disclos", "third part"),
+    "Storage": ("safeguard", "security", "breach", "store", "storage"),
+    "Collection": ("notice", "consent", "collect"),
+}
+LIFECYCLE_STAGES = ["Collection", "Processing", "Storage", "Sharing", "Erasure"]
+
+def lifecycle_stage(item):
+    text = item["text"].lower()
+    for stage, keywords in LIFECYCLE_KEYWORDS.items():
+        if any(keyword in text for keyword in keywords):
+            return stage
+    return "Processing"
+
+def clause_key(item):
+    # A reworded checklist item gets a fresh clause
+    payload = f"{CLAUSE_PROMPT_VERSION}:{item['text']}"
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+def fill_placeholders(text, profile):
+    return PLACEHOLDER_RE.sub(
+        lambda m: (profile or {}).get(m.group(1)) or f"[To be completed: {PROFILE_FIELDS[m.group(1)]}]", text
+    )
+
+def create_clause_library_prompt(section_id, items, industry=None):
+    registry = get_registry(industry)
+    sector = f" for an organisation in the {industry} sector" if industry else ""
+    placeholders = ", ".join("{" + name + "}" for name in PROFILE_FIELDS)
+    return f"""
+    You are drafting a privacy policy{sector} that complies with DPDPA Section {section_id}: {registry.title(section_id)}.
+
+    For each checklist item below, write one policy clause of one to three sentences that fully satisfies it.
+    Write in the voice of the organisation ("we"), in plain English, without legal commentary.
+    Where an organisation-specific detail belongs, use exactly one of these placeholders: {placeholders}.
+
+    {format_checklist(items)}
+
+    Return output in this JSON format only:
+    {{
+      "Clauses": [
+        {{
+          "Checklist Item ID": "{items[0]['id']}",
+          "Clause": "..."
+        }},
+        ...
+      ]
+    }}
+    """
+
+class ClauseLibrary:
+    # Compliant clauses keyed by industry, checklist item and item wording, backed by SQLite
+
+    def __init__(self, path=DEFAULT_LIBRARY_DB_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS clauses (
+                    industry TEXT NOT NULL,
+                    item_id TEXT NOT NULL,
+                    item_key TEXT NOT NULL,
+                    clause TEXT NOT NULL,
+                    model TEXT,
+                    created REAL NOT NULL,
+                    PRIMARY KEY (industry, item_id, item_key)
+                )
+            """)
+
+    def get(self, industry, items):
+        # {item id: clause} for the items that already have one.
+        # An empty clause marks an item GPT recently failed to write; it is only returned (and so keeps
+        # the item from being asked about again) for UNWRITTEN_RETRY_SECONDS.
+        keys = {item["id"]: clause_key(item) for item in items}
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT item_id, item_key, clause FROM clauses WHERE industry = ? AND (clause != '' OR created > ?) "
+                f"AND item_id IN ({', '.join('?' * len(keys))})",
+                [industry or GENERAL_INDUSTRY, time.time() - UNWRITTEN_RETRY_SECONDS] + list(keys)
+            ).fetchall()
+        return {r["item_id"]: r["clause"] for r in rows if keys.get(r["item_id"]) == r["item_key"]}
+
+    def put(self, industry, items, clauses, model=None):
+        keys = {item["id"]: clause_key(item) for item in items}
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO clauses (industry, item_id, item_key, clause, model, created) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(industry or GENERAL_INDUSTRY, item_id, keys[item_id], clause, model, now)
+                 for item_id, clause in clauses.items() if item_id in keys]
+            )
+
+    def counts(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT industry, COUNT(*) FROM clauses WHERE clause != '' GROUP BY industry"
+            ).fetchall()
+        return {r[0]: r[1] for r in rows}
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM clauses")
+
+def answer_clauses(answer):
+    # {item id: clause} from a clause library answer, tolerating the shapes GPT drifts into.
+    # Accepts "Clauses" in any case, as a list of {"Checklist Item ID", "Clause"} objects or as a mapping of
+    # item id to clause.
+    if not isinstance(answer, dict):
+        return {}
+    entries = next((value for key, value in answer.items() if str(key).strip().lower() == "clauses"), None)
+    if isinstance(entries, dict):
+        entries = [{"Checklist Item ID": item_id, "Clause": value.get("Clause") if isinstance(value, dict) else value}
+                   for item_id, value in entries.items()]
+    written = {}
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        fields = {str(key).strip().lower(): value for key, value in entry.items()}
+        item_id = str(fields.get("checklist item id") or fields.get("id") or "").strip()
+        clause = str(fields.get("clause") or "").strip()
+        if item_id and clause:
+            written[item_id] = clause
+    return written
+
+def unwritten_items(section_ids, industry=None, library=None):
+    # Item ids of the sections that GPT recently failed to write a clause for
+    library = library if library is not None else get_clause_library()
+    registry = get_registry(industry)
+    return [item_id for section_id in section_ids
+            for item_id, clause in library.get(industry, registry.items(section_id)).items() if not clause]
+
+def library_clauses(section_id, industry=None, model="gpt-4", library=None):
+    # {item id: clause} for every item of the section, asking GPT only for items the library lacks.
+    # Items GPT still has not answered after MAX_LIBRARY_ATTEMPTS requests are stored as empty clauses, so
+    # drafts in the next UNWRITTEN_RETRY_SECONDS leave them for the user instead of asking again (see
+    # unwritten_items); they are left out of the result.
+    library = library if library is not None else get_clause_library()
+    items = get_registry(industry).items(section_id)
+    clauses = library.get(industry, items)
+    for attempt in range(MAX_LIBRARY_ATTEMPTS + 1):
+        missing = [item for item in items if item["id"] not in clauses]
+        if not missing:
+            break
+        if attempt == MAX_LIBRARY_ATTEMPTS:
+            library.put(industry, missing, {item["id"]: "" for item in missing}, model)
+            break
+        answer = call_gpt(create_clause_library_prompt(section_id, missing, industry), model=model,
+                          timeout=SECTION_TIMEOUT_SECONDS, section_id=f"library-{section_id}")
+        missing_ids = {item["id"] for item in missing}
+        written = {item_id: clause for item_id, clause in answer_clauses(answer).items() if item_id in missing_ids}
+        library.put(industry, missing, written, model)
+        clauses.update(written)
+    return {item["id"]: clauses[item["id"]] for item in items if clauses.get(item["id"])}
+
+def build_clause_library(industry=None, model="gpt-4", progress=None):
+    # Write the clauses of every section the library still lacks; returns {section id: clauses available}
+    registry = get_registry(industry)
+    counts = {}
+    for done, section_id in enumerate(registry, 1):
+        counts[section_id] = len(library_clauses(section_id, industry, model))
+        if progress:
+            progress(done, len(registry.sections))
+    return counts
+
+def section_text(section_id, clauses, profile, industry=None, items=None):
+    # One clause per paragraph; items without a clause are flagged for the user to write
+    registry = get_registry(industry)
+    lines = []
+    for item in items if items is not None else registry.items(section_id):
+        if item["id"] in clauses:
+            lines.append(fill_placeholders(clauses[item["id"]], profile))
+        else:
+            lines.append(f"[To be completed: {item['text']}]")
+    return "\n\n".join(lines)
+
+def create_introduction_prompt(profile, industry=None):
+    organisation = profile.get("organisation") or "the organisation"
+    sector = f" in the {industry} sector" if industry else ""
+    return f"""
+    Write the opening of a privacy policy for {organisation}{sector}, in Markdown.
+
+    The organisation describes the personal data it processes as follows:
+    {profile['description']}
+
+    Write exactly two sections:
+    ## About this Policy
+    (two or three sentences: who we are, what this policy covers, that it follows the Digital Personal Data Protection Act, 2023)
+    ## Personal Data We Process and Why
+    (a bullet list of data categories, each with its purpose)
+
+    Use only facts from the description; do not invent data categories, purposes or contact details.
+    Do not write any other section; the rest of the policy follows separately.
+    """
+
+def iter_policy_draft(profile, section_ids, industry=None, model="gpt-4"):
+    # Yield a full policy in Markdown, piece by piece, for st.write_stream.
+    # Only the introduction (written from the profile's description, if any) is streamed from GPT; every
+    # section comes from the clause library.
+    registry = get_registry(industry)
+    organisation = profile.get("organisation") or "[To be completed: Organisation name]"
+    yield f"# Privacy Policy of {organisation}\n\n"
+    if (profile.get("description") or "").strip():
+        yield from stream_gpt_text(create_introduction_prompt(profile, industry), model=model,
+                                   timeout=SECTION_TIMEOUT_SECONDS, section_id="generator-intro")
+        yield "\n\n"
+    for number, section_id in enumerate(section_ids, 1):
+        clauses = library_clauses(section_id, industry, model)
+        yield f"## {number}. {registry.title(section_id)}\n\n{section_text(section_id, clauses, profile, industry)}\n\n"
+
+def draft_coverage(draft_text, section_id, industry=None, library=None):
+    # (covered, missing) checklist items of the section in a draft, judged locally without GPT.
+    # An item is covered when the pre-screen rules resolve it or a paragraph of the draft is close to the
+    # item's library clause, or to the item's own text when the library has no clause for it yet.
+    items = get_registry(industry).items(section_id)
+    if not draft_text.strip():
+        return [], list(items)
+    library = library if library is not None else get_clause_library()
+    clauses = {item_id: clause for item_id, clause in library.get(industry, items).items() if clause}
+    covered_ids = set(prescreen_evaluations(items, draft_text))
+    paragraphs = [p for p in re.split(r"\n\s*\n", draft_text) if p.strip()]
+    paragraph_vectors = np.stack([clause_vector(p) for p in paragraphs])
+    for item in items:
+        reference = clause_vector(clauses.get(item["id"], item["text"]))
+        if float((paragraph_vectors @ reference).max()) >= COVERAGE_SIMILARITY:
+            covered_ids.add(item["id"])
+    return ([item for item in items if item["id"] in covered_ids],
+            [item for item in items if item["id"] not in covered_ids])
+
+def create_completion_prompt(draft_text, clauses):
+    return f"""
+    Below is part of a privacy policy, followed by clauses it needs in order to comply with the DPDPA.
+
+    **Draft:**
+    {draft_text}
+
+    **Clauses to add:**
+    {clauses}
+
+    Rewrite the clauses so they fit the draft: use its terminology, voice and any details it gives (names,
+    contact details, data categories). Keep every obligation each clause states. Output only the new
+    paragraphs to append, in Markdown, without repeating the draft or adding commentary.
+    """
+
+def iter_section_completion(draft_text, section_id, missing, profile=None, industry=None, model="gpt-4"):
+    # Yield the text that completes a section draft with the missing items' clauses.
+    # Without a draft the library clauses are used as they are; otherwise GPT fits them to the draft.
+    clauses = library_clauses(section_id, industry, model)
+    text = section_text(section_id, clauses, profile, industry, items=missing)
+    if not draft_text.strip():
+        yield text
+        return
+    yield from stream_gpt_text(create_completion_prompt(draft_text, text), model=model,
+                               timeout=SECTION_TIMEOUT_SECONDS, section_id=f"generator-{section_id}")
+
+def iter_lifecycle_template(stage_notes, profile, industry=None, model="gpt-4"):
+    # Yield a policy organised by data lifecycle stage: the user's notes, then the stage's library clauses
+    registry = get_registry(industry)
+    by_stage = {stage: [] for stage in LIFECYCLE_STAGES}
+    for section_id in registry:
+        clauses = library_clauses(section_id, industry, model)
+        for item in registry.items(section_id):
+            by_stage[lifecycle_stage(item)].append((section_id, item, clauses))
+    organisation = profile.get("organisation") or "[To be completed: Organisation name]"
+    yield f"# Privacy Policy of {organisation}\n\n"
+    for number, stage in enumerate(LIFECYCLE_STAGES, 1):
+        parts = [(stage_notes.get(stage) or "").strip()]
+        parts += [section_text(section_id, clauses, profile, industry, items=[item])
+                  for section_id, item, clauses in by_stage[stage]]
+        body = "\n\n".join(part for part in parts if part)
+        yield f"## {number}. {stage}\n\n{body}\n\n"
+
+def relevant_items(request, industry=None, k=ASSISTANT_ITEMS):
+    # (section id, item) pairs of the checklist items closest to a free-text request
+    registry = get_registry(industry)
+    pairs = [(section_id, item) for section_id in registry for item in registry.items(section_id)]
+    vectors = np.stack([clause_vector(item["text"]) for _, item in pairs])
+    scores = vectors @ clause_vector(request)
+    return [pairs[i] for i in np.argsort(-scores, kind="stable")[:k]]
+
+def create_assistant_prompt(request, profile, clauses, industry=None):
+    organisation = profile.get("organisation") or "the organisation"
+    sector = f" in the {industry} sector" if industry else ""
+    return f"""
+    Draft the following privacy document for {organisation}{sector}, in Markdown: {request}
+
+    Build it on these clauses, which satisfy the relevant DPDPA checklist items. Adapt their wording to the
+    document, but keep every obligation they state and any text in [square brackets] as it is:
+    {clauses}
+
+    Keep the document concise. Do not invent contact details, names or legal references.
+    """
+
+def iter_assistant_draft(request, profile, industry=None, model="gpt-4"):
+    # Yield a GPT draft for a free-text request, grounded in the library clauses most relevant to it
+    items = relevant_items(request, industry)
+    section_clauses = {section_id: library_clauses(section_id, industry, model) for section_id, _ in items}
+    clauses = "\n".join(
+        f"- {section_text(section_id, section_clauses[section_id], profile, industry, items=[item])}"
+        for section_id, item in items
+    )
+    yield from stream_gpt_text(create_assistant_prompt(request, profile, clauses, industry), model=model,
+                               timeout=SECTION_TIMEOUT_SECONDS, section_id="generator-assistant")
+
+# --- Saved Drafts ---
+class DraftStore:
+    # Named policy drafts, backed by SQLite
+
+    def __init__(self, path=DEFAULT_DRAFTS_DB_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS drafts (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    kind TEXT,
+                    industry TEXT,
+                    content TEXT NOT NULL,
+                    created REAL NOT NULL,
+                    updated REAL NOT NULL
+                )
+            """)
+
+    def save(self, name, content, kind=None, industry=None, draft_id=None):
+        # Create a draft, or overwrite the content and name of draft_id; returns the draft's id
+        now = time.time()
+        with self._lock, self._conn:
+            if draft_id is not None:
+                self._conn.execute("UPDATE drafts SET name = ?, content = ?, updated = ? WHERE id = ?",
+                                   (name, content, now, draft_id))
+                return draft_id
+            return self._conn.execute(
+                "INSERT INTO drafts (name, kind, industry, content, created, updated) VALUES (?, ?, ?, ?, ?, ?)",
+                (name, kind, industry or GENERAL_INDUSTRY, content, now, now)
+            ).lastrowid
+
+    def drafts(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, name, kind, industry, LENGTH(content) AS characters, created, updated "
+                "FROM drafts ORDER BY updated DESC"
+            ).fetchall()
+        return [dict(r) for r in rows]
+
+    def get(self, draft_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM drafts WHERE id = ?", (draft_id,)).fetchone()
+        return dict(row) if row else None
+
+    def delete(self, draft_id):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM drafts WHERE id = ?", (draft_id,))
+
+_clause_library = None
+_draft_store = None
+_lock = threading.Lock()
+
+def get_clause_library():
+    global _clause_library
+    with _lock:
+        if _clause_library is None:
+            _clause_library = ClauseLibrary()
+        return _clause_library
+
+def get_draft_store():
+    global _draft_store
+    with _lock:
+        if _draft_store is None:
+            _draft_store = DraftStore()
+        return _draft_store
@@ -0,0 +1,83 @@
+import hashlib
+import re
+
+from dpdpa.retrieval import get_policy_index
+
+# --- Incremental Settings ---
+CANDIDATE_PASSAGES_PER_ITEM = 3
+# Past this share of changed paragraphs a targeted re-check saves little; re-run the whole section
+MAX_CHANGED_FRACTION = 0.5
+
+def chunk_hash(chunk):
+    text = re.sub(r"\s+", " ", f"{chunk['heading']} {chunk['text']}").strip().lower()
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+def item_hash(item):
+    # A reworded checklist item (e.g. from an updated pack) must not reuse the verdict for its old wording
+    return hashlib.sha1(item["text"].encode("utf-8")).hexdigest()[:16]
+
+def cited_chunk_id(evaluation):
+    match = re.match(r"\[?(P\d+)", evaluation.get("Source Passage", ""))
+    return match.group(1) if match else None
+
+def run_settings(model, top_k=None, prescreen=False):
+    # What else shaped the verdicts besides the text; a snapshot is only reused by a run with the same settings.
+    # Checklist wording is compared per item (item_hash), so an updated pack only re-checks the items it changed
+    return {"model": model, "top_k": top_k, "prescreen": bool(prescreen)}
+
+def build_snapshot(section_id, checklist, policy_text, result, settings=None):
+    # Record, per checklist item, the verdict and the passages it depended on, plus the run's settings
+    index = get_policy_index(policy_text)
+    hashes = {chunk["id"]: chunk_hash(chunk) for chunk in index.chunks}
+    evaluations = {e["Checklist Item ID"]: e for e in result["Matched Details"]}
+
+    items = {}
+    for item in checklist:
+        evaluation = evaluations.get(item["id"])
+        if evaluation is None:
+            continue
+        candidates = {hashes[chunk["id"]] for chunk, _ in index.search(item["text"], k=CANDIDATE_PASSAGES_PER_ITEM)}
+        cited = cited_chunk_id(evaluation)
+        if cited in hashes:
+            candidates.add(hashes[cited])
+        items[item["id"]] = {"candidates": sorted(candidates), "evaluation": evaluation, "text_hash": item_hash(item)}
+
+    return {
+        "section": section_id,
+        "settings": settings,
+        "chunk_hashes": sorted(set(hashes.values())),
+        "items": items,
+        "result": result,
+    }
+
+def items_to_recheck(snapshot, checklist, policy_text, settings=None):
+    # Checklist items whose candidate or supporting passages differ from the previous run.
+    # Returns None when the whole section should be re-run instead, including when the previous run used
+    # different settings (model, tiers, retrieval, pre-screen).
+    if snapshot.get("settings") != settings:
+        return None
+    index = get_policy_index(policy_text)
+    new_hashes = {chunk["id"]: chunk_hash(chunk) for chunk in index.chunks}
+    old_set, new_set = set(snapshot["chunk_hashes"]), set(new_hashes.values())
+    changed = (old_set - new_set) | (new_set - old_set)
+    if not changed:
+        return [item for item in checklist if item["id"] not in snapshot["items"] or
+                snapshot["items"][item["id"]].get("text_hash", item_hash(item)) != item_hash(item)]
+    if len(changed) > MAX_CHANGED_FRACTION * max(len(old_set), len(new_set), 1):
+        return None
+
+    dirty = []
+    for item in checklist:
+        previous = snapshot["items"].get(item["id"])
+        if previous is None or previous.get("text_hash", item_hash(item)) != item_hash(item):
+            dirty.append(item)
+            continue
+        # Previously relied-on passages that were edited or removed
+        if any(h not in new_set for h in previous["candidates"]):
+            dirty.append(item)
+            continue
+        # New or edited passages that now rank among the item's best matches
+        current = {new_hashes[chunk["id"]] for chunk, _ in index.search(item["text"], k=CANDIDATE_PASSAGES_PER_ITEM)}
+        if any(h not in old_set for h in current):
+            dirty.append(item)
+    return dirty
@@ -0,0 +1,269 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+from dpdpa.ratelimit import MAX_IN_FLIGHT_REQUESTS
+
+# --- Job Settings ---
+DEFAULT_JOB_DB_PATH = os.path.join(".dpdpa_cache", "jobs.sqlite3")
+# Jobs mostly wait on GPT, so as many run as there are GPT slots; the rate limiter's scheduler then shares
+# the slots between sessions instead of jobs queueing here first come, first served
+MAX_JOB_WORKERS = MAX_IN_FLIGHT_REQUESTS
+JOB_RETENTION_SECONDS = 7 * 24 * 3600
+
+logger = logging.getLogger(__name__)
+
+def run_on_complete(on_complete, record, results, kind):
+    # Follow-up work (history, clause indexing) must never turn a finished job or document into a failure,
+    # but its errors are logged rather than lost
+    if on_complete is None:
+        return
+    try:
+        on_complete(record, results)
+    except Exception:
+        logger.exception("Follow-up work failed for %s %s", kind, record["id"])
+
+class JobStore:
+    # Submitted compliance checks, their streamed verdicts and final section results, backed by SQLite
+
+    def __init__(self, path=DEFAULT_JOB_DB_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    created_at REAL NOT NULL,
+                    label TEXT NOT NULL,
+                    section_ids TEXT NOT NULL,
+                    options TEXT NOT NULL,
+                    policy_text TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    error TEXT,
+                    started_at REAL,
+                    finished_at REAL
+                );
+                CREATE TABLE IF NOT EXISTS job_items (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    job_id TEXT NOT NULL REFERENCES jobs(id),
+                    section TEXT NOT NULL,
+                    evaluation TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS job_results (
+                    job_id TEXT NOT NULL REFERENCES jobs(id),
+                    section TEXT NOT NULL,
+                    result TEXT NOT NULL,
+                    finished_at REAL NOT NULL,
+                    PRIMARY KEY (job_id, section)
+                );
+                CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created_at);
+                CREATE INDEX IF NOT EXISTS idx_job_items_job ON job_items(job_id, id);
+            """)
+
+    def create_job(self, label, section_ids, policy_text, options):
+        job_id = uuid.uuid4().hex[:12]
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, created_at, label, section_ids, options, policy_text) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, time.time(), label, json.dumps(list(section_ids)), json.dumps(options), policy_text)
+            )
+        return job_id
+
+    def claim_next(self):
+        # Oldest pending job of the session with the fewest running jobs, so one session's queue of checks
+        # cannot hold every worker while another session waits
+        with self._lock, self._conn:
+            row = self._conn.execute("""
+                SELECT p.* FROM jobs p
+                LEFT JOIN (
+                    SELECT json_extract(options, '$.session') AS session, COUNT(*) AS running
+                    FROM jobs WHERE status = 'running' GROUP BY 1
+                ) r ON r.session IS json_extract(p.options, '$.session')
+                WHERE p.status = 'pending' ORDER BY COALESCE(r.running, 0), p.created_at LIMIT 1
+            """).fetchone()
+            if row is None:
+                return None
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ?", (time.time(), row["id"])
+            )
+        return self._decode(row)
+
+    def add_item(self, job_id, section_id, evaluation):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO job_items (job_id, section, evaluation) VALUES (?, ?, ?)",
+                (job_id, section_id, json.dumps(evaluation, ensure_ascii=False))
+            )
+
+    def add_result(self, job_id, section_id, result):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_results (job_id, section, result, finished_at) VALUES (?, ?, ?, ?)",
+                (job_id, section_id, json.dumps(result, ensure_ascii=False), time.time())
+            )
+            # Streamed verdicts are only needed until the section's full result is in
+            self._conn.execute("DELETE FROM job_items WHERE job_id = ? AND section = ?", (job_id, section_id))
+
+    def complete(self, job_id):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'done', finished_at = ? WHERE id = ?", (time.time(), job_id)
+            )
+
+    def fail(self, job_id, error):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'error', error = ?, finished_at = ? WHERE id = ?",
+                (str(error), time.time(), job_id)
+            )
+
+    def requeue_interrupted(self):
+        # Jobs left 'running' by a previous process start again from scratch; finished sections are cached
+        with self._lock, self._conn:
+            self._conn.execute("""
+                DELETE FROM job_items WHERE job_id IN (SELECT id FROM jobs WHERE status = 'running')
+            """)
+            return self._conn.execute(
+                "UPDATE jobs SET status = 'pending', started_at = NULL WHERE status = 'running'"
+            ).rowcount
+
+    def prune(self, max_age=JOB_RETENTION_SECONDS):
+        cutoff = time.time() - max_age
+        with self._lock, self._conn:
+            old = "SELECT id FROM jobs WHERE created_at < ? AND status IN ('done', 'error')"
+            self._conn.execute(f"DELETE FROM job_items WHERE job_id IN ({old})", (cutoff,))
+            self._conn.execute(f"DELETE FROM job_results WHERE job_id IN ({old})", (cutoff,))
+            return self._conn.execute(
+                "DELETE FROM jobs WHERE created_at < ? AND status IN ('done', 'error')", (cutoff,)
+            ).rowcount
+
+    def has_pending(self):
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM jobs WHERE status = 'pending' LIMIT 1").fetchone() is not None
+
+    def job(self, job_id):
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._decode(row) if row else None
+
+    def jobs(self, job_ids):
+        # Summaries (without the policy text) of the given jobs, newest first
+        if not job_ids:
+            return []
+        with self._lock:
+            rows = self._conn.execute(f"""
+                SELECT id, created_at, label, status, finished_at FROM jobs
+                WHERE id IN ({', '.join('?' * len(job_ids))}) ORDER BY created_at DESC
+            """, list(job_ids)).fetchall()
+        return [dict(r) for r in rows]
+
+    def progress(self, job_id):
+        job = self.job(job_id)
+        if job is None:
+            return None
+        with self._lock:
+            finished = [r["section"] for r in self._conn.execute(
+                "SELECT section FROM job_results WHERE job_id = ?", (job_id,)
+            ).fetchall()]
+            items = self._conn.execute(
+                "SELECT section, evaluation FROM job_items WHERE job_id = ? ORDER BY id", (job_id,)
+            ).fetchall()
+        streamed = {}
+        for r in items:
+            streamed.setdefault(r["section"], []).append(json.loads(r["evaluation"]))
+        return {
+            "status": job["status"],
+            "error": job["error"],
+            "section_ids": job["section_ids"],
+            "total": len(job["section_ids"]),
+            "finished_sections": finished,
+            "streamed_items": streamed,
+            "elapsed_seconds": ((job["finished_at"] or time.time()) - job["started_at"]) if job["started_at"] else 0.0,
+        }
+
+    def results(self, job_id):
+        # Finished section results in the job's section order
+        job = self.job(job_id)
+        if job is None:
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT section, result FROM job_results WHERE job_id = ?", (job_id,)
+            ).fetchall()
+        by_section = {r["section"]: json.loads(r["result"]) for r in rows}
+        return [by_section[sid] for sid in job["section_ids"] if sid in by_section]
+
+    def _decode(self, row):
+        job = dict(row)
+        job["section_ids"] = json.loads(job["section_ids"])
+        job["options"] = json.loads(job["options"])
+        return job
+
+class JobRunner:
+    # Bounded pool of worker threads running jobs from a JobStore.
+    # run_job(section_ids, policy_text, options, snapshots) must yield ("item" | "result", section_id,
+    # payload) events; each is written to the store as it arrives so any rerun can pick up the progress.
+    # snapshots are incremental-evaluation snapshots that only live in memory, keyed by job id.
+    # on_complete(job, results), if given, is called after a job finishes successfully.
+
+    def __init__(self, store, run_job, max_workers=MAX_JOB_WORKERS, on_complete=None):
+        self.store = store
+        self.run_job = run_job
+        self.max_workers = max_workers
+        self.on_complete = on_complete
+        self._threads = []
+        self._snapshots = {}
+        self._lock = threading.Lock()
+
+    def resume(self):
+        self.store.prune()
+        self.store.requeue_interrupted()
+        self.wake()
+
+    def submit(self, label, section_ids, policy_text, options, snapshots=None):
+        job_id = self.store.create_job(label, section_ids, policy_text, options)
+        if snapshots is not None:
+            with self._lock:
+                self._snapshots[job_id] = snapshots
+        self.wake()
+        return job_id
+
+    def wake(self):
+        with self._lock:
+            while len(self._threads) < self.max_workers and self.store.has_pending():
+                thread = threading.Thread(target=self._work, daemon=True, name="dpdpa-job-worker")
+                self._threads.append(thread)
+                thread.start()
+
+    def _work(self):
+        while True:
+            job = self.store.claim_next()
+            if job is None:
+                with self._lock:
+                    if not self.store.has_pending():
+                        self._threads.remove(threading.current_thread())
+                        return
+                continue
+            with self._lock:
+                snapshots = self._snapshots.pop(job["id"], None)
+            try:
+                for kind, section_id, payload in self.run_job(job["section_ids"], job["policy_text"],
+                                                              job["options"], snapshots):
+                    if kind == "item":
+                        self.store.add_item(job["id"], section_id, payload)
+                    else:
+                        self.store.add_result(job["id"], section_id, payload)
+            except Exception as e:
+                self.store.fail(job["id"], e)
+            else:
+                self.store.complete(job["id"])
+                if self.on_complete is not None:
+                    run_on_complete(self.on_complete, job, self.store.results(job["id"]), "job")
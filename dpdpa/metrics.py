@@ -0,0 +1,164 @@
+import os
+import sqlite3
+import threading
+import time
+
+# --- Metrics Settings ---
+DEFAULT_METRICS_PATH = os.path.join(".dpdpa_cache", "metrics.sqlite3")
+
+# Approximate USD list prices per 1K tokens (prompt, completion); unknown models are reported without cost
+MODEL_PRICES = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+    "gpt-3.5-turbo": (0.0005, 0.0015),
+}
+
+EVENT_COLUMNS = ["kind", "model", "section", "duration", "prompt_tokens", "completion_tokens",
+                 "retries", "cache_hit", "pages", "error", "items", "confidence", "agreed", "status", "wait",
+                 "ocr_pages", "ocr_duration"]
+# Columns added after the first release; ALTERed into databases created before them
+ADDED_COLUMNS = {"items": "INTEGER", "confidence": "REAL", "agreed": "INTEGER", "status": "TEXT", "wait": "REAL",
+                 "ocr_pages": "INTEGER", "ocr_duration": "REAL"}
+
+# Upper bounds of the confidence bands used when reporting tier agreement
+CONFIDENCE_BANDS = [0.5, 0.7, 0.8, 0.9, 1.0]
+
+def estimate_cost(model, prompt_tokens, completion_tokens):
+    prices = MODEL_PRICES.get(model)
+    if prices is None or prompt_tokens is None:
+        return None
+    return (prompt_tokens * prices[0] + (completion_tokens or 0) * prices[1]) / 1000
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+class MetricsStore:
+    # Append-only store of timing and token events, backed by SQLite
+
+    def __init__(self, path=DEFAULT_METRICS_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS events (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    ts REAL NOT NULL,
+                    kind TEXT NOT NULL,
+                    model TEXT,
+                    section TEXT,
+                    duration REAL,
+                    prompt_tokens INTEGER,
+                    completion_tokens INTEGER,
+                    retries INTEGER,
+                    cache_hit INTEGER,
+                    pages INTEGER,
+                    error TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_events_kind_ts ON events(kind, ts);
+            """)
+            existing = {row["name"] for row in self._conn.execute("PRAGMA table_info(events)")}
+            for column, column_type in ADDED_COLUMNS.items():
+                if column not in existing:
+                    self._conn.execute(f"ALTER TABLE events ADD COLUMN {column} {column_type}")
+
+    def record(self, kind, **fields):
+        # Instrumentation must never fail an evaluation, so storage errors are swallowed
+        values = [kind] + [fields.get(column) for column in EVENT_COLUMNS[1:]]
+        try:
+            with self._lock, self._conn:
+                self._conn.execute(
+                    f"INSERT INTO events (ts, {', '.join(EVENT_COLUMNS)}) VALUES (?, {', '.join('?' * len(EVENT_COLUMNS))})",
+                    [time.time()] + values
+                )
+        except sqlite3.Error:
+            pass
+
+    def events(self, kind=None, since=None):
+        query, params = "SELECT * FROM events WHERE 1 = 1", []
+        if kind:
+            query += " AND kind = ?"
+            params.append(kind)
+        if since:
+            query += " AND ts >= ?"
+            params.append(since)
+        with self._lock:
+            return [dict(r) for r in self._conn.execute(query + " ORDER BY ts", params).fetchall()]
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM events")
+
+    def summarize(self, kind, group_by="section", since=None):
+        # Per-group count, p50/p95 latency and queue wait, mean tokens, retries, cache hit rate and
+        # estimated cost
+        groups = {}
+        for event in self.events(kind, since):
+            groups.setdefault(event[group_by] or "—", []).append(event)
+
+        summary = []
+        for key in sorted(groups):
+            events = groups[key]
+            durations = [e["duration"] for e in events if e["duration"] is not None]
+            waits = [e["wait"] for e in events if e["wait"] is not None]
+            prompt = [e["prompt_tokens"] for e in events if e["prompt_tokens"] is not None]
+            completion = [e["completion_tokens"] for e in events if e["completion_tokens"] is not None]
+            cache_flags = [e["cache_hit"] for e in events if e["cache_hit"] is not None]
+            costs = [estimate_cost(e["model"], e["prompt_tokens"], e["completion_tokens"]) for e in events]
+            summary.append({
+                group_by.capitalize(): key,
+                "Calls": len(events),
+                "p50 Latency (s)": round(percentile(durations, 0.5), 2) if durations else None,
+                "p95 Latency (s)": round(percentile(durations, 0.95), 2) if durations else None,
+                "p95 Queue Wait (s)": round(percentile(waits, 0.95), 2) if waits else None,
+                "Avg Prompt Tokens": round(sum(prompt) / len(prompt)) if prompt else None,
+                "Avg Completion Tokens": round(sum(completion) / len(completion)) if completion else None,
+                "Retries": sum(e["retries"] or 0 for e in events),
+                "Cache Hit Rate": round(sum(cache_flags) / len(cache_flags), 2) if cache_flags else None,
+                "Errors": sum(1 for e in events if e["error"]),
+                "Est. Cost (USD)": round(sum(c for c in costs if c is not None), 4) if any(c is not None for c in costs) else None,
+            })
+        return summary
+
+    def agreement(self, since=None):
+        # How often the fast tier's verdict matched the strong model, by fast status and confidence band
+        groups = {}
+        for event in self.events("tier_item", since):
+            confidence = event["confidence"]
+            band = next((b for b in CONFIDENCE_BANDS if confidence is not None and confidence <= b), None)
+            groups.setdefault((event["status"] or "—", band), []).append(event["agreed"] or 0)
+
+        rows = []
+        for (status, band), agreed in sorted(groups.items(), key=lambda g: (g[0][0], g[0][1] or 0)):
+            lower = ([0.0] + CONFIDENCE_BANDS)[CONFIDENCE_BANDS.index(band)] if band is not None else None
+            rows.append({
+                "Fast Status": status,
+                "Confidence": f"{lower:.1f}–{band:.1f}" if band is not None else "not given",
+                "Items Re-checked": len(agreed),
+                "Agreement Rate": round(sum(agreed) / len(agreed), 2),
+            })
+        return rows
+
+_metrics_store = None
+_metrics_lock = threading.Lock()
+
+def get_metrics_store():
+    global _metrics_store
+    with _metrics_lock:
+        if _metrics_store is None:
+            _metrics_store = MetricsStore()
+        return _metrics_store
+
+def record(kind, **fields):
+    get_metrics_store().record(kind, **fields)
@@ -0,0 +1,85 @@
+import json
+import re
+
+# --- Response Parsing ---
+FENCE_RE = re.compile(r"^\s*```[a-zA-Z]*\s*|\s*```\s*$")
+ITEM_ID_RE = re.compile(r"\d+\.(?:[A-Z]{1,3})?\d+")  # 6.12, or 8.HC1 for industry-pack items
+MAX_REPAIR_ATTEMPTS = 20
+CANONICAL_STATUSES = ("Explicitly Mentioned", "Partially Mentioned", "Missing")
+STATUS_WEIGHTS = {"Explicitly Mentioned": 1.0, "Partially Mentioned": 0.5}  # share of an item a status scores
+
+def parse_model_json(text):
+    # Parse a model's JSON answer, tolerating code fences, surrounding prose and a truncated tail.
+    # Raises ValueError when no JSON object can be recovered at all.
+    text = FENCE_RE.sub("", text or "").strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        pass
+
+    start = text.find("{")
+    if start == -1:
+        raise ValueError("No JSON object in the model response")
+    try:
+        # Ignores anything after the object, e.g. a closing remark
+        return json.JSONDecoder().raw_decode(text, start)[0]
+    except ValueError:
+        pass
+    return _repair_truncated(text[start:])
+
+def _repair_truncated(text):
+    # Cut back to the last point where a value had just completed and close whatever is still open
+    stack, cut_points = [], []
+    in_string = escaped = False
+    for i, ch in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            stack.append("}" if ch == "{" else "]")
+        elif ch in "}]":
+            if stack:
+                stack.pop()
+            cut_points.append((i + 1, tuple(stack)))
+        elif ch == ",":
+            cut_points.append((i, tuple(stack)))
+
+    for cut, open_brackets in reversed(cut_points[-MAX_REPAIR_ATTEMPTS:]):
+        try:
+            return json.loads(text[:cut] + "".join(reversed(open_brackets)))
+        except ValueError:
+            continue
+    raise ValueError("Could not repair the truncated JSON in the model response")
+
+def normalize_status(value):
+    status = str(value or "").strip().lower()
+    if status.startswith("explicit") or status in ("fully mentioned", "present", "yes"):
+        return "Explicitly Mentioned"
+    if status.startswith("partial"):
+        return "Partially Mentioned"
+    if status.startswith(("missing", "not mentioned", "not found", "absent", "no")):
+        return "Missing"
+    return None
+
+def validate_evaluations(response, checklist, key="Checklist Evaluation"):
+    # Check a parsed answer against the expected checklist.
+    # Returns ({item_id: raw item with normalised ID and status}, [ids still needing a verdict]). Entries for
+    # unknown IDs, repeated IDs and unrecognisable statuses are dropped.
+    expected = {item["id"] for item in checklist}
+    entries = response.get(key, []) if isinstance(response, dict) else []
+    valid = {}
+    for entry in entries if isinstance(entries, list) else []:
+        if not isinstance(entry, dict):
+            continue
+        match = ITEM_ID_RE.search(str(entry.get("Checklist Item ID", "")))
+        status = normalize_status(entry.get("Status"))
+        if not match or match.group() not in expected or match.group() in valid or status is None:
+            continue
+        valid[match.group()] = dict(entry, **{"Checklist Item ID": match.group(), "Status": status})
+    return valid, [item["id"] for item in checklist if item["id"] not in valid]
@@ -0,0 +1,414 @@
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# --- Extraction Settings ---
+PARALLEL_PAGE_THRESHOLD = 40   # below this, pool start-up costs more than it saves
+PAGES_PER_TASK = 10
+MAX_EXTRACT_WORKERS = max(1, min(4, (os.cpu_count() or 1)))
+DEFAULT_PDF_CACHE_DIR = os.path.join(".dpdpa_cache", "pdf")
+MEMORY_CACHE_SIZE = 32
+EXTRACTION_VERSION = 3         # part of the file cache key; bump when extraction output changes
+# Cached texts, span indexes and copies of uploaded files are confidential; they are deleted once unused for
+# DOCUMENT_TTL_SECONDS, and the least recently used go first when a cache directory outgrows its size limit
+DOCUMENT_TTL_SECONDS = 7 * 24 * 3600
+PDF_CACHE_MAX_BYTES = 1024 ** 3
+OCR_CACHE_MAX_BYTES = 256 * 1024 ** 2
+
+# --- OCR Settings ---
+# A page with an image but fewer than MIN_TEXT_CHARS characters in its text layer is treated as scanned and
+# read with Tesseract through PyMuPDF. OCR is ~100x slower than get_text(), so only those pages are OCR'd,
+# in parallel, and each page's OCR text is cached by a hash of the page's content.
+MIN_TEXT_CHARS = 20
+OCR_LANGUAGE = os.environ.get("DPDPA_OCR_LANGUAGE", "eng")
+OCR_DPI = 300
+DEFAULT_OCR_CACHE_DIR = os.path.join(".dpdpa_cache", "ocr")
+OCR_MEMORY_CACHE_SIZE = 256
+
+# Pages are joined with a form feed (as pdftotext does) so any character offset maps back to its page
+PAGE_SEPARATOR = "\f"
+
+def file_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+def page_hash(doc, page):
+    # What the page draws and the images it draws, plus the OCR settings that shaped the cached text
+    digest = hashlib.sha256(f"{OCR_LANGUAGE}:{OCR_DPI}:{page.rotation}".encode("utf-8"))
+    digest.update(page.read_contents())
+    for image in page.get_images(full=True):
+        digest.update(doc.xref_stream_raw(image[0]) or b"")
+    return digest.hexdigest()
+
+def page_words(page, text, textpage=None):
+    # [start, end, x0, y0, x1, y1] of each word of the page, with offsets into text (the page's text).
+    # Boxes are in the page coordinates annotations are placed in. Words that cannot be found in the text
+    # (e.g. where ligatures were expanded differently) are skipped.
+    words, cursor = [], 0
+    for x0, y0, x1, y1, word, *_ in page.get_text("words", textpage=textpage):
+        start = text.find(word, cursor)
+        if start == -1:
+            continue
+        cursor = start + len(word)
+        words.append([start, cursor, x0, y0, x1, y1])
+    return words
+
+def _read_page(doc, index):
+    started = time.monotonic()
+    page = doc[index]
+    text = page.get_text()
+    scanned = len(text.strip()) < MIN_TEXT_CHARS and bool(page.get_images())
+    return {"text": text, "words": page_words(page, text), "scanned": scanned,
+            "hash": page_hash(doc, page) if scanned else None, "seconds": time.monotonic() - started}
+
+_worker_document = None
+
+def _open_worker_document(data):
+    # Pool initializer: each worker process receives and opens the document once, not once per task
+    global _worker_document
+    import fitz
+    _worker_document = fitz.open(stream=data, filetype="pdf")
+
+def _extract_page_range(start, stop):
+    return [_read_page(_worker_document, i) for i in range(start, stop)]
+
+def iter_pdf_pages(data, max_workers=MAX_EXTRACT_WORKERS):
+    # Yield (page_number, page_count, page) in page order as text layers are read.
+    # page is a dict with the page's "text", its "words" (see page_words), whether it looks "scanned", its
+    # content "hash" (scanned pages only) and the "seconds" reading it took.
+    import fitz  # imported here so importing the engine does not pay PyMuPDF's start-up cost
+    with fitz.open(stream=data, filetype="pdf") as doc:
+        page_count = doc.page_count
+        if page_count < PARALLEL_PAGE_THRESHOLD or max_workers <= 1:
+            for i in range(page_count):
+                yield i + 1, page_count, _read_page(doc, i)
+            return
+
+    ranges = [(start, min(start + PAGES_PER_TASK, page_count)) for start in range(0, page_count, PAGES_PER_TASK)]
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(ranges)), initializer=_open_worker_document,
+                             initargs=(data,)) as executor:
+        batches = executor.map(_extract_page_range, [r[0] for r in ranges], [r[1] for r in ranges])
+        for (start, _), pages in zip(ranges, batches):
+            for offset, page in enumerate(pages):
+                yield start + offset + 1, page_count, page
+
+@functools.lru_cache(maxsize=None)
+def ocr_available():
+    # PyMuPDF's OCR needs a Tesseract installation (found through TESSDATA_PREFIX or the tesseract binary)
+    try:
+        import fitz
+        fitz.get_tessdata()
+        return True
+    except (ImportError, RuntimeError):
+        return False
+
+def _ocr(page):
+    started = time.monotonic()
+    try:
+        textpage = page.get_textpage_ocr(language=OCR_LANGUAGE, dpi=OCR_DPI, full=True)
+        text = page.get_text(textpage=textpage)
+        words = page_words(page, text, textpage)
+    except RuntimeError:
+        text, words = None, None
+    return text, words, time.monotonic() - started
+
+def _ocr_page(index):
+    return _ocr(_worker_document[index])
+
+def iter_ocr_pages(data, indexes, max_workers=MAX_EXTRACT_WORKERS):
+    # Yield (index, text, words, seconds) as pages finish OCR; text is None when Tesseract failed on the page
+    if len(indexes) < 2 or max_workers <= 1:
+        import fitz
+        with fitz.open(stream=data, filetype="pdf") as doc:
+            for index in indexes:
+                yield (index,) + _ocr(doc[index])
+        return
+
+    with ProcessPoolExecutor(max_workers=min(max_workers, len(indexes)), initializer=_open_worker_document,
+                             initargs=(data,)) as executor:
+        futures = {executor.submit(_ocr_page, index): index for index in indexes}
+        for future in as_completed(futures):
+            yield (futures[future],) + future.result()
+
+def _cache_groups(directory):
+    # Files sharing a name up to the first dot belong to one entry (page texts, span index, original file)
+    groups = {}
+    try:
+        entries = list(os.scandir(directory))
+    except OSError:
+        return groups
+    for entry in entries:
+        try:
+            stat = entry.stat()
+        except OSError:
+            continue
+        group = groups.setdefault(entry.name.split(".")[0], {"used": 0.0, "bytes": 0, "paths": []})
+        group["used"] = max(group["used"], stat.st_mtime)
+        group["bytes"] += stat.st_size
+        group["paths"].append(entry.path)
+    return groups
+
+def prune_cache_directory(directory, ttl_seconds=DOCUMENT_TTL_SECONDS, max_bytes=None):
+    # Delete entries unused for ttl_seconds, then the least recently used until max_bytes fit.
+    # Use is tracked by modification time, which readers refresh with touch_cache_files.
+    groups = _cache_groups(directory)
+    now = time.time()
+    total = sum(g["bytes"] for g in groups.values())
+    ordered = sorted(groups.values(), key=lambda g: g["used"])
+    for n, group in enumerate(ordered):
+        expired = ttl_seconds and now - group["used"] > ttl_seconds
+        # The newest entry (usually the one just written) is kept even if it alone exceeds the limit
+        oversized = max_bytes and total > max_bytes and n < len(ordered) - 1
+        if expired or oversized:
+            _remove_files(group["paths"])
+            total -= group["bytes"]
+
+def clear_cache_directory(directory):
+    for group in _cache_groups(directory).values():
+        _remove_files(group["paths"])
+
+def _remove_files(paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+def cache_directory_usage(directory):
+    groups = _cache_groups(directory)
+    return {"entries": len(groups), "bytes": sum(g["bytes"] for g in groups.values())}
+
+def touch_cache_files(*paths):
+    for path in paths:
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+class PdfTextCache:
+    # Extracted page texts keyed by file hash, in memory and as JSON files on disk.
+    # The directory is pruned by prune_cache_directory after each write, with the given TTL and size limit.
+
+    def __init__(self, directory=DEFAULT_PDF_CACHE_DIR, memory_size=MEMORY_CACHE_SIZE,
+                 ttl_seconds=DOCUMENT_TTL_SECONDS, max_bytes=PDF_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.memory_size = memory_size
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                return self._memory[key]
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                pages = json.load(f)
+        except (OSError, ValueError):
+            return None
+        touch_cache_files(self._path(key))
+        self._remember(key, pages)
+        return pages
+
+    def set(self, key, pages):
+        self._remember(key, pages)
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_path = self._path(key) + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(pages, f, ensure_ascii=False)
+        os.replace(tmp_path, self._path(key))
+        self.prune()
+
+    def prune(self):
+        prune_cache_directory(self.directory, self.ttl_seconds, self.max_bytes)
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        clear_cache_directory(self.directory)
+
+    def _remember(self, key, pages):
+        with self._lock:
+            self._memory[key] = pages
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+pdf_text_cache = PdfTextCache()
+# Holds one OCR result ({"text", "words"}) per page hash, so a scanned page is only OCR'd once even across files
+ocr_text_cache = PdfTextCache(DEFAULT_OCR_CACHE_DIR, OCR_MEMORY_CACHE_SIZE, max_bytes=OCR_CACHE_MAX_BYTES)
+
+# --- Span Index ---
+class SpanIndex:
+    # Page and bounding box of every word of a PDF, by character offset into its join_pages text.
+    # Built once while the PDF is extracted and stored next to its cached page texts as arrays, so a lookup is
+    # a binary search whatever the document's length.
+
+    def __init__(self, starts, ends, pages, boxes, page_starts, text_hash):
+        self.starts = starts
+        self.ends = ends
+        self.pages = pages
+        self.boxes = boxes
+        self.page_starts = page_starts
+        self.text_hash = text_hash
+
+    @classmethod
+    def from_pages(cls, pages, words):
+        import numpy as np
+        page_starts, offset = [], 0
+        for text in pages:
+            page_starts.append(offset)
+            offset += len(text) + len(PAGE_SEPARATOR)
+        rows = [(page_starts[n] + w[0], page_starts[n] + w[1], n, w[2], w[3], w[4], w[5])
+                for n, boxes in enumerate(words) for w in boxes or []]
+        table = np.array(rows, dtype=np.float64).reshape(-1, 7)
+        return cls(table[:, 0].astype(np.int64), table[:, 1].astype(np.int64), table[:, 2].astype(np.int32),
+                   table[:, 3:7].astype(np.float32), np.array(page_starts, dtype=np.int64),
+                   text_digest(join_pages(pages)))
+
+    def save(self, path):
+        import numpy as np
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, starts=self.starts, ends=self.ends, pages=self.pages, boxes=self.boxes,
+                 page_starts=self.page_starts, text_hash=np.array(self.text_hash))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        import numpy as np
+        with np.load(path) as arrays:
+            return cls(arrays["starts"], arrays["ends"], arrays["pages"], arrays["boxes"], arrays["page_starts"],
+                       str(arrays["text_hash"]))
+
+    def matches(self, text):
+        # Offsets only line up with the exact text the index was built from
+        return text_digest(text) == self.text_hash
+
+    def page_for_offset(self, offset):
+        # 1-based page number of a character offset
+        import numpy as np
+        return int(np.searchsorted(self.page_starts, offset, side="right"))
+
+    def word_boxes(self, start, end):
+        # {0-based page index: [(x0, y0, x1, y1), ...]} of the words overlapping [start, end)
+        import numpy as np
+        first = int(np.searchsorted(self.ends, start, side="right"))
+        last = int(np.searchsorted(self.starts, end, side="left"))
+        boxes = {}
+        for i in range(first, last):
+            boxes.setdefault(int(self.pages[i]), []).append(tuple(float(v) for v in self.boxes[i]))
+        return boxes
+
+def text_digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def span_index_path(key, directory=DEFAULT_PDF_CACHE_DIR):
+    return os.path.join(directory, f"{key}.spans.npz")
+
+def source_pdf_path(key, directory=DEFAULT_PDF_CACHE_DIR):
+    # The original file, kept so exports such as the annotated PDF can be produced after the upload is gone
+    return os.path.join(directory, f"{key}.pdf")
+
+def load_span_index(key):
+    try:
+        return SpanIndex.load(span_index_path(key))
+    except (OSError, ValueError, KeyError):
+        return None
+
+def pdf_cache_key(data):
+    return f"{file_hash(data)}-{EXTRACTION_VERSION}"
+
+def extract_pdf_pages(data, progress=None, cache=None, stats=None):
+    # Return the list of page texts, served from the cache when this exact file was seen before.
+    # Pages without a usable text layer are OCR'd when Tesseract is available. progress is called as
+    # progress(pages_done, page_count, stage), with stage "text" and then "ocr". cache defaults to the
+    # module-level pdf_text_cache. stats, if given, is filled with the file's cache "key", page counts by
+    # extraction method, time spent on each and per-page timings. A fresh extraction also stores the file's
+    # SpanIndex and a copy of the file under the same key.
+    cache = cache if cache is not None else pdf_text_cache
+    stats = stats if stats is not None else {}
+    key = pdf_cache_key(data)
+    stats["key"] = key
+    pages = cache.get(key)
+    if pages is not None:
+        # Keeps the entry's span index and original from being pruned while its texts are in use
+        touch_cache_files(span_index_path(key), source_pdf_path(key))
+        stats.update(pages=len(pages), cache_hit=True)
+        if progress:
+            progress(len(pages), len(pages), "text")
+        return pages
+
+    pages, words, timings, scanned = [], [], [], []
+    for page_number, page_count, page in iter_pdf_pages(data):
+        pages.append(page["text"])
+        words.append(page["words"])
+        timings.append({"page": page_number, "method": "text", "seconds": page["seconds"]})
+        if page["scanned"]:
+            scanned.append((page_number - 1, page["hash"]))
+        if progress:
+            progress(page_number, page_count, "text")
+    stats.update(pages=len(pages), cache_hit=False, scanned_pages=len(scanned), ocr_pages=0, ocr_cached=0,
+                 ocr_failed=0, ocr_unavailable=0, text_seconds=sum(t["seconds"] for t in timings), ocr_seconds=0.0)
+
+    hashes = dict(scanned)
+    to_ocr = []
+    for index, digest in scanned:
+        cached = ocr_text_cache.get(digest)
+        # Entries from before word boxes were kept hold only the text; OCR those pages again
+        if cached is None or isinstance(cached, str):
+            to_ocr.append(index)
+            continue
+        pages[index], words[index] = cached["text"], cached["words"]
+        timings[index]["method"] = "ocr-cached"
+        stats["ocr_cached"] += 1
+
+    if to_ocr and ocr_available():
+        for done, (index, text, ocr_words, seconds) in enumerate(iter_ocr_pages(data, to_ocr), 1):
+            timings[index].update(method="ocr", seconds=timings[index]["seconds"] + seconds)
+            stats["ocr_seconds"] += seconds
+            if text is None:
+                timings[index]["method"] = "ocr-failed"
+                stats["ocr_failed"] += 1
+            else:
+                stats["ocr_pages"] += 1
+                ocr_text_cache.set(hashes[index], {"text": text, "words": ocr_words})
+                # Keep whatever little the text layer had if OCR found even less
+                if len(text.strip()) > len(pages[index].strip()):
+                    pages[index], words[index] = text, ocr_words
+            if progress:
+                progress(done, len(to_ocr), "ocr")
+    elif to_ocr:
+        stats["ocr_unavailable"] = len(to_ocr)
+        for index in to_ocr:
+            timings[index]["method"] = "ocr-unavailable"
+    stats["page_timings"] = timings
+
+    SpanIndex.from_pages(pages, words).save(span_index_path(key))
+    if not os.path.exists(source_pdf_path(key)):
+        tmp_path = source_pdf_path(key) + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, source_pdf_path(key))
+    # Files with pages OCR could not read are not cached, so they are retried once Tesseract is installed
+    if not stats["ocr_unavailable"]:
+        cache.set(key, pages)
+    else:
+        cache.prune()
+    return pages
+
+def join_pages(pages):
+    return PAGE_SEPARATOR.join(pages)
+
+def page_for_offset(text, offset):
+    # 1-based page number of a character offset in text produced by join_pages
+    return text.count(PAGE_SEPARATOR, 0, offset) + 1
@@ -0,0 +1,184 @@
+import hashlib
+import re
+import threading
+from collections import OrderedDict, deque
+
+# --- Pre-screen Rules ---
+# Each rule lists groups of alternative phrases; an item is resolved as "Explicitly Mentioned" only when
+# every group matches within PROXIMITY_CHARS of a match of the first group. Rules are deliberately
+# conservative: they never mark an item Missing, anything they cannot settle goes to GPT.
+PROXIMITY_CHARS = 400
+
+# Stands in for an email address or phone number, found by CONTACT_RE rather than by phrase matching
+CONTACT = "<contact>"
+CONTACT_RE = re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+|(?:\+?91[\s-]?)?\b\d{3,5}[\s-]?\d{3,4}[\s-]?\d{3,4}\b")
+
+DPO_PHRASES = ["data protection officer", "dpo", "grievance officer", "authorised person", "authorized person"]
+WITHDRAW_PHRASES = [
+    f"{prefix} {pronoun}consent{suffix}"
+    for prefix in ("withdraw", "right to withdraw")
+    for pronoun in ("", "your ", "their ", "her ")
+    for suffix in (" at any time", "")
+    if suffix or prefix == "right to withdraw"
+]
+
+PRESCREEN_RULES = {
+    "4.1": [["digital personal data protection act, 2023", "digital personal data protection act 2023",
+             "dpdp act, 2023", "dpdp act 2023", "dpdpa, 2023", "dpdpa 2023"]],
+    "5.14": [["eighth schedule", "8th schedule"], ["notice", "notices"]],
+    "6.6": [["eighth schedule", "8th schedule"], ["consent"]],
+    "6.7": [DPO_PHRASES, [CONTACT]],
+    "6.8": [WITHDRAW_PHRASES],
+    "6.13": [["consent manager", "consent managers"], ["manage", "review", "withdraw"]],
+    "6.15": [["consent manager", "consent managers"],
+             ["registered with the board", "registered with the data protection board"]],
+    "7.10": [["disaster management act, 2005", "disaster management act 2005"]],
+    "8.7": [["personal data breach"], ["board"], ["inform", "informed", "notify", "notified", "intimate", "intimated"]],
+    "8.11": [DPO_PHRASES, [CONTACT]],
+    "8.12": [["grievance redressal", "grievance redress"]],
+}
+
+def normalize_with_offsets(text):
+    # Lower-case text with whitespace runs collapsed, plus the original offset of every kept character
+    chars, offsets = [], []
+    previous_space = True
+    for i, ch in enumerate(text):
+        if ch.isspace():
+            if previous_space:
+                continue
+            ch = " "
+            previous_space = True
+        else:
+            previous_space = False
+        chars.append(ch.lower())
+        offsets.append(i)
+    return "".join(chars), offsets
+
+class PhraseMatcher:
+    # Aho-Corasick automaton: finds every (possibly overlapping) phrase occurrence in one pass
+
+    def __init__(self, phrases):
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [[]]
+        for phrase in phrases:
+            node = 0
+            for ch in phrase:
+                if ch not in self._goto[node]:
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[node][ch] = len(self._goto) - 1
+                node = self._goto[node][ch]
+            self._output[node].append(phrase)
+
+        # Breadth-first construction of failure links
+        pending = deque(self._goto[0].values())
+        while pending:
+            node = pending.popleft()
+            for ch, child in self._goto[node].items():
+                pending.append(child)
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[child] = self._goto[fallback].get(ch, 0)
+                self._output[child] = self._output[child] + self._output[self._fail[child]]
+
+    def finditer(self, text):
+        goto, fail, output = self._goto, self._fail, self._output
+        node = 0
+        for end, ch in enumerate(text, start=1):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            for phrase in output[node]:
+                start = end - len(phrase)
+                # Whole words only: "manage" must not match inside "manager"
+                if (start == 0 or not text[start - 1].isalnum()) and (end == len(text) or not text[end].isalnum()):
+                    yield phrase, start, end
+
+class Prescreener:
+    # Precompiled rule set; build once and reuse for every policy
+
+    def __init__(self, rules=PRESCREEN_RULES):
+        self.rules = rules
+        phrases = {p for groups in rules.values() for group in groups for p in group if p != CONTACT}
+        self._matcher = PhraseMatcher(sorted(phrases))
+
+    def scan(self, text):
+        # Map each phrase (and CONTACT) to the (start, end) spans where it occurs in the original text
+        normalized, offsets = normalize_with_offsets(text)
+        hits = {}
+        for phrase, start, end in self._matcher.finditer(normalized):
+            hits.setdefault(phrase, []).append((offsets[start], offsets[end - 1] + 1))
+        for match in CONTACT_RE.finditer(text):
+            hits.setdefault(CONTACT, []).append(match.span())
+        return hits
+
+    def resolve(self, text, item_ids=None, hits=None):
+        # Return {item_id: (start, end)} for items whose rule is satisfied, with the evidence span
+        hits = self.scan(text) if hits is None else hits
+        resolved = {}
+        for item_id, groups in self.rules.items():
+            if item_ids is not None and item_id not in item_ids:
+                continue
+            anchors = sorted(span for phrase in groups[0] for span in hits.get(phrase, []))
+            for anchor in anchors:
+                spans = [anchor]
+                for group in groups[1:]:
+                    nearby = [span for phrase in group for span in hits.get(phrase, [])
+                              if abs(span[0] - anchor[0]) <= PROXIMITY_CHARS]
+                    if not nearby:
+                        break
+                    spans.append(min(nearby, key=lambda span: abs(span[0] - anchor[0])))
+                else:
+                    resolved[item_id] = (min(s[0] for s in spans), max(s[1] for s in spans))
+                    break
+        return resolved
+
+_prescreener = None
+_scan_cache = OrderedDict()
+_lock = threading.Lock()
+SCAN_CACHE_SIZE = 16
+
+def get_prescreener():
+    global _prescreener
+    with _lock:
+        if _prescreener is None:
+            _prescreener = Prescreener()
+        return _prescreener
+
+def scan_policy(policy_text):
+    # Every section of a run screens the same text, so the scan is done once per document
+    key = hashlib.sha256(policy_text.encode("utf-8")).hexdigest()
+    with _lock:
+        if key in _scan_cache:
+            _scan_cache.move_to_end(key)
+            return _scan_cache[key]
+    hits = get_prescreener().scan(policy_text)
+    with _lock:
+        _scan_cache[key] = hits
+        while len(_scan_cache) > SCAN_CACHE_SIZE:
+            _scan_cache.popitem(last=False)
+    return hits
+
+def prescreen_evaluations(checklist, policy_text):
+    # Matched Details entries for the checklist items the local rules can settle on their own
+    resolved = get_prescreener().resolve(policy_text, {item["id"] for item in checklist},
+                                         hits=scan_policy(policy_text))
+    evaluations = {}
+    for item in checklist:
+        if item["id"] not in resolved:
+            continue
+        start, end = resolved[item["id"]]
+        quote = re.sub(r"\s+", " ", policy_text[start:end]).strip()
+        context = re.sub(r"\s+", " ", policy_text[max(0, start - 120):end + 120]).strip()
+        page = policy_text.count("\f", 0, start) + 1 if "\f" in policy_text else None
+        evaluations[item["id"]] = {
+            "Checklist Item ID": item["id"],
+            "Checklist Text": item["text"],
+            "Status": "Explicitly Mentioned",
+            "Justification": f"Resolved by local pre-screen: the policy states “{quote}”.",
+            "Source Passage": f"[chars {start}–{end}" + (f", p. {page}" if page else "") + f"] …{context}…"
+        }
+    return evaluations
@@ -0,0 +1,178 @@
+import collections
+import contextlib
+import contextvars
+import os
+import threading
+import time
+
+# --- Rate Limit Settings ---
+# The organisation's OpenAI limits are shared by every session, job and batch in the server process.
+# Set DPDPA_OPENAI_RPM / DPDPA_OPENAI_TPM to the account's per-model limits.
+DEFAULT_REQUESTS_PER_MINUTE = int(os.environ.get("DPDPA_OPENAI_RPM", 500))
+DEFAULT_TOKENS_PER_MINUTE = int(os.environ.get("DPDPA_OPENAI_TPM", 30000))
+MAX_IN_FLIGHT_REQUESTS = 8        # GPT calls running at once across all sessions
+DEFAULT_SESSION = "default"
+
+_current_session = contextvars.ContextVar("dpdpa_session", default=DEFAULT_SESSION)
+
+@contextlib.contextmanager
+def session(key):
+    # Attribute the GPT calls made inside the block (and in threads started with its context) to key
+    token = _current_session.set(key or DEFAULT_SESSION)
+    try:
+        yield
+    finally:
+        _current_session.reset(token)
+
+def current_session():
+    return _current_session.get()
+
+class TokenBucket:
+    # Refills continuously up to per_minute; a take may overdraw it, which later takers then wait out
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        # Requests larger than the whole bucket only wait for a full bucket, so they cannot block forever
+        self._refill(now)
+        needed = min(amount, self.capacity)
+        return 0.0 if self.level >= needed else (needed - self.level) / self.rate
+
+    def take(self, amount):
+        self.level -= amount
+
+    def give(self, amount):
+        self.level = min(self.capacity, self.level + amount)
+
+class RateLimiter:
+    # Request and token buckets for one model; acquire blocks until both can pay for a call.
+    # A limit of None leaves that dimension unlimited.
+
+    def __init__(self, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens, deadline=None):
+        # Take one request and tokens estimated tokens; returns the seconds spent waiting
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                wait = max(self.requests.wait_time(1, now) if self.requests else 0.0,
+                           self.tokens.wait_time(tokens, now) if self.tokens else 0.0,
+                           self._paused_until - now)
+                if wait <= 0:
+                    if self.requests:
+                        self.requests.take(1)
+                    if self.tokens:
+                        self.tokens.take(tokens)
+                    return now - started
+            if deadline is not None and now + wait >= deadline:
+                raise TimeoutError("Rate limit wait would exceed the call's deadline")
+            time.sleep(wait)
+
+    def settle(self, estimated, actual):
+        # Once the response reports its usage, correct the estimate that was taken up front
+        if actual is None or self.tokens is None:
+            return
+        with self._lock:
+            if actual > estimated:
+                self.tokens.take(actual - estimated)
+            else:
+                self.tokens.give(estimated - actual)
+
+    def pause(self, seconds):
+        # After a 429 every caller holds off, instead of each one finding out with its own failed request
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+class FairScheduler:
+    # At most max_active holders at once, handed out round-robin across sessions.
+    # Each session queues its own callers in order; when a slot frees up it goes to the next session in turn,
+    # so a session with a hundred queued calls gets one slot in turn with a session that has one.
+
+    def __init__(self, max_active=MAX_IN_FLIGHT_REQUESTS):
+        self.max_active = max_active
+        self._active = 0
+        self._waiting = collections.OrderedDict()  # session -> deque of tickets, in turn order
+        self._lock = threading.Lock()
+
+    def acquire(self, session_key, deadline=None):
+        ticket = threading.Event()
+        with self._lock:
+            self._waiting.setdefault(session_key, collections.deque()).append(ticket)
+            self._dispatch()
+        timeout = max(0.0, deadline - time.monotonic()) if deadline is not None else None
+        if ticket.wait(timeout):
+            return
+        with self._lock:
+            if ticket.is_set():
+                return  # granted just as the wait ran out
+            tickets = self._waiting[session_key]
+            tickets.remove(ticket)
+            if not tickets:
+                del self._waiting[session_key]
+        raise TimeoutError("Timed out waiting for a free GPT slot")
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+            self._dispatch()
+
+    @contextlib.contextmanager
+    def slot(self, session_key, deadline=None):
+        self.acquire(session_key, deadline)
+        try:
+            yield
+        finally:
+            self.release()
+
+    def _dispatch(self):
+        while self._active < self.max_active and self._waiting:
+            session_key, tickets = next(iter(self._waiting.items()))
+            tickets.popleft().set()
+            self._active += 1
+            if tickets:
+                self._waiting.move_to_end(session_key)
+            else:
+                del self._waiting[session_key]
+
+    def status(self):
+        with self._lock:
+            return {"active": self._active, "waiting": {key: len(t) for key, t in self._waiting.items()}}
+
+_limits = (DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_TOKENS_PER_MINUTE)
+_limiters = {}
+_scheduler = None
+_lock = threading.Lock()
+
+def set_rate_limits(requests_per_minute, tokens_per_minute):
+    # Applies to every model; None lifts a limit, e.g. for a stand-in client that never reaches OpenAI
+    global _limits
+    with _lock:
+        _limits = (requests_per_minute, tokens_per_minute)
+        _limiters.clear()
+
+def get_rate_limiter(model):
+    # OpenAI enforces limits per model, so each model gets its own buckets
+    with _lock:
+        if model not in _limiters:
+            _limiters[model] = RateLimiter(*_limits)
+        return _limiters[model]
+
+def get_scheduler():
+    global _scheduler
+    with _lock:
+        if _scheduler is None:
+            _scheduler = FairScheduler()
+        return _scheduler
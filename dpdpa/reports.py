@@ -0,0 +1,221 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from dpdpa.cache import normalize_policy_text
+
+# --- Report Settings ---
+DEFAULT_RESULTS_DB_PATH = os.path.join(".dpdpa_cache", "results_history.sqlite3")
+STATUS_COLUMNS = {"Explicitly Mentioned": "explicit", "Partially Mentioned": "partial", "Missing": "missing"}
+LEVEL_COLUMNS = {"Fully Compliant": "fully", "Partially Compliant": "partially", "Non-Compliant": "non"}
+GENERAL_INDUSTRY = "General"
+
+def pasted_document_name(policy_text):
+    # Pasted policies have no file name; a short content hash keeps different ones apart in the history
+    digest = hashlib.sha1(normalize_policy_text(policy_text).encode("utf-8")).hexdigest()[:8]
+    return f"Pasted policy ({digest})"
+
+class ResultsStore:
+    # History of every evaluation, one row per document, section and checklist item, backed by SQLite.
+    # Daily aggregates for the dashboard (per industry and section, per industry and item) are updated in the
+    # same transaction as each run is added, so reading them costs the same with ten or a hundred thousand
+    # evaluations.
+
+    def __init__(self, path=DEFAULT_RESULTS_DB_PATH):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS runs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    ts REAL NOT NULL,
+                    document TEXT NOT NULL,
+                    industry TEXT NOT NULL,
+                    model TEXT,
+                    source TEXT
+                );
+                CREATE TABLE IF NOT EXISTS run_sections (
+                    run_id INTEGER NOT NULL REFERENCES runs(id),
+                    section TEXT NOT NULL,
+                    score REAL NOT NULL,
+                    match_level TEXT,
+                    PRIMARY KEY (run_id, section)
+                );
+                CREATE TABLE IF NOT EXISTS run_items (
+                    run_id INTEGER NOT NULL REFERENCES runs(id),
+                    section TEXT NOT NULL,
+                    item_id TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    PRIMARY KEY (run_id, item_id)
+                );
+                CREATE TABLE IF NOT EXISTS daily_sections (
+                    day TEXT NOT NULL,
+                    industry TEXT NOT NULL,
+                    section TEXT NOT NULL,
+                    evaluations INTEGER NOT NULL DEFAULT 0,
+                    score_sum REAL NOT NULL DEFAULT 0,
+                    fully INTEGER NOT NULL DEFAULT 0,
+                    partially INTEGER NOT NULL DEFAULT 0,
+                    non INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, industry, section)
+                );
+                CREATE TABLE IF NOT EXISTS daily_items (
+                    day TEXT NOT NULL,
+                    industry TEXT NOT NULL,
+                    item_id TEXT NOT NULL,
+                    section TEXT NOT NULL,
+                    evaluations INTEGER NOT NULL DEFAULT 0,
+                    explicit INTEGER NOT NULL DEFAULT 0,
+                    partial INTEGER NOT NULL DEFAULT 0,
+                    missing INTEGER NOT NULL DEFAULT 0,
+                    PRIMARY KEY (day, industry, item_id)
+                );
+                CREATE INDEX IF NOT EXISTS idx_runs_ts ON runs(ts);
+                CREATE INDEX IF NOT EXISTS idx_runs_document ON runs(document, ts);
+                CREATE INDEX IF NOT EXISTS idx_run_items_item ON run_items(item_id, status);
+            """)
+
+    def add_run(self, document, results, industry=None, model=None, source=None, ts=None):
+        # Record a document's section results; sections that failed with an error are skipped
+        results = [r for r in results if not r.get("Error")]
+        if not results:
+            return None
+        ts = ts or time.time()
+        industry = industry or GENERAL_INDUSTRY
+        day = time.strftime("%Y-%m-%d", time.localtime(ts))
+        with self._lock, self._conn:
+            run_id = self._conn.execute(
+                "INSERT INTO runs (ts, document, industry, model, source) VALUES (?, ?, ?, ?, ?)",
+                (ts, document, industry, model, source)
+            ).lastrowid
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO run_sections (run_id, section, score, match_level) VALUES (?, ?, ?, ?)",
+                [(run_id, r["Section"], r["Compliance Score"], r.get("Match Level")) for r in results]
+            )
+            items = [(run_id, r["Section"], e["Checklist Item ID"], e["Status"])
+                     for r in results for e in r["Matched Details"] if e["Status"] in STATUS_COLUMNS]
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO run_items (run_id, section, item_id, status) VALUES (?, ?, ?, ?)", items
+            )
+
+            for r in results:
+                level = LEVEL_COLUMNS.get(r.get("Match Level"))
+                self._conn.execute(f"""
+                    INSERT INTO daily_sections (day, industry, section, evaluations, score_sum{f', {level}' if level else ''})
+                    VALUES (?, ?, ?, 1, ?{', 1' if level else ''})
+                    ON CONFLICT (day, industry, section) DO UPDATE SET
+                        evaluations = evaluations + 1, score_sum = score_sum + excluded.score_sum
+                        {f', {level} = {level} + 1' if level else ''}
+                """, (day, industry, r["Section"], r["Compliance Score"]))
+            for _, section, item_id, status in items:
+                column = STATUS_COLUMNS[status]
+                self._conn.execute(f"""
+                    INSERT INTO daily_items (day, industry, item_id, section, evaluations, {column})
+                    VALUES (?, ?, ?, ?, 1, 1)
+                    ON CONFLICT (day, industry, item_id) DO UPDATE SET
+                        evaluations = evaluations + 1, {column} = {column} + 1
+                """, (day, industry, item_id, section))
+        return run_id
+
+    def _filter(self, industry, since=None, day_column=None):
+        clauses, params = [], []
+        if industry:
+            clauses.append("industry = ?")
+            params.append(industry)
+        if since is not None and day_column:
+            clauses.append(f"{day_column} >= ?")
+            params.append(time.strftime("%Y-%m-%d", time.localtime(since)))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def industries(self):
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT DISTINCT industry FROM daily_sections ORDER BY industry")]
+
+    def totals(self, industry=None, since=None):
+        where, params = self._filter(industry, since, "day")
+        with self._lock:
+            row = self._conn.execute(f"""
+                SELECT COALESCE(SUM(evaluations), 0) AS evaluations, SUM(score_sum) AS score_sum,
+                       COALESCE(SUM(fully), 0) AS fully, COALESCE(SUM(non), 0) AS non
+                FROM daily_sections{where}
+            """, params).fetchone()
+            run_where = " WHERE industry = ?" if industry else ""
+            run_params = [industry] if industry else []
+            if since is not None:
+                run_where += (" AND" if run_where else " WHERE") + " ts >= ?"
+                run_params.append(since)
+            documents = self._conn.execute(
+                f"SELECT COUNT(DISTINCT document) FROM runs{run_where}", run_params
+            ).fetchone()[0]
+        evaluations = row["evaluations"]
+        return {
+            "documents": documents,
+            "section_evaluations": evaluations,
+            "average_score": (row["score_sum"] / evaluations) if evaluations else None,
+            "fully_compliant": row["fully"],
+            "non_compliant": row["non"],
+        }
+
+    def trend(self, industry=None, since=None):
+        # Average compliance score per day, overall and per section
+        where, params = self._filter(industry, since, "day")
+        with self._lock:
+            rows = self._conn.execute(f"""
+                SELECT day, section, SUM(score_sum) / SUM(evaluations) AS score, SUM(evaluations) AS evaluations
+                FROM daily_sections{where} GROUP BY day, section ORDER BY day, section
+            """, params).fetchall()
+        return [dict(r) for r in rows]
+
+    def item_miss_rates(self, industry=None, since=None):
+        # Per checklist item: evaluations and the share found Missing or only Partially Mentioned
+        where, params = self._filter(industry, since, "day")
+        with self._lock:
+            rows = self._conn.execute(f"""
+                SELECT item_id, section, SUM(evaluations) AS evaluations, SUM(missing) AS missing,
+                       SUM(partial) AS partial, SUM(explicit) AS explicit
+                FROM daily_items{where} GROUP BY item_id, section
+            """, params).fetchall()
+        return [dict(r, missing_rate=r["missing"] / r["evaluations"], partial_rate=r["partial"] / r["evaluations"])
+                for r in rows if r["evaluations"]]
+
+    def industry_breakdown(self, since=None):
+        where, params = self._filter(None, since, "day")
+        with self._lock:
+            rows = self._conn.execute(f"""
+                SELECT industry, section, SUM(evaluations) AS evaluations, SUM(score_sum) / SUM(evaluations) AS score
+                FROM daily_sections{where} GROUP BY industry, section ORDER BY industry, section
+            """, params).fetchall()
+        return [dict(r) for r in rows]
+
+    def recent_runs(self, limit=20, industry=None):
+        where = " WHERE r.industry = ?" if industry else ""
+        with self._lock:
+            rows = self._conn.execute(f"""
+                SELECT r.id, r.ts, r.document, r.industry, r.model, r.source, COUNT(s.section) AS sections,
+                       AVG(s.score) AS score
+                FROM (SELECT * FROM runs r{where} ORDER BY ts DESC LIMIT ?) r
+                JOIN run_sections s ON s.run_id = r.id
+                GROUP BY r.id ORDER BY r.ts DESC
+            """, ([industry] if industry else []) + [limit]).fetchall()
+        return [dict(r) for r in rows]
+
+    def clear(self):
+        with self._lock, self._conn:
+            for table in ("run_items", "run_sections", "runs", "daily_sections", "daily_items"):
+                self._conn.execute(f"DELETE FROM {table}")
+
+_results_store = None
+_results_store_lock = threading.Lock()
+
+def get_results_store():
+    global _results_store
+    with _results_store_lock:
+        if _results_store is None:
+            _results_store = ResultsStore()
+        return _results_store
@@ -0,0 +1,159 @@
+import hashlib
+import math
+import re
+import threading
+from collections import Counter, OrderedDict
+
+# --- Retrieval Settings ---
+MAX_CHUNK_CHARS = 1200
+DEFAULT_TOP_K = 3
+INDEX_CACHE_SIZE = 16
+
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+STOPWORDS = {
+    "a", "an", "and", "any", "are", "as", "at", "be", "by", "for", "from", "has", "her", "if", "in", "is",
+    "it", "its", "may", "must", "of", "on", "or", "such", "that", "the", "this", "to", "under", "with",
+    "policy", "state", "states", "shall",
+}
+
+HEADING_RE = re.compile(
+    r"^(?:\d+(?:\.\d+)*[.)]?\s+\S.*|[IVXLC]+[.)]\s+\S.*|[A-Z][A-Z0-9 ,&/()'-]{3,})$"
+)
+
+def tokenize(text):
+    return [t for t in re.findall(r"[a-z0-9]+", text.lower()) if t not in STOPWORDS and len(t) > 1]
+
+def is_heading(line):
+    # Short numbered or all-caps lines without sentence punctuation are treated as headings
+    return len(line) <= 80 and not line.endswith((".", ",", ";", ":")) and bool(HEADING_RE.match(line))
+
+def chunk_policy(text, max_chars=MAX_CHUNK_CHARS):
+    # Split policy text into heading-aware paragraph chunks with their character offsets
+    paragraphs = []
+    heading = ""
+    buffer, start = [], None
+    offset = 0
+
+    def flush():
+        if buffer:
+            paragraphs.append({"heading": heading, "text": " ".join(buffer), "start": start})
+            buffer.clear()
+
+    for raw_line in text.splitlines(keepends=True):
+        line = raw_line.strip()
+        line_start = offset
+        offset += len(raw_line)
+        if not line:
+            flush()
+            continue
+        if is_heading(line):
+            flush()
+            heading = line
+            continue
+        if not buffer:
+            start = line_start
+        buffer.append(line)
+    flush()
+
+    # Merge short paragraphs under the same heading, split overly long ones at sentence boundaries
+    chunks = []
+    for para in paragraphs:
+        pieces = [para["text"]]
+        if len(para["text"]) > max_chars:
+            pieces, current = [], ""
+            for sentence in re.split(r"(?<=[.;!?])\s+", para["text"]):
+                if current and len(current) + len(sentence) + 1 > max_chars:
+                    pieces.append(current)
+                    current = sentence
+                else:
+                    current = f"{current} {sentence}".strip()
+            if current:
+                pieces.append(current)
+
+        for piece in pieces:
+            previous = chunks[-1] if chunks else None
+            if (previous and previous["heading"] == para["heading"]
+                    and len(previous["text"]) + len(piece) + 1 <= max_chars):
+                previous["text"] = f"{previous['text']} {piece}"
+            else:
+                chunks.append({"heading": para["heading"], "text": piece, "start": para["start"]})
+
+    # PDF text carries form feeds between pages, so each chunk can also report where it came from
+    has_pages = "\f" in text
+    for n, chunk in enumerate(chunks, start=1):
+        chunk["id"] = f"P{n}"
+        if has_pages:
+            chunk["page"] = text.count("\f", 0, chunk["start"]) + 1
+    return chunks
+
+class PolicyIndex:
+    # BM25 index over the chunks of one policy document
+
+    def __init__(self, text, max_chars=MAX_CHUNK_CHARS):
+        self.chunks = chunk_policy(text, max_chars=max_chars)
+        self._term_freqs = [Counter(tokenize(f"{c['heading']} {c['text']}")) for c in self.chunks]
+        self._lengths = [sum(tf.values()) for tf in self._term_freqs]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+
+        doc_freq = Counter()
+        for tf in self._term_freqs:
+            doc_freq.update(tf.keys())
+        n = len(self.chunks)
+        self._idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freq.items()}
+
+    def __len__(self):
+        return len(self.chunks)
+
+    def scores(self, query):
+        terms = [t for t in set(tokenize(query)) if t in self._idf]
+        results = []
+        for tf, length in zip(self._term_freqs, self._lengths):
+            score = 0.0
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / self._avg_length) if self._avg_length else BM25_K1
+            for term in terms:
+                freq = tf.get(term)
+                if freq:
+                    score += self._idf[term] * freq * (BM25_K1 + 1) / (freq + norm)
+            results.append(score)
+        return results
+
+    def search(self, query, k=DEFAULT_TOP_K):
+        ranked = sorted(enumerate(self.scores(query)), key=lambda pair: pair[1], reverse=True)
+        return [(self.chunks[i], score) for i, score in ranked[:k] if score > 0]
+
+    def passages_for_checklist(self, checklist, k=DEFAULT_TOP_K):
+        # Union of each item's top-k chunks, kept in document order so the prompt reads naturally
+        selected = {}
+        for item in checklist:
+            for chunk, _ in self.search(item["text"], k=k):
+                selected[chunk["id"]] = chunk
+        return sorted(selected.values(), key=lambda c: c["start"])
+
+# --- Per-document Index Cache ---
+_index_cache = OrderedDict()
+_index_lock = threading.Lock()
+
+def get_policy_index(text):
+    # Return the index for this document, building it only the first time the text is seen
+    key = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    with _index_lock:
+        index = _index_cache.get(key)
+        if index is not None:
+            _index_cache.move_to_end(key)
+            return index
+    index = PolicyIndex(text)
+    with _index_lock:
+        _index_cache[key] = index
+        while len(_index_cache) > INDEX_CACHE_SIZE:
+            _index_cache.popitem(last=False)
+    return index
+
+def format_passages(passages):
+    return "\n\n".join(
+        f"[{passage_label(p)}]" + (f" ({p['heading']})" if p["heading"] else "") + f" {p['text']}" for p in passages
+    )
+
+def passage_label(passage):
+    return f"{passage['id']}, p. {passage['page']}" if "page" in passage else passage["id"]
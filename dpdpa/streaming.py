@@ -0,0 +1,68 @@
+import json
+
+class ChecklistStreamParser:
+    # Incrementally pulls complete objects out of a JSON array while the JSON is still arriving.
+    # Feed it chunks of the model's output; each call returns the array elements (parsed dicts) that became
+    # complete with that chunk. Only the array under key is scanned, so the rest of the document is left for
+    # the final json.loads on the full text.
+
+    def __init__(self, key="Checklist Evaluation"):
+        self.key = json.dumps(key)
+        self.buffer = ""
+        self._pos = 0
+        self._state = "seek_key"   # seek_key -> seek_array -> in_array -> done
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._item_start = None
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        items = []
+        buf = self.buffer
+
+        while self._pos < len(buf) and self._state != "done":
+            if self._state == "seek_key":
+                found = buf.find(self.key, self._pos)
+                if found == -1:
+                    # Keep enough tail to match a key split across chunks
+                    self._pos = max(self._pos, len(buf) - len(self.key))
+                    break
+                self._pos = found + len(self.key)
+                self._state = "seek_array"
+                continue
+
+            ch = buf[self._pos]
+            if self._state == "seek_array":
+                if ch == "[":
+                    self._state = "in_array"
+                self._pos += 1
+                continue
+
+            # in_array: track object nesting, ignoring braces inside strings
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif ch == "\\":
+                    self._escaped = True
+                elif ch == '"':
+                    self._in_string = False
+            elif ch == '"':
+                self._in_string = True
+            elif ch == "{":
+                if self._depth == 0:
+                    self._item_start = self._pos
+                self._depth += 1
+            elif ch == "}":
+                self._depth -= 1
+                if self._depth == 0 and self._item_start is not None:
+                    try:
+                        items.append(json.loads(buf[self._item_start:self._pos + 1]))
+                    except ValueError:
+                        pass
+                    self._item_start = None
+            elif ch == "]" and self._depth == 0:
+                self._state = "done"
+            self._pos += 1
+
+        return items
@@ -0,0 +1,142 @@
+import functools
+import io
+import json
+
+import numpy as np
+import pandas as pd
+
+from dpdpa.parsing import STATUS_WEIGHTS
+
+# --- Result Table ---
+DETAIL_COLUMNS = ["Checklist Item ID", "Checklist Text", "Status", "Justification"]
+ITEM_COLUMNS = ["Document", "Section", "Title"] + DETAIL_COLUMNS
+# Only exported when at least one row has them (retrieval, long-policy parts, tiered mode)
+OPTIONAL_COLUMNS = ["Source Passage", "Policy Part", "Confidence"]
+SECTION_COLUMNS = ["Match Level", "Score"]
+CATEGORY_COLUMNS = ["Document", "Section", "Title", "Status", "Match Level"]
+
+def build_item_frame(documents):
+    # One row per (document, section, checklist item), built column by column.
+    # documents has the shape written by dpdpa-check -f json: dicts with "Document" and either "Results" or
+    # "Error". Failed documents and sections get a single row with Status "Error".
+    columns = {name: [] for name in ITEM_COLUMNS + OPTIONAL_COLUMNS + SECTION_COLUMNS}
+
+    def add_error(document, section, title, error):
+        row = {"Document": document, "Section": section, "Title": title, "Status": "Error",
+               "Justification": error, "Match Level": "Error", "Score": 0.0}
+        for name, values in columns.items():
+            values.append(row.get(name))
+
+    for doc in documents:
+        if doc.get("Error"):
+            add_error(doc["Document"], None, None, doc["Error"])
+            continue
+        for result in doc["Results"]:
+            if result.get("Error"):
+                add_error(doc["Document"], result["Section"], result.get("Title"), result["Error"])
+                continue
+            details = result["Matched Details"]
+            count = len(details)
+            columns["Document"].extend([doc["Document"]] * count)
+            columns["Section"].extend([result["Section"]] * count)
+            columns["Title"].extend([result.get("Title")] * count)
+            columns["Match Level"].extend([result["Match Level"]] * count)
+            columns["Score"].extend([result["Compliance Score"]] * count)
+            for name in DETAIL_COLUMNS + OPTIONAL_COLUMNS:
+                columns[name].extend(e.get(name) for e in details)
+
+    frame = pd.DataFrame(columns)
+    for name in CATEGORY_COLUMNS:
+        frame[name] = frame[name].astype("category")
+    return frame
+
+class ResultTable:
+    # The item-level results of one run, for one or many documents, as a single columnar table.
+    # The table is built once; summaries and exports are computed on first use and then reused, so Streamlit
+    # reruns and repeated downloads do not rebuild or re-serialize anything. payload is what the JSON export
+    # contains (default: documents). With details_only the exports hold just the Matched Details columns, the
+    # layout single-section CSV downloads have always had.
+
+    def __init__(self, documents, payload=None, details_only=False):
+        self.documents = documents
+        self.payload = documents if payload is None else payload
+        self.details_only = details_only
+        self.items = build_item_frame(documents)
+
+    @functools.cached_property
+    def export_columns(self):
+        optional = [c for c in OPTIONAL_COLUMNS if self.items[c].notna().any()]
+        if self.details_only:
+            return DETAIL_COLUMNS + optional
+        columns = ITEM_COLUMNS + optional + SECTION_COLUMNS
+        if self.items["Document"].nunique() <= 1:
+            columns.remove("Document")
+        return [c for c in columns if c != "Title"]
+
+    @functools.cached_property
+    def document_summary(self):
+        # Per document: sections, item counts by status and the overall score (found items / items)
+        statuses = ["Explicitly Mentioned", "Partially Mentioned", "Missing"]
+        status = self.items["Status"]
+        flags = pd.DataFrame({name: (status == name).to_numpy() for name in statuses})
+        flags["Document"] = self.items["Document"].to_numpy()
+        flags["Section"] = self.items["Section"].where(status != "Error").to_numpy()
+        flags["Weight"] = status.map(STATUS_WEIGHTS).astype(float).fillna(0.0).to_numpy()
+        flags["Errors"] = (status == "Error").to_numpy()
+
+        summary = flags.groupby("Document", observed=True, sort=False).agg(
+            Sections=("Section", "nunique"), Found=("Weight", "sum"), Errors=("Errors", "sum"),
+            **{name: (name, "sum") for name in statuses}
+        )
+        summary["Items"] = summary[statuses].sum(axis=1)
+        summary["Score"] = (summary["Found"] / summary["Items"].clip(lower=1)).round(2)
+        summary["Match Level"] = np.select(
+            [summary["Items"] == 0, summary["Score"] >= 1, summary["Score"] <= 0],
+            ["Error", "Fully Compliant", "Non-Compliant"], "Partially Compliant"
+        )
+        columns = ["Sections", "Items"] + statuses + ["Score", "Match Level", "Errors"]
+        return summary[columns].reset_index()
+
+    @functools.cached_property
+    def _json(self):
+        return json.dumps(self.payload, indent=2, ensure_ascii=False).encode("utf-8")
+
+    @functools.cached_property
+    def _csv(self):
+        return self.items[self.export_columns].to_csv(index=False).encode("utf-8")
+
+    @functools.cached_property
+    def _xlsx(self):
+        buffer = io.BytesIO()
+        self.items[self.export_columns].to_excel(buffer, index=False, engine="openpyxl")
+        return buffer.getvalue()
+
+    @functools.cached_property
+    def _parquet(self):
+        buffer = io.BytesIO()
+        self.items[self.export_columns].to_parquet(buffer, index=False)
+        return buffer.getvalue()
+
+    # Bound methods are passed to st.download_button as callables, so each file is only produced on click
+    def to_json(self):
+        return self._json
+
+    def to_csv(self):
+        return self._csv
+
+    def to_xlsx(self):
+        return self._xlsx
+
+    def to_parquet(self):
+        return self._parquet
+
+@functools.lru_cache(maxsize=None)
+def parquet_available():
+    # pandas writes Parquet through pyarrow or fastparquet, neither of which is a hard dependency
+    for module in ("pyarrow", "fastparquet"):
+        try:
+            __import__(module)
+            return True
+        except ImportError:
+            continue
+    return False